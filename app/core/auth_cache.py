@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import time
+
+from config import settings
+from models.db_models import User
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from core.cache import CacheBackend, build_backend
+from core.metrics import Counter
+
+STALE_USERS_KEY = "auth_cache_stale_users"
+
+
+class AuthCache:
+    """Cache of decoded access tokens and the users they resolve to.
+
+    Only the identity needed by handlers (id, username, email) is cached,
+    never the password hash.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = Counter("auth_cache_hits_total", "Auth cache hits")
+        self.misses = Counter("auth_cache_misses_total", "Auth cache misses")
+        self._pending: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _user_key(username: str) -> str:
+        return "user:" + username
+
+    async def _get(self, key: str) -> dict | None:
+        value = await self.backend.get(key)
+        (self.misses if value is None else self.hits).inc()
+        return value
+
+    async def get_token_subject(self, token: str) -> str | None:
+        """Username of an already verified token, None if not cached"""
+        payload = await self._get(self._token_key(token))
+        return None if payload is None else payload["sub"]
+
+    async def set_token_subject(
+        self, token: str, username: str, expires_at: float | None
+    ) -> None:
+        """Remembers a verified token until it expires or the TTL runs out.
+
+        Args:
+            token (str): The raw JWT.
+            username (str): Its subject.
+            expires_at (float | None): Token "exp" claim as a UNIX timestamp.
+        """
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl > 0:
+            await self.backend.set(self._token_key(token), {"sub": username}, ttl)
+
+    async def get_user(self, username: str) -> User | None:
+        """Detached User with the cached identity, None if not cached"""
+        identity = await self._get(self._user_key(username))
+        return None if identity is None else User(**identity)
+
+    async def set_user(self, user: User) -> None:
+        """Caches the identity of a user loaded from the database"""
+        identity = {"id": user.id, "username": user.username, "email": user.email}
+        await self.backend.set(self._user_key(user.username), identity, self.ttl)
+
+    async def invalidate_users(self, *usernames: str) -> None:
+        """Drops cached identities, e.g. after users are changed or deleted"""
+        await self.backend.delete(*(self._user_key(name) for name in usernames))
+
+    def schedule_invalidation(self, usernames: set[str]) -> None:
+        """Invalidates users from synchronous code such as ORM event hooks"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.invalidate_users(*usernames))
+            return
+        task = loop.create_task(self.invalidate_users(*usernames))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def snapshot(self) -> dict:
+        """Hit and miss counters of the cache"""
+        hits, misses = self.hits.value, self.misses.value
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else None,
+        }
+
+
+auth_cache = AuthCache(
+    build_backend(
+        settings.AUTH_CACHE_REDIS_URL,
+        settings.AUTH_CACHE_MAX_SIZE,
+        settings.AUTH_CACHE_TTL_SECONDS,
+        prefix="auth:",
+    ),
+    settings.AUTH_CACHE_TTL_SECONDS,
+)
+
+
+# Invalidation happens on commit so a rolled back change never evicts and
+# a concurrent request can't re-cache the old row in between. ORM-level
+# changes only: bulk UPDATE/DELETE statements on users bypass these hooks.
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_users(session, flush_context):
+    stale = set()
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            history = inspect(obj).attrs.username.history
+            stale.update(name for name in (obj.username, *history.deleted) if name)
+    if stale:
+        session.info.setdefault(STALE_USERS_KEY, set()).update(stale)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_users(session):
+    stale = session.info.pop(STALE_USERS_KEY, None)
+    if stale:
+        auth_cache.schedule_invalidation(stale)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_stale_users(session, previous_transaction):
+    session.info.pop(STALE_USERS_KEY, None)
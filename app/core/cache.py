@@ -0,0 +1,133 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Protocol
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after a time to live"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        """Returns a live entry and marks it as recently used.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Any | None: Stored value, None if missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Stores an entry, evicting the least recently used ones when full.
+
+        Args:
+            key (str): Cache key.
+            value (Any): Value to store, must not be None.
+            ttl (float | None): Time to live in seconds, defaults to self.ttl.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Drops an entry if present"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drops all entries"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBackend(Protocol):
+    """Storage for JSON-serializable cache entries"""
+
+    async def get(self, key: str) -> dict | None: ...
+
+    async def set(self, key: str, value: dict, ttl: float) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+
+class MemoryBackend:
+    """Backend keeping entries in a per-process TTLCache"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.cache = TTLCache(max_size, ttl)
+
+    async def get(self, key: str) -> dict | None:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: dict, ttl: float) -> None:
+        self.cache.set(key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.cache.delete(key)
+
+
+class RedisBackend:
+    """Backend storing entries as JSON in Redis, shared by all workers.
+
+    Works with redis.asyncio.Redis or anything exposing the same
+    get/set/delete coroutines.
+    """
+
+    def __init__(self, client, prefix: str = ""):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> dict | None:
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: dict, ttl: float) -> None:
+        await self.client.set(
+            self.prefix + key, json.dumps(value), px=max(1, int(ttl * 1000))
+        )
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+
+def build_backend(redis_url: str | None, max_size: int, ttl: float, prefix: str):
+    """Creates a Redis backend if a URL is given, an in-process one otherwise.
+
+    Args:
+        redis_url (str | None): Redis connection URL.
+        max_size (int): Entry limit for the in-process backend.
+        ttl (float): Default time to live for the in-process backend.
+        prefix (str): Key prefix for the Redis backend.
+
+    Returns:
+        CacheBackend: The backend.
+
+    Raises:
+        RuntimeError: If a Redis URL is set but the redis package is missing.
+    """
+    if not redis_url:
+        return MemoryBackend(max_size, ttl)
+    try:
+        from redis import asyncio as redis_asyncio
+    except ImportError as exc:
+        raise RuntimeError("Redis cache backend requires the redis package") from exc
+    return RedisBackend(redis_asyncio.from_url(redis_url), prefix=prefix)
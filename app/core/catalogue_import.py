@@ -0,0 +1,139 @@
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import IO
+
+from models.api_models import BookCreate
+from models.db_models import Book
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+FORMATS = ("csv", "jsonl")
+# rows validated, deduplicated and inserted per transaction
+BATCH_SIZE = 5000
+# row errors kept for the report, the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+@dataclass
+class RowError:
+    """A row of the import file that was skipped"""
+
+    line: int
+    error: str
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a catalogue import"""
+
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, error))
+
+
+def detect_format(filename: str | None) -> str | None:
+    """Import format implied by a file extension, None if unknown"""
+    if filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        if extension in ("jsonl", "ndjson"):
+            return "jsonl"
+        if extension == "csv":
+            return "csv"
+    return None
+
+
+def _read_csv(stream: IO[str]) -> Iterator[tuple[int, dict | None, str | None]]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # empty cells mean missing values, e.g. a book without a year
+        yield reader.line_num, {k: v for k, v in row.items() if v}, None
+
+
+def _read_jsonl(stream: IO[str]) -> Iterator[tuple[int, dict | None, str | None]]:
+    for line_num, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_num, None, f"Invalid JSON: {exc.msg}"
+            continue
+        if isinstance(row, dict):
+            yield line_num, row, None
+        else:
+            yield line_num, None, "Expected a JSON object"
+
+
+def _validate(
+    rows: Iterable[tuple[int, dict | None, str | None]], report: ImportReport
+) -> Iterator[tuple[int, dict]]:
+    for line_num, row, error in rows:
+        if error is None:
+            try:
+                yield line_num, BookCreate.model_validate(row).model_dump()
+                continue
+            except ValidationError as exc:
+                error = "; ".join(
+                    f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}"
+                    for e in exc.errors()
+                )
+        report.add_error(line_num, error)
+
+
+def _insert_batch(db: Session, batch: list[dict], report: ImportReport) -> None:
+    """Inserts the books of a batch that aren't in the catalogue yet"""
+    unique = {}
+    for book in batch:
+        unique.setdefault((book["title"], book["author"]), book)
+
+    existing = db.execute(
+        select(Book.title, Book.author).where(
+            Book.title.in_({title for title, _ in unique})
+        )
+    )
+    for key in existing:
+        unique.pop(tuple(key), None)
+
+    report.duplicates += len(batch) - len(unique)
+    if unique:
+        db.execute(insert(Book), list(unique.values()))
+        report.inserted += len(unique)
+    db.commit()
+
+
+def import_books(
+    db: Session, stream: IO[str], fmt: str, batch_size: int = BATCH_SIZE
+) -> ImportReport:
+    """Streams a CSV or JSON Lines catalogue into the books table.
+
+    The file is read row by row and written in batches, each committed on
+    its own, so memory use doesn't depend on the file size. Books whose
+    title and author are already in the catalogue (or earlier in the file)
+    are skipped. Invalid rows are reported and don't stop the import.
+
+    Args:
+        db (Session): Database session.
+        stream (IO[str]): Text stream of the file. CSV needs a header
+            row with title, author, year, description columns.
+        fmt (str): "csv" or "jsonl".
+        batch_size (int): Rows per transaction.
+
+    Returns:
+        ImportReport: Counts of inserted, duplicate and failed rows.
+    """
+    report = ImportReport()
+    reader = _read_csv if fmt == "csv" else _read_jsonl
+    books = (book for _, book in _validate(reader(stream), report))
+    while batch := list(islice(books, batch_size)):
+        _insert_batch(db, batch, report)
+    return report
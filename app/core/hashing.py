@@ -0,0 +1,146 @@
+import asyncio
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import settings
+from passlib.context import CryptContext
+
+from core.metrics import Counter, Gauge, Histogram
+
+# hashes made with a different cost are flagged by needs_update
+# and transparently rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_desired_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_desired_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing queue is full and the job is rejected"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool with a bounded queue.
+
+    Keeps CPU-heavy hashing off the event loop and the request threadpool,
+    so a login burst can't starve cheap reads. Jobs beyond
+    `workers + queue_limit` in flight are rejected instead of queued.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+        self.queue_depth = Gauge(
+            "password_hash_queue_depth", "Hash jobs waiting for a worker"
+        )
+        self.latency = Histogram(
+            "password_hash_seconds",
+            "Time to hash or verify a password, queueing included",
+            buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8),
+        )
+        self.rejected = Counter(
+            "password_hash_rejected_total", "Hash jobs rejected by admission control"
+        )
+
+    def start(self) -> None:
+        """Starts the worker processes"""
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self) -> None:
+        """Stops the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        mean = self.latency.sum / self.latency.count if self.latency.count else 0.5
+        return max(1, math.ceil(mean * self.in_flight / self.workers))
+
+    async def _run(self, func, *args):
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected.inc()
+            raise HashingPoolSaturated(self._retry_after())
+
+        self.start()
+        self.in_flight += 1
+        self.queue_depth.set(max(0, self.in_flight - self.workers))
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+            self.in_flight -= 1
+            self.queue_depth.set(max(0, self.in_flight - self.workers))
+
+    async def hash(self, password: str) -> str:
+        """Hashes a password in the pool.
+
+        Args:
+            password (str): The plain text password to hash.
+
+        Returns:
+            str: The hashed password.
+
+        Raises:
+            HashingPoolSaturated: If the queue is full.
+        """
+        return await self._run(_hash, password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """Verifies a password in the pool and rehashes it if it's outdated.
+
+        Args:
+            plain_password (str): The password to verify.
+            hashed_password (str): The stored hashed password.
+
+        Returns:
+            tuple[bool, str | None]: Whether the password matches, and a new
+                hash to store if the stored one uses outdated parameters.
+
+        Raises:
+            HashingPoolSaturated: If the queue is full.
+        """
+        return await self._run(_verify_and_update, plain_password, hashed_password)
+
+    def snapshot(self) -> dict:
+        """Queue state, rejections and latency histogram"""
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth.value,
+            "rejected": self.rejected.value,
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+
+password_hasher = PasswordHasher(settings.HASH_POOL_WORKERS, settings.HASH_QUEUE_LIMIT)
@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from config import settings
+from db.dialect import upsert_insert
+from db.session import SessionLocal
+from fastapi.concurrency import run_in_threadpool
+from models.db_models import Job
+from sqlalchemy import Row, case, delete, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.metrics import Counter, Family, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+jobs = Job.__table__
+ENQUEUED_KEY = "jobs_enqueued"
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+
+def utcnow() -> datetime:
+    return datetime.now(UTC)
+
+
+def as_utc(value: datetime) -> datetime:
+    """Aware datetime, SQLite returns naive ones that were stored in UTC"""
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+@dataclass(frozen=True)
+class JobKind:
+    """How the jobs of one kind are run.
+
+    `handler` gets a session and a batch of job rows of its kind and does
+    the work in the session's transaction, which also deletes the jobs.
+    `delay` holds new jobs back, so repeated changes to the same key in
+    that window coalesce into one run. `after_commit` runs once the work
+    is committed, for side effects outside the database.
+    """
+
+    handler: Callable[[Session, list[Row]], None]
+    delay: float = 0.0
+    after_commit: Callable[[list[Row]], None] | None = None
+
+
+class JobQueue:
+    """Persistent queue of post-write work, run by in-process workers.
+
+    Jobs are rows of the jobs table (an outbox) inserted in the transaction
+    of the write they follow, so they commit or roll back with it and
+    survive restarts. A job is identified by its kind and key: enqueuing
+    one that is already waiting merges into it, adding up the amounts.
+
+    Workers claim a batch of due jobs of one kind (SKIP LOCKED, so several
+    server processes share the queue), run the kind's handler and delete
+    the jobs in one transaction. A failing batch is retried with
+    exponential backoff and given up after `max_attempts`.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_base: float,
+        retry_max: float,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.kinds: dict[str, JobKind] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.depth = Gauge("job_queue_depth", "Jobs waiting to run")
+        self.dead = Gauge("job_queue_failed", "Jobs that ran out of attempts")
+        labels = ("kind",)
+        self.processed = Family(
+            Counter, "jobs_processed_total", "Jobs run successfully", labels
+        )
+        self.failures = Family(
+            Counter, "job_failures_total", "Failed job batches", labels
+        )
+        self.latency = Family(
+            Histogram,
+            "job_latency_seconds",
+            "Time from enqueuing a job to its completion",
+            labels,
+            buckets=LATENCY_BUCKETS,
+        )
+        self.duration = Family(
+            Histogram,
+            "job_batch_duration_seconds",
+            "Time to run a batch of jobs",
+            labels,
+            buckets=LATENCY_BUCKETS,
+        )
+
+    def register(
+        self,
+        kind: str,
+        delay: float = 0.0,
+        after_commit: Callable[[list[Row]], None] | None = None,
+    ):
+        """Decorator registering the handler of a job kind"""
+
+        def decorator(handler):
+            self.kinds[kind] = JobKind(handler, delay, after_commit)
+            return handler
+
+        return decorator
+
+    async def enqueue(
+        self, db: AsyncSession, kind: str, keys: dict[object, float] | Iterable
+    ) -> None:
+        """Adds jobs in the caller's transaction.
+
+        Args:
+            db (AsyncSession): Session of the write the jobs follow.
+            kind (str): Registered job kind.
+            keys: Job keys, or keys mapped to amounts to add up.
+        """
+        amounts = keys if isinstance(keys, dict) else dict.fromkeys(keys, 0.0)
+        if not amounts:
+            return
+        now = utcnow()
+        run_at = now + timedelta(seconds=self.kinds[kind].delay)
+        stmt = upsert_insert(db.bind.dialect.name, jobs)
+        failed = jobs.c.failed_at.is_not(None)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[jobs.c.kind, jobs.c.key],
+                # new work revives a job that ran out of attempts, with a
+                # fresh retry budget and schedule; a waiting job keeps its own
+                set_={
+                    "amount": jobs.c.amount + stmt.excluded.amount,
+                    "attempts": case((failed, 0), else_=jobs.c.attempts),
+                    "run_at": case((failed, stmt.excluded.run_at), else_=jobs.c.run_at),
+                    "failed_at": None,
+                },
+            ),
+            # sorted, so concurrent writers lock the rows in the same order
+            [
+                {
+                    "kind": kind,
+                    "key": str(key),
+                    "amount": amount,
+                    "enqueued_at": now,
+                    "run_at": run_at,
+                }
+                for key, amount in sorted(amounts.items(), key=lambda i: str(i[0]))
+            ],
+        )
+        db.sync_session.info[ENQUEUED_KEY] = True
+
+    def notify(self) -> None:
+        """Wakes the workers of this process, safe to call from any thread"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def run_batch(self, db: Session) -> int:
+        """Claims and runs one batch of due jobs of a single kind.
+
+        The jobs are deleted up front and read back from the DELETE, so
+        an amount merged into a job after it was selected is not lost:
+        PostgreSQL makes the merge wait for the row lock, SQLite for the
+        write lock, and the handler sees the final values.
+
+        Returns:
+            int: Number of jobs claimed, 0 when none are due.
+        """
+        now = utcnow()
+        due = (jobs.c.run_at <= now) & jobs.c.failed_at.is_(None)
+        kind = db.scalar(
+            select(jobs.c.kind)
+            .where(due)
+            .order_by(jobs.c.run_at, jobs.c.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        ids = (
+            db.scalars(
+                select(jobs.c.id)
+                .where(due, jobs.c.kind == kind)
+                .order_by(jobs.c.run_at, jobs.c.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if kind is not None
+            else []
+        )
+        # another worker may have taken them meanwhile (SQLite)
+        batch = (
+            db.execute(delete(jobs).where(jobs.c.id.in_(ids)).returning(*jobs.c)).all()
+            if ids
+            else []
+        )
+        if not batch:
+            db.rollback()
+            return 0
+
+        job_kind = self.kinds.get(kind)
+        started = time.perf_counter()
+        try:
+            if job_kind is None:
+                raise LookupError(f"No handler for job kind {kind!r}")
+            job_kind.handler(db, batch)
+            db.commit()
+        except Exception as exc:  # noqa: BLE001 - handlers raise anything, all retried
+            db.rollback()
+            self._record_failure(db, kind, batch, exc)
+            return len(batch)
+
+        finished = utcnow()
+        self.duration.labels(kind).observe(time.perf_counter() - started)
+        self.processed.labels(kind).inc(len(batch))
+        for job in batch:
+            latency = finished - as_utc(job.enqueued_at)
+            self.latency.labels(kind).observe(latency.total_seconds())
+        if job_kind.after_commit is not None:
+            job_kind.after_commit(batch)
+        return len(batch)
+
+    def _record_failure(
+        self, db: Session, kind: str, batch: list[Row], exc: Exception
+    ) -> None:
+        """Schedules a retry of a failed batch, or gives it up"""
+        self.failures.labels(kind).inc()
+        attempts = max(job.attempts for job in batch) + 1
+        now = utcnow()
+        values = {"attempts": jobs.c.attempts + 1, "last_error": repr(exc)[:1000]}
+        if attempts >= self.max_attempts:
+            values["failed_at"] = now
+            logger.exception("Giving up %d %s jobs", len(batch), kind)
+        else:
+            # full jitter keeps retries of many processes from lining up
+            backoff = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+            values["run_at"] = now + timedelta(seconds=random.uniform(0, backoff))
+            logger.warning(
+                "%d %s jobs failed (attempt %d): %r", len(batch), kind, attempts, exc
+            )
+        db.execute(
+            update(jobs)
+            .where(jobs.c.id.in_([job.id for job in batch]))
+            .values(**values)
+        )
+        db.commit()
+
+    def retry_failed(self, db: Session, kind: str | None = None) -> int:
+        """Makes jobs that ran out of attempts due again, with fresh attempts.
+
+        Args:
+            db (Session): Database session, committed here.
+            kind (str | None): Only jobs of this kind, all by default.
+
+        Returns:
+            int: Number of jobs revived.
+        """
+        query = update(jobs).where(jobs.c.failed_at.is_not(None))
+        if kind is not None:
+            query = query.where(jobs.c.kind == kind)
+        revived = db.execute(
+            query.values(failed_at=None, attempts=0, run_at=utcnow())
+        ).rowcount
+        db.commit()
+        # workers of other processes find them on their next poll
+        self.notify()
+        self.update_depth(db)
+        return revived
+
+    def run_pending(self, db: Session) -> int:
+        """Runs batches until no job is due.
+
+        Returns:
+            int: Number of jobs claimed.
+        """
+        claimed = 0
+        while count := self.run_batch(db):
+            claimed += count
+        self.update_depth(db)
+        return claimed
+
+    def update_depth(self, db: Session) -> None:
+        """Refreshes the queue depth gauges"""
+        waiting, failed = db.execute(
+            select(
+                func.count(jobs.c.id).filter(jobs.c.failed_at.is_(None)),
+                func.count(jobs.c.failed_at),
+            )
+        ).one()
+        db.rollback()
+        self.depth.set(waiting)
+        self.dead.set(failed)
+
+    async def run_worker(self) -> None:
+        """Runs due jobs when woken up by a commit, or every poll interval"""
+
+        def drain() -> int:
+            with SessionLocal() as db:
+                return self.run_pending(db)
+
+        while True:
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(drain)
+            except Exception:
+                logger.exception("Running background jobs failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except TimeoutError:
+                pass
+
+    def start(self, workers: int) -> list[asyncio.Task]:
+        """Starts `workers` worker tasks on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        return [asyncio.create_task(self.run_worker()) for _ in range(workers)]
+
+
+job_queue = JobQueue(
+    batch_size=settings.JOB_BATCH_SIZE,
+    poll_interval=settings.JOB_POLL_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_base=settings.JOB_RETRY_BASE_SECONDS,
+    retry_max=settings.JOB_RETRY_MAX_SECONDS,
+)
+
+
+# the local workers pick new jobs up right after the write commits,
+# other processes find them on their next poll
+@event.listens_for(Session, "after_commit")
+def _notify_workers(session):
+    if session.info.pop(ENQUEUED_KEY, False):
+        job_queue.notify()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_enqueued(session, previous_transaction):
+    session.info.pop(ENQUEUED_KEY, None)
@@ -0,0 +1,210 @@
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from threading import Lock
+
+# seconds, tuned for request and query latencies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# (name suffix, labels, value) of a single exposed sample
+Sample = tuple[str, dict[str, str], float]
+
+
+class Registry:
+    """Set of metrics exposed together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric) -> None:
+        """Adds a metric, replacing an earlier one with the same name"""
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All registered metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+        for value in labels.values()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+# metrics register here on creation unless given registry=None
+REGISTRY = Registry()
+
+
+class Counter:
+    """Monotonically increasing value"""
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, registry: Registry | None = REGISTRY
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self._lock = Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def inc(self, amount: float = 1) -> None:
+        """Increments the counter"""
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> Iterator[Sample]:
+        yield "", {}, self.value
+
+
+class Gauge:
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, registry: Registry | None = REGISTRY
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self._function: Callable[[], float] | None = None
+        self._lock = Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def set(self, value: float) -> None:
+        """Sets the gauge to the given value"""
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Reads the value from a function at collection time"""
+        self._function = function
+
+    def inc(self, amount: float = 1) -> None:
+        """Increments the gauge"""
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        """Decrements the gauge"""
+        with self._lock:
+            self.value -= amount
+
+    def samples(self) -> Iterator[Sample]:
+        yield "", {}, self.value if self._function is None else self._function()
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry | None = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # last slot counts values above the largest bucket (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def observe(self, value: float) -> None:
+        """Records a single observation"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        """Cumulative bucket counts, sum and count of observations.
+
+        Returns:
+            dict: {"buckets": {upper bound: count}, "sum": float, "count": int}
+        """
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "sum": total, "count": count}
+
+    def samples(self) -> Iterator[Sample]:
+        snapshot = self.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            yield "_bucket", {"le": bound}, count
+        yield "_sum", {}, snapshot["sum"]
+        yield "_count", {}, snapshot["count"]
+
+
+class Family:
+    """Metric split by label values, one child metric per combination.
+
+    Label values must come from a small fixed set (route templates, status
+    codes), every new combination is kept for the life of the process.
+    """
+
+    def __init__(
+        self,
+        metric_class: type,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        registry: Registry | None = REGISTRY,
+        **options,
+    ):
+        self.metric_class = metric_class
+        self.kind = metric_class.kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.options = options
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values: str):
+        """Child metric for the given label values, in labelnames order"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    values,
+                    self.metric_class(
+                        self.name, self.documentation, registry=None, **self.options
+                    ),
+                )
+        return child
+
+    def samples(self) -> Iterator[Sample]:
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            for suffix, child_labels, value in child.samples():
+                yield suffix, {**labels, **child_labels}, value
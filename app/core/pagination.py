@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+import math
+from typing import Any
+
+from sqlalchemy import true, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+# largest value of an Integer column, larger IDs can't be in any table
+MAX_ID = 2**31 - 1
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor can't be decoded"""
+
+
+def encode_cursor(order_by: str, descending: bool, value: Any, last_id: int) -> str:
+    """Packs the position after the last returned row into an opaque token.
+
+    Args:
+        order_by (str): Name of the sort key.
+        descending (bool): Sort direction.
+        value (Any): Sort key value of the last returned row.
+        last_id (int): ID of the last returned row (tie breaker).
+
+    Returns:
+        str: URL-safe cursor token.
+    """
+    raw = json.dumps([order_by, descending, value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, value_type: type) -> tuple[str, bool, Any, int]:
+    """Unpacks a token produced by encode_cursor.
+
+    Everything in the token comes from the client, so the types are
+    checked before any of it reaches a query.
+
+    Args:
+        cursor (str): Cursor token from the client.
+        value_type (type): Python type of the sort key column.
+
+    Returns:
+        tuple: (order_by, descending, value, last_id).
+
+    Raises:
+        InvalidCursor: If the token is malformed or its sort key value is
+            not of `value_type`.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        order_by, descending, value, last_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    if (
+        not isinstance(order_by, str)
+        or not isinstance(descending, bool)
+        or not _is_id(last_id)
+        or not (value is None or _is_value(value, value_type))
+    ):
+        raise InvalidCursor("Malformed cursor")
+    return order_by, descending, value, last_id
+
+
+def _is_id(value: Any) -> bool:
+    return type(value) is int and 0 <= value <= MAX_ID
+
+
+def _is_value(value: Any, value_type: type) -> bool:
+    # bool is a subclass of int, but never a sort key
+    if value_type is int:
+        return type(value) is int and -MAX_ID - 1 <= value <= MAX_ID
+    if value_type is float:
+        return type(value) in (int, float) and math.isfinite(value)
+    return type(value) is value_type
+
+
+def keyset_order(
+    column: ColumnElement, tiebreaker: ColumnElement, descending: bool
+) -> list[ColumnElement]:
+    """ORDER BY clauses of the whole keyset order, for OFFSET paging.
+
+    NULL sort keys are treated as the largest values (PostgreSQL default),
+    the same order keyset_phases walks through.
+
+    Args:
+        column (ColumnElement): Sort key column.
+        tiebreaker (ColumnElement): Unique column that makes the order total.
+        descending (bool): Sort direction.
+
+    Returns:
+        list[ColumnElement]: Clauses for Query.order_by.
+    """
+    if column is tiebreaker:
+        return [tiebreaker.desc() if descending else tiebreaker.asc()]
+    if descending:
+        return [column.desc().nulls_first(), tiebreaker.desc()]
+    return [column.asc().nulls_last(), tiebreaker.asc()]
+
+
+def keyset_phases(
+    column: ColumnElement,
+    tiebreaker: ColumnElement,
+    descending: bool,
+    position: tuple[Any, int] | None = None,
+) -> list[tuple[ColumnElement, list[ColumnElement]]]:
+    """Filters and orderings that continue a keyset order after `position`.
+
+    Rows with a sort key and rows without one are separate phases, run in
+    order until the page is full (NULLs come last ascending and first
+    descending). Within a phase the filter is a row-value comparison
+    `(column, id) > (value, last_id)` or `id > last_id` among the NULLs,
+    both index range bounds on a composite (column, id) index, so every
+    page costs the same however deep it is. A cursor with a NULL value is
+    in the NULL phase.
+
+    Args:
+        column (ColumnElement): Sort key column.
+        tiebreaker (ColumnElement): Unique column that makes the order total.
+        descending (bool): Sort direction.
+        position (tuple | None): (value, last_id) of the last returned row,
+            None for the first page.
+
+    Returns:
+        list[tuple]: (filter, order_by clauses) of each remaining phase.
+    """
+    order = [column.desc(), tiebreaker.desc()] if descending else [column, tiebreaker]
+    if column is tiebreaker:
+        if position is None:
+            return [(true(), order[:1])]
+        last_id = position[1]
+        return [
+            (tiebreaker < last_id if descending else tiebreaker > last_id, order[:1])
+        ]
+
+    keyed = column.is_not(None)
+    unkeyed = column.is_(None)
+    if position is not None:
+        value, last_id = position
+        if value is None:
+            unkeyed &= tiebreaker < last_id if descending else tiebreaker > last_id
+        else:
+            key = tuple_(column, tiebreaker)
+            keyed = key < (value, last_id) if descending else key > (value, last_id)
+    keyed_phase = (keyed, order)
+    unkeyed_phase = (unkeyed, order[1:])
+
+    if descending:
+        if position is not None and position[0] is not None:
+            return [keyed_phase]
+        return [unkeyed_phase, keyed_phase]
+    if position is not None and position[0] is None:
+        return [unkeyed_phase]
+    return [keyed_phase, unkeyed_phase]
@@ -0,0 +1,178 @@
+import logging
+import re
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# bound parameter lists of any length share one shape
+IN_LIST_RE = re.compile(r"\bIN \((?:[^()]|\(\))*\)", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\b\d+\b")
+SPACE_RE = re.compile(r"\s+")
+EXPLAIN_PREFIX = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+# statement shapes listed in the Server-Timing header, slowest first
+SERVER_TIMING_SHAPES = 5
+
+
+def statement_shape(statement: str) -> str:
+    """Statement text with values and IN lists folded, for grouping"""
+    shape = SPACE_RE.sub(" ", statement).strip()
+    shape = IN_LIST_RE.sub("IN (...)", shape)
+    return NUMBER_RE.sub("?", shape)
+
+
+@dataclass
+class ShapeStats:
+    """Executions of one statement shape during a request"""
+
+    count: int = 0
+    seconds: float = 0.0
+    explained: bool = False
+
+
+@dataclass
+class RequestProfile:
+    """Every SQL statement executed while serving one request"""
+
+    shapes: dict[str, ShapeStats] = field(
+        default_factory=lambda: defaultdict(ShapeStats)
+    )
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def statements(self) -> int:
+        return sum(stats.count for stats in self.shapes.values())
+
+    @property
+    def db_seconds(self) -> float:
+        return sum(stats.seconds for stats in self.shapes.values())
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+
+
+class SQLProfiler:
+    """Development aid flagging N+1 patterns and slow statements.
+
+    A statement shape executed `repeat_threshold` times within a request is
+    reported as a likely N+1, a statement slower than `slow_seconds` as
+    slow. Both are logged with their EXPLAIN plan, taken on the same
+    connection right after the statement ran.
+    """
+
+    def __init__(self, slow_seconds: float, repeat_threshold: int, explain: bool):
+        self.slow_seconds = slow_seconds
+        self.repeat_threshold = repeat_threshold
+        self.explain = explain
+
+    def instrument(self, engine: Engine) -> None:
+        """Records the statements of an engine into the current profile.
+
+        Args:
+            engine (Engine): Engine to watch, `sync_engine` of an async one.
+        """
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, many):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, many):
+        profile = current_profile.get()
+        if profile is None or not conn.info.get("profile_started"):
+            return
+        elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+        shape = statement_shape(statement)
+        stats = profile.shapes[shape]
+        stats.count += 1
+        stats.seconds += elapsed
+
+        reasons = []
+        if elapsed >= self.slow_seconds:
+            reasons.append(f"slow statement ({elapsed * 1000:.1f} ms)")
+        if stats.count == self.repeat_threshold:
+            reasons.append(f"possible N+1 ({stats.count} executions of one shape)")
+        if not reasons:
+            return
+
+        plan = None
+        if self.explain and not many and not stats.explained:
+            stats.explained = True
+            plan = self._explain(conn, statement, parameters)
+        logger.warning(
+            "SQL profiler: %s\n%s%s",
+            ", ".join(reasons),
+            shape,
+            f"\nPlan:\n{plan}" if plan else "",
+        )
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters) -> str | None:
+        """Plan of a statement, on a separate cursor of the same connection"""
+        prefix = EXPLAIN_PREFIX.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return "\n".join(
+                " ".join(str(column) for column in row) for row in cursor.fetchall()
+            )
+        # a raw cursor raises the driver's errors, the ones DBAPIError wraps
+        except conn.dialect.loaded_dbapi.Error as exc:
+            return f"EXPLAIN failed: {exc}"
+        finally:
+            cursor.close()
+
+
+def server_timing(profile: RequestProfile) -> str:
+    """Server-Timing header value: total, SQL time and the slowest shapes"""
+    total = (time.perf_counter() - profile.started) * 1000
+    metrics = [
+        f"total;dur={total:.1f}",
+        f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.statements} statements"',
+    ]
+    slowest = sorted(profile.shapes.items(), key=lambda item: -item[1].seconds)
+    for index, (shape, stats) in enumerate(slowest[:SERVER_TIMING_SHAPES], start=1):
+        description = f"x{stats.count} {shape[:80]}".replace("\\", "").replace('"', "'")
+        metrics.append(
+            f'sql{index};dur={stats.seconds * 1000:.1f};desc="{description}"'
+        )
+    return ", ".join(metrics)
+
+
+class ProfilingMiddleware:
+    """Profiles the SQL of every request and reports it in Server-Timing"""
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = list(message.get("headers", []))
+                value = server_timing(profile).encode("latin-1", "replace")
+                headers.append((b"server-timing", value))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
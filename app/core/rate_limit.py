@@ -0,0 +1,278 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Protocol
+
+from config import settings
+from fastapi import HTTPException, Request, status
+
+from core.metrics import Counter, Family
+from core.security import client_identity
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+HEADERS_STATE = "rate_limit_headers"
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Bucket of `requests` tokens refilled evenly over `seconds`"""
+
+    requests: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second"""
+        return self.requests / self.seconds
+
+    @property
+    def policy(self) -> str:
+        """RateLimit-Policy header value"""
+        return f"{self.requests};w={self.seconds:g}"
+
+
+def parse_limit(value: str) -> RateLimit:
+    """Parses a limit such as "100/minute" or "10/30" (per 30 seconds).
+
+    Args:
+        value (str): "<requests>/<second|minute|hour|day|seconds>".
+
+    Returns:
+        RateLimit: Parsed limit.
+
+    Raises:
+        ValueError: If the value is malformed.
+    """
+    requests, _, period = value.partition("/")
+    try:
+        seconds = PERIODS.get(period.strip()) or float(period)
+        limit = RateLimit(int(requests), seconds)
+    except ValueError:
+        raise ValueError(f"Invalid rate limit {value!r}") from None
+    if limit.requests < 1 or limit.seconds <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}")
+    return limit
+
+
+@dataclass(frozen=True)
+class Decision:
+    """Outcome of taking a token from a bucket"""
+
+    allowed: bool
+    remaining: int
+    # seconds until the next token, and until the bucket is full again
+    retry_after: float
+    reset_after: float
+
+
+def decide(tokens: float, limit: RateLimit, allowed: bool) -> Decision:
+    """Decision for a bucket left with `tokens` after the request"""
+    return Decision(
+        allowed=allowed,
+        remaining=int(tokens),
+        retry_after=0.0 if tokens >= 1 else (1 - tokens) / limit.rate,
+        reset_after=(limit.requests - tokens) / limit.rate,
+    )
+
+
+class BucketStore(Protocol):
+    """Storage of token buckets"""
+
+    async def take(self, key: str, limit: RateLimit) -> Decision: ...
+
+
+class MemoryBucketStore:
+    """Per-process buckets, enough for a single worker.
+
+    A bucket idle long enough to refill completely is indistinguishable
+    from a new one, so those are evicted every `evict_interval` seconds.
+    Past `max_buckets` the least recently used ones go first.
+    """
+
+    def __init__(self, max_buckets: int, evict_interval: float):
+        self.max_buckets = max_buckets
+        self.evict_interval = evict_interval
+        # key -> (tokens, last update, seconds to refill from empty)
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+        self._next_eviction = time.monotonic() + evict_interval
+
+    async def take(self, key: str, limit: RateLimit) -> Decision:
+        now = time.monotonic()
+        if now >= self._next_eviction:
+            self.evict_idle(now)
+
+        tokens, updated, _ = self._buckets.get(key, (limit.requests, now, 0))
+        tokens = min(limit.requests, tokens + (now - updated) * limit.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now, limit.seconds)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return decide(tokens, limit, allowed)
+
+    def evict_idle(self, now: float) -> None:
+        """Drops buckets that have refilled since their last use"""
+        self._buckets = OrderedDict(
+            (key, bucket)
+            for key, bucket in self._buckets.items()
+            if now - bucket[1] < bucket[2]
+        )
+        self._next_eviction = now + self.evict_interval
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# refill, take and store in one round trip, atomic across workers
+TAKE_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Buckets shared by all workers, kept in Redis hashes.
+
+    Keys expire once the bucket would be full again, so idle buckets
+    evict themselves.
+    """
+
+    def __init__(self, client, prefix: str = "rate_limit:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, limit: RateLimit) -> Decision:
+        allowed, tokens = await self._take(
+            keys=[self.prefix + key], args=[limit.requests, limit.rate, time.time()]
+        )
+        return decide(float(tokens), limit, bool(allowed))
+
+
+def build_store(redis_url: str | None, max_buckets: int, evict_interval: float):
+    """Creates a Redis store if a URL is given, an in-process one otherwise.
+
+    Raises:
+        RuntimeError: If a Redis URL is set but the redis package is missing.
+    """
+    if not redis_url:
+        return MemoryBucketStore(max_buckets, evict_interval)
+    try:
+        from redis import asyncio as redis_asyncio
+    except ImportError as exc:
+        raise RuntimeError("Redis rate limit store requires the redis package") from exc
+    return RedisBucketStore(redis_asyncio.from_url(redis_url))
+
+
+class RateLimiter:
+    """Token bucket limits per route, keyed by user or client address.
+
+    Requests with a valid access token are counted against their user,
+    the rest against the client IP, so users behind one NAT don't share
+    a budget and anonymous clients can't dodge it by sending bad tokens.
+    """
+
+    def __init__(
+        self,
+        store: BucketStore,
+        routes: dict[str, RateLimit],
+        default: RateLimit | None,
+    ):
+        self.store = store
+        self.routes = routes
+        self.default = default
+        self.rejections = Family(
+            Counter,
+            "rate_limit_rejections_total",
+            "Requests rejected with 429, by route template",
+            ("method", "route"),
+        )
+
+    def limit_for(self, method: str, route: str) -> RateLimit | None:
+        """Limit of a route template, e.g. ("GET", "/books/{book_id}")"""
+        return self.routes.get(f"{method} {route}", self.default)
+
+    async def __call__(self, request: Request) -> None:
+        """FastAPI dependency enforcing the limit of the matched route.
+
+        Raises:
+            HTTPException: 429 with Retry-After when the bucket is empty.
+        """
+        route = getattr(request.scope.get("route"), "path", request.url.path)
+        limit = self.limit_for(request.method, route)
+        if limit is None:
+            return
+
+        key = f"{request.method} {route} {await client_identity(request)}"
+        decision = await self.store.take(key, limit)
+        headers = {
+            "RateLimit-Limit": str(limit.requests),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(math.ceil(decision.reset_after)),
+            "RateLimit-Policy": limit.policy,
+        }
+        if not decision.allowed:
+            self.rejections.labels(request.method, route).inc()
+            headers["Retry-After"] = str(math.ceil(decision.retry_after))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=headers,
+            )
+        setattr(request.state, HEADERS_STATE, headers)
+
+
+class RateLimitHeadersMiddleware:
+    """Adds the RateLimit-* headers computed by RateLimiter to responses.
+
+    Handlers may return their own Response objects, so the headers are
+    attached at the ASGI level instead of through the dependency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            state = scope.get("state") or {}
+            limit_headers = state.get(HEADERS_STATE)
+            if message["type"] == "http.response.start" and limit_headers:
+                headers = list(message.get("headers", []))
+                headers.extend(
+                    (name.lower().encode(), value.encode())
+                    for name, value in limit_headers.items()
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+rate_limiter = RateLimiter(
+    build_store(
+        settings.RATE_LIMIT_REDIS_URL,
+        settings.RATE_LIMIT_MAX_BUCKETS,
+        settings.RATE_LIMIT_EVICT_SECONDS,
+    ),
+    {route: parse_limit(value) for route, value in settings.RATE_LIMITS.items()},
+    parse_limit(settings.RATE_LIMIT_DEFAULT) if settings.RATE_LIMIT_DEFAULT else None,
+)
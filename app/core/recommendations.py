@@ -0,0 +1,231 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+from config import settings
+from models.db_models import Book, BookNeighbour, Job, UserBook
+from scipy import sparse
+from sqlalchemy import Row, case, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.jobs import job_queue
+
+# how much a shelf entry says about the user's taste, unrated entries
+# count as a medium rating for read books and a weak signal for planned ones
+PREFERENCE = func.coalesce(
+    UserBook.rating, case((UserBook.status == "read", 3.0), else_=1.0)
+)
+# shelf books used as seeds for a single recommendation request
+MAX_SEEDS = 200
+# books whose similarities are computed in one sparse product
+CHUNK_SIZE = 1000
+# job kind of neighbour refreshes, keyed by book ID
+RECOMMENDATIONS_JOB = "recommendations"
+
+
+def _load_preferences(db: Session, stmt) -> np.ndarray:
+    """Runs a (user_id, book_id, preference) query into an N x 3 array"""
+    result = db.execute(stmt.execution_options(yield_per=50_000))
+    parts = [np.array(part, dtype=float) for part in result.partitions()]
+    return np.concatenate(parts) if parts else np.empty((0, 3))
+
+
+def _rating_matrix(rows: np.ndarray) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """Builds a users x books preference matrix and the book id of each column"""
+    _, user_pos = np.unique(rows[:, 0], return_inverse=True)
+    item_ids, item_pos = np.unique(rows[:, 1].astype(np.int64), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (rows[:, 2], (user_pos, item_pos)), shape=(user_pos.max() + 1, len(item_ids))
+    )
+    return matrix, item_ids
+
+
+def _cosine(
+    matrix: sparse.csr_matrix, norms: np.ndarray, targets: np.ndarray
+) -> sparse.csr_matrix:
+    """Cosine similarity of the target columns against all columns"""
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = (matrix @ sparse.diags(inverse)).tocsc()
+    return (normalized[:, targets].T @ normalized).tocsr()
+
+
+def _top_neighbours(
+    similarity: sparse.csr_matrix, targets: np.ndarray, item_ids: np.ndarray, k: int
+) -> list[dict]:
+    """Keeps the k most similar books of every target row"""
+    rows = []
+    for row, target in enumerate(targets):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        columns, scores = similarity.indices[start:end], similarity.data[start:end]
+        keep = columns != target
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            columns, scores = columns[top], scores[top]
+        book_id = int(item_ids[target])
+        rows.extend(
+            {"book_id": book_id, "neighbour_id": int(item_ids[c]), "score": float(s)}
+            for c, s in zip(columns, scores)
+        )
+    return rows
+
+
+def build_neighbours(db: Session, k: int) -> int:
+    """Recomputes the top-K neighbour table for all books from scratch.
+
+    The caller is responsible for committing.
+
+    Args:
+        db (Session): Database session.
+        k (int): Neighbours kept per book.
+
+    Returns:
+        int: Number of neighbour rows written.
+    """
+    rows = _load_preferences(db, select(UserBook.user_id, UserBook.book_id, PREFERENCE))
+    db.execute(delete(BookNeighbour))
+    db.execute(delete(Job).where(Job.kind == RECOMMENDATIONS_JOB))
+    if not len(rows):
+        return 0
+
+    matrix, item_ids = _rating_matrix(rows)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    written = 0
+    for start in range(0, len(item_ids), CHUNK_SIZE):
+        targets = np.arange(start, min(start + CHUNK_SIZE, len(item_ids)))
+        neighbours = _top_neighbours(
+            _cosine(matrix, norms, targets), targets, item_ids, k
+        )
+        if neighbours:
+            db.execute(insert(BookNeighbour), neighbours)
+            written += len(neighbours)
+    return written
+
+
+def refresh_neighbours(db: Session, book_ids: list[int], k: int) -> int:
+    """Recomputes the neighbours of a few books.
+
+    Only users who have one of the books on their shelf take part in the
+    dot products, so the cost depends on those books' readers and not on
+    the size of user_books. Neighbour lists of other books are left as they
+    are until those books change or the table is rebuilt.
+
+    Args:
+        db (Session): Database session.
+        book_ids (list[int]): Books to refresh.
+        k (int): Neighbours kept per book.
+
+    Returns:
+        int: Number of neighbour rows written.
+    """
+    db.execute(delete(BookNeighbour).where(BookNeighbour.book_id.in_(book_ids)))
+    readers = select(UserBook.user_id).where(UserBook.book_id.in_(book_ids))
+    rows = _load_preferences(
+        db,
+        select(UserBook.user_id, UserBook.book_id, PREFERENCE).where(
+            UserBook.user_id.in_(readers)
+        ),
+    )
+    if not len(rows):
+        return 0
+
+    matrix, item_ids = _rating_matrix(rows)
+    # norms must cover every reader of a book, not only the loaded users
+    squares = {}
+    for start in range(0, len(item_ids), 10_000):
+        chunk = item_ids[start : start + 10_000].tolist()
+        squares.update(
+            db.execute(
+                select(UserBook.book_id, func.sum(PREFERENCE * PREFERENCE))
+                .where(UserBook.book_id.in_(chunk))
+                .group_by(UserBook.book_id)
+            ).all()
+        )
+    norms = np.sqrt([float(squares.get(int(i), 0.0)) for i in item_ids])
+
+    targets = np.flatnonzero(np.isin(item_ids, book_ids))
+    neighbours = _top_neighbours(_cosine(matrix, norms, targets), targets, item_ids, k)
+    if neighbours:
+        db.execute(insert(BookNeighbour), neighbours)
+    return len(neighbours)
+
+
+@job_queue.register(RECOMMENDATIONS_JOB, delay=settings.RECOMMENDATIONS_REFRESH_SECONDS)
+def refresh_changed_neighbours(db: Session, batch: list[Row]) -> None:
+    """Job refreshing the neighbours of books touched by shelf changes"""
+    refresh_neighbours(
+        db, [int(job.key) for job in batch], settings.RECOMMENDATION_NEIGHBOURS
+    )
+
+
+async def drop_neighbours(db: AsyncSession, book_id: int) -> None:
+    """Deletes the neighbour rows of a book in both directions.
+
+    Runs in the caller's transaction, before the book itself is deleted.
+    Books that listed it as a neighbour are queued for a refresh, which
+    fills their lists up again.
+
+    Args:
+        db (AsyncSession): Database session.
+        book_id (int): ID of the book going away.
+    """
+    await db.execute(delete(BookNeighbour).where(BookNeighbour.book_id == book_id))
+    listed_by = await db.scalars(
+        delete(BookNeighbour)
+        .where(BookNeighbour.neighbour_id == book_id)
+        .returning(BookNeighbour.book_id)
+    )
+    await job_queue.enqueue(db, RECOMMENDATIONS_JOB, listed_by.all())
+
+
+async def recommend_books(
+    db: AsyncSession, user_id: int, limit: int
+) -> list[tuple[Book, float]]:
+    """Recommends books similar to the ones on a user's shelf.
+
+    Looks up the precomputed neighbours of the user's strongest
+    preferences and merges them, weighted by preference. Users with an
+    empty shelf, or whose books have no neighbours yet, get the best
+    rated books instead (score 0).
+
+    Args:
+        db (AsyncSession): Database session.
+        user_id (int): ID of the user.
+        limit (int): Maximum number of books to return.
+
+    Returns:
+        list[tuple[Book, float]]: Books with their scores, best first.
+    """
+    shelf = (
+        await db.execute(
+            select(UserBook.book_id, PREFERENCE).where(UserBook.user_id == user_id)
+        )
+    ).all()
+    shelved = {book_id for book_id, _ in shelf}
+    weights = dict(heapq.nlargest(MAX_SEEDS, shelf, key=lambda row: row[1]))
+
+    scores = defaultdict(float)
+    if weights:
+        rows = await db.execute(
+            select(
+                BookNeighbour.book_id, BookNeighbour.neighbour_id, BookNeighbour.score
+            ).where(BookNeighbour.book_id.in_(weights))
+        )
+        for book_id, neighbour_id, score in rows:
+            if neighbour_id not in shelved:
+                scores[neighbour_id] += score * float(weights[book_id])
+
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    if not top:
+        fallback = await db.execute(
+            select(Book)
+            .where(Book.rating_count > 0, Book.id.not_in(shelved))
+            .order_by(Book.average_rating.desc(), Book.rating_count.desc())
+            .limit(limit)
+        )
+        return [(book, 0.0) for book in fallback.scalars()]
+
+    result = await db.execute(select(Book).where(Book.id.in_([i for i, _ in top])))
+    books = {book.id: book for book in result.scalars()}
+    return [(books[book_id], score) for book_id, score in top if book_id in books]
@@ -0,0 +1,133 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.metrics import Counter, Family, Gauge, Histogram
+
+# label of requests that matched no route, keeps 404 scans from adding series
+UNMATCHED = "unmatched"
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+@dataclass
+class RequestStats:
+    """SQL work done while serving one request"""
+
+    statements: int = 0
+    db_seconds: float = 0.0
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None
+)
+
+in_flight = Gauge("http_requests_in_flight", "Requests currently being served")
+requests_total = Family(
+    Counter,
+    "http_requests_total",
+    "Requests served, by route template and status code",
+    ("method", "router", "route", "status"),
+)
+request_seconds = Family(
+    Histogram,
+    "http_request_duration_seconds",
+    "Time to serve a request, by route template",
+    ("method", "router", "route"),
+)
+request_db_seconds = Family(
+    Histogram,
+    "http_request_db_seconds",
+    "Time spent in SQL statements per request",
+    ("method", "router", "route"),
+)
+request_statements = Family(
+    Histogram,
+    "http_request_db_statements",
+    "SQL statements executed per request",
+    ("method", "router", "route"),
+    buckets=STATEMENT_BUCKETS,
+)
+statement_seconds = Histogram(
+    "db_statement_duration_seconds", "Duration of single SQL statements"
+)
+statements_total = Counter("db_statements_total", "SQL statements executed")
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Times the statements of an engine and adds them to the current request.
+
+    Args:
+        engine (Engine): Engine to instrument, `sync_engine` of an async one.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+        statement_seconds.observe(elapsed)
+        statements_total.inc()
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("statement_started"):
+            connection.info["statement_started"].pop()
+
+
+class MetricsMiddleware:
+    """Records latency, status and SQL work of every HTTP request.
+
+    Labels use the route template (/books/{book_id}) and the tag of the
+    router that served it, never the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            current_request.reset(token)
+
+            # the router stores the matched route in the scope
+            route = scope.get("route")
+            template = getattr(route, "path", UNMATCHED)
+            tags = getattr(route, "tags", None)
+            router = str(tags[0]) if tags else "none"
+            method = scope["method"]
+            requests_total.labels(method, router, template, str(status)).inc()
+            request_seconds.labels(method, router, template).observe(elapsed)
+            request_db_seconds.labels(method, router, template).observe(
+                stats.db_seconds
+            )
+            request_statements.labels(method, router, template).observe(
+                stats.statements
+            )
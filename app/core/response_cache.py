@@ -0,0 +1,310 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from threading import Lock
+from urllib.parse import parse_qsl, urlencode
+
+from config import settings
+from models.db_models import Book
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+
+from core.metrics import Counter
+
+# tag of every cached list page, any change to any book may affect them
+LIST_TAG = "books"
+STALE_TAGS_KEY = "response_cache_stale_tags"
+# request state flag set when a read replica rendered the response
+REPLICA_READ_STATE = "replica_read"
+# cached routes: path pattern -> function giving the tags of a matched path
+CACHED_ROUTES = (
+    (re.compile(r"/books/"), lambda match: {LIST_TAG}),
+    (re.compile(r"/books/(\d+)"), lambda match: {f"book:{int(match[1])}"}),
+)
+# response headers replayed from the cache, others are per request
+STORED_HEADERS = {b"content-type", b"x-next-cursor"}
+
+
+def book_tags(book_id: int) -> set[str]:
+    """Tags of the cached responses that show a book"""
+    return {LIST_TAG, f"book:{book_id}"}
+
+
+@dataclass
+class CachedResponse:
+    """A cached 200 response with its validators"""
+
+    body: bytes
+    headers: list[tuple[bytes, bytes]]
+    etag: str
+    last_modified: float
+    expires_at: float
+    tags: set[str]
+    # route that rendered it, put back into the scope of cache hits
+    route: object = None
+
+
+class ResponseCache:
+    """LRU cache of serialized GET responses bounded by total body size.
+
+    Entries are tagged with what they show and dropped when it changes.
+    Writes done by another worker process are only seen when the entry
+    expires, so the TTL bounds how stale a response can be.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = Counter("response_cache_hits_total", "Response cache hits")
+        self.misses = Counter("response_cache_misses_total", "Response cache misses")
+        self.not_modified = Counter(
+            "response_cache_not_modified_total", "Conditional GETs answered with 304"
+        )
+        # bumped on every invalidation, a response rendered while it changed
+        # may hold data from before a write and is not stored
+        self.version = 0
+        self.invalidated_at = float("-inf")
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Live entry for a key, None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits.inc()
+            return entry
+
+    def store(
+        self,
+        key: str,
+        body: bytes,
+        headers: list[tuple[bytes, bytes]],
+        tags: set[str],
+        version: int | None,
+        route: object = None,
+    ) -> CachedResponse:
+        """Builds an entry for a response and stores it if still current.
+
+        Args:
+            key (str): Cache key of the request.
+            body (bytes): Response body.
+            headers (list): Response headers to replay.
+            tags (set[str]): What the response shows, see book_tags.
+            version (int | None): Cache version read before the response was
+                rendered, None to never store it.
+            route (object): Matched route, for request metrics.
+
+        Returns:
+            CachedResponse: The entry, also when it wasn't stored.
+        """
+        entry = CachedResponse(
+            body=body,
+            headers=headers,
+            etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+            last_modified=time.time(),
+            expires_at=time.monotonic() + self.ttl,
+            tags=tags,
+            route=route,
+        )
+        with self._lock:
+            if version != self.version or len(body) > self.max_bytes:
+                return entry
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self.size += len(body)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags: set[str]) -> None:
+        """Drops all entries with any of the given tags"""
+        with self._lock:
+            self.version += 1
+            self.invalidated_at = time.monotonic()
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def changed_within(self, seconds: float) -> bool:
+        """Whether anything was invalidated in the last `seconds`"""
+        return time.monotonic() - self.invalidated_at < seconds
+
+    def snapshot(self) -> dict:
+        """Size, hit and miss counters of the cache"""
+        hits, misses = self.hits.value, self.misses.value
+        total = hits + misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "not_modified": self.not_modified.value,
+            "hit_ratio": hits / total if total else None,
+        }
+
+
+def _is_fresh(request_headers: Headers, entry: CachedResponse) -> bool:
+    """Whether a conditional GET can be answered with 304"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.last_modified) <= since
+    return False
+
+
+class ResponseCacheMiddleware:
+    """Serves GETs of the book read routes from a ResponseCache.
+
+    Every cached response carries a strong ETag and Last-Modified, and
+    conditional requests that still match get a 304 without reaching the
+    route handler or the database.
+
+    `replica_lag` is how long after an invalidation responses rendered by
+    a read replica are not stored.
+    """
+
+    def __init__(self, app, cache: ResponseCache, replica_lag: float = 0.0):
+        self.app = app
+        self.cache = cache
+        self.replica_lag = replica_lag
+
+    @staticmethod
+    def _route_tags(path: str) -> set[str] | None:
+        for pattern, tags in CACHED_ROUTES:
+            match = pattern.fullmatch(path)
+            if match:
+                return tags(match)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not self.cache.ttl:
+            return await self.app(scope, receive, send)
+        tags = self._route_tags(scope["path"])
+        if tags is None:
+            return await self.app(scope, receive, send)
+
+        query = parse_qsl(scope["query_string"].decode("latin-1"), True)
+        key = scope["path"] + "?" + urlencode(sorted(query))
+        request_headers = Headers(scope=scope)
+        entry = self.cache.get(key)
+        if entry is None:
+            version = self.cache.version
+            start, chunks = None, []
+
+            async def capture(message):
+                nonlocal start
+                if message["type"] == "http.response.start":
+                    start = message
+                else:
+                    chunks.append(message.get("body", b""))
+
+            await self.app(scope, receive, capture)
+            # a replica may not have caught up with a write that just
+            # invalidated the cache, such a response is sent but not stored
+            state = scope.get("state") or {}
+            if state.get(REPLICA_READ_STATE) and self.cache.changed_within(
+                self.replica_lag
+            ):
+                version = None
+            if start["status"] != 200:
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(chunks)})
+                return
+            headers = [
+                (name, value)
+                for name, value in start["headers"]
+                if name in STORED_HEADERS
+            ]
+            entry = self.cache.store(
+                key, b"".join(chunks), headers, tags, version, scope.get("route")
+            )
+        elif entry.route is not None:
+            scope["route"] = entry.route
+
+        await self._send(entry, _is_fresh(request_headers, entry), send)
+
+    async def _send(self, entry: CachedResponse, fresh: bool, send) -> None:
+        headers = [
+            (b"etag", entry.etag.encode()),
+            (b"last-modified", formatdate(entry.last_modified, usegmt=True).encode()),
+            # clients and proxies may store it but must revalidate
+            (b"cache-control", b"no-cache"),
+        ]
+        if fresh:
+            self.cache.not_modified.inc()
+            await send(
+                {"type": "http.response.start", "status": 304, "headers": headers}
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers += entry.headers
+        headers.append((b"content-length", str(len(entry.body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_TTL_SECONDS
+)
+
+
+# Book changes made through the ORM are collected on flush and invalidated
+# on commit. Bulk Core statements, and the book_stats job that moves the
+# rating aggregates after shelf changes, call response_cache.invalidate
+# themselves.
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_tags(session, flush_context):
+    stale = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Book):
+            stale |= book_tags(obj.id)
+    if stale:
+        session.info.setdefault(STALE_TAGS_KEY, set()).update(stale)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_tags(session):
+    stale = session.info.pop(STALE_TAGS_KEY, None)
+    if stale:
+        response_cache.invalidate(stale)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_stale_tags(session, previous_transaction):
+    session.info.pop(STALE_TAGS_KEY, None)
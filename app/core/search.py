@@ -0,0 +1,302 @@
+import asyncio
+import html
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from models.db_models import BOOK_SEARCH_VECTOR, SEARCH_CONFIG, Book
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+TOKEN_RE = re.compile(r"\w+")
+# same field priorities as the A/B/C weights of BOOK_SEARCH_VECTOR
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "description": 1.0}
+HIGHLIGHT_FIELDS = ("title", "author", "description")
+# ts_headline marks matches with control characters, which HTML text can't
+# contain, so the headline can be escaped before they become <mark> tags
+HEADLINE_START, HEADLINE_STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = (
+    f'StartSel="{HEADLINE_START}", StopSel="{HEADLINE_STOP}", HighlightAll=true'
+)
+
+
+@dataclass
+class SearchHit:
+    """A book matching a search query"""
+
+    book: Book
+    score: float
+    highlights: dict[str, str] = field(default_factory=dict)
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Splits text into lowercase word tokens"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def trigrams(term: str) -> set[str]:
+    """Character trigrams of a term, padded the way pg_trgm does it"""
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def highlight(text: str, terms: set[str]) -> str:
+    """HTML-escaped text with the given terms wrapped in <mark> tags"""
+    parts = []
+    position = 0
+    for match in TOKEN_RE.finditer(text):
+        if match[0].lower() in terms:
+            parts.append(html.escape(text[position : match.start()]))
+            parts.append(f"<mark>{html.escape(match[0])}</mark>")
+            position = match.end()
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+
+def mark_headline(headline: str) -> str:
+    """HTML-escaped ts_headline output with its matches in <mark> tags"""
+    return (
+        html.escape(headline)
+        .replace(HEADLINE_START, "<mark>")
+        .replace(HEADLINE_STOP, "</mark>")
+    )
+
+
+class InvertedIndex:
+    """In-process full-text index with typo-tolerant term matching.
+
+    Query terms missing from the vocabulary are matched to indexed terms
+    with a similar set of trigrams, like pg_trgm's `%` operator.
+    """
+
+    def __init__(self, min_similarity: float = 0.4):
+        self.min_similarity = min_similarity
+        self.postings: dict[str, dict[int, float]] = {}
+        self.term_trigrams: dict[str, set[str]] = defaultdict(set)
+        self.documents: dict[int, set[str]] = {}
+
+    def add(self, book_id: int, fields: dict[str, str | None]) -> None:
+        """Indexes a book, replacing its previous version.
+
+        Args:
+            book_id (int): ID of the book.
+            fields (dict): Field name to text, see FIELD_WEIGHTS.
+        """
+        self.remove(book_id)
+        weights = defaultdict(float)
+        for name, text in fields.items():
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS[name]
+
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                for gram in trigrams(term):
+                    self.term_trigrams[gram].add(term)
+            self.postings[term][book_id] = weight
+        self.documents[book_id] = set(weights)
+
+    def remove(self, book_id: int) -> None:
+        """Drops a book from the index"""
+        for term in self.documents.pop(book_id, ()):
+            posting = self.postings[term]
+            posting.pop(book_id, None)
+            if not posting:
+                del self.postings[term]
+                for gram in trigrams(term):
+                    self.term_trigrams[gram].discard(term)
+
+    def expand(self, term: str) -> dict[str, float]:
+        """Indexed terms matching a query term, with their similarity.
+
+        Args:
+            term (str): Query term.
+
+        Returns:
+            dict[str, float]: Indexed term to similarity in (0, 1].
+        """
+        if term in self.postings:
+            return {term: 1.0}
+        grams = trigrams(term)
+        shared = Counter(
+            candidate
+            for gram in grams
+            for candidate in self.term_trigrams.get(gram, ())
+        )
+        matches = {}
+        for candidate, common in shared.items():
+            similarity = common / (len(grams) + len(trigrams(candidate)) - common)
+            if similarity >= self.min_similarity:
+                matches[candidate] = similarity
+        return matches
+
+    def search(self, query: str) -> tuple[list[tuple[int, float]], set[str]]:
+        """Ranks indexed books against a query.
+
+        Args:
+            query (str): Free text query.
+
+        Returns:
+            tuple: (book id, score) pairs best first, and the indexed terms
+                that matched, for highlighting.
+        """
+        scores = defaultdict(float)
+        matched = set()
+        total = len(self.documents) or 1
+        for term in set(tokenize(query)):
+            for candidate, similarity in self.expand(term).items():
+                posting = self.postings[candidate]
+                idf = math.log(1 + total / len(posting))
+                for book_id, weight in posting.items():
+                    scores[book_id] += similarity * idf * weight
+                matched.add(candidate)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked, matched
+
+
+class BookSearch:
+    """Ranked book search over title, author and description.
+
+    On PostgreSQL the query runs against the GIN full-text and trigram
+    indexes declared on the books table. Other databases (SQLite in local
+    runs) use an InvertedIndex built on first use and kept current by the
+    book write paths of this process.
+    """
+
+    def __init__(self):
+        self.index = InvertedIndex()
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    async def search(
+        self, db: AsyncSession, query: str, skip: int, limit: int, with_highlights: bool
+    ) -> list[SearchHit]:
+        """Finds books matching a query, best matches first.
+
+        Args:
+            db (AsyncSession): Database session.
+            query (str): Free text query, typos are tolerated.
+            skip (int): Number of hits to skip (for pagination).
+            limit (int): Maximum number of hits to return.
+            with_highlights (bool): Whether to mark matched words.
+
+        Returns:
+            list[SearchHit]: Matching books with scores.
+        """
+        if db.bind.dialect.name == "postgresql":
+            return await self._search_postgres(db, query, skip, limit, with_highlights)
+        return await self._search_in_process(db, query, skip, limit, with_highlights)
+
+    async def _search_postgres(self, db, query, skip, limit, with_highlights):
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        similarity = func.greatest(
+            func.similarity(Book.title, query), func.similarity(Book.author, query)
+        )
+        rank = (func.ts_rank_cd(BOOK_SEARCH_VECTOR, tsquery) + similarity).label("rank")
+        page = (
+            select(Book.id, rank)
+            .where(
+                or_(
+                    BOOK_SEARCH_VECTOR.op("@@")(tsquery),
+                    Book.title.op("%")(query),
+                    Book.author.op("%")(query),
+                )
+            )
+            .order_by(rank.desc(), Book.id)
+            .offset(skip)
+            .limit(limit)
+            .subquery()
+        )
+
+        # headlines are expensive, build them for the returned page only
+        columns = [Book, page.c.rank]
+        if with_highlights:
+            columns += [
+                func.ts_headline(
+                    SEARCH_CONFIG, getattr(Book, name), tsquery, HEADLINE_OPTIONS
+                )
+                for name in HIGHLIGHT_FIELDS
+            ]
+        rows = await db.execute(
+            select(*columns)
+            .join(page, page.c.id == Book.id)
+            .order_by(page.c.rank.desc(), Book.id)
+        )
+
+        hits = []
+        for book, score, *headlines in rows:
+            marked = {
+                name: mark_headline(text)
+                for name, text in zip(HIGHLIGHT_FIELDS, headlines)
+                if text and HEADLINE_START in text
+            }
+            hits.append(SearchHit(book=book, score=score, highlights=marked))
+        return hits
+
+    async def _ensure_loaded(self, db: AsyncSession) -> None:
+        async with self._lock:
+            if self.loaded:
+                return
+            rows = await db.stream(
+                select(
+                    Book.id, Book.title, Book.author, Book.description
+                ).execution_options(yield_per=1000)
+            )
+            async for book_id, title, author, description in rows:
+                self.index.add(
+                    book_id,
+                    {"title": title, "author": author, "description": description},
+                )
+            self.loaded = True
+
+    async def _search_in_process(self, db, query, skip, limit, with_highlights):
+        await self._ensure_loaded(db)
+        ranked, matched = self.index.search(query)
+        ranked = ranked[skip : skip + limit]
+        if not ranked:
+            return []
+
+        result = await db.execute(
+            select(Book).where(Book.id.in_([i for i, _ in ranked]))
+        )
+        books = {book.id: book for book in result.scalars()}
+
+        hits = []
+        for book_id, score in ranked:
+            book = books.get(book_id)
+            if book is None:
+                continue
+            marked = {}
+            if with_highlights:
+                for name in HIGHLIGHT_FIELDS:
+                    text = getattr(book, name)
+                    if text and matched.intersection(tokenize(text)):
+                        marked[name] = highlight(text, matched)
+            hits.append(SearchHit(book=book, score=score, highlights=marked))
+        return hits
+
+    def book_saved(self, book: Book) -> None:
+        """Keeps the in-process index current after a create or update"""
+        if self.loaded:
+            self.index.add(
+                book.id,
+                {
+                    "title": book.title,
+                    "author": book.author,
+                    "description": book.description,
+                },
+            )
+
+    def catalogue_changed(self) -> None:
+        """Drops the in-process index after bulk changes, it reloads on next use"""
+        self.index = InvertedIndex()
+        self.loaded = False
+
+    def book_deleted(self, book_id: int) -> None:
+        """Keeps the in-process index current after a delete"""
+        if self.loaded:
+            self.index.remove(book_id)
+
+
+book_search = BookSearch()
@@ -1,22 +1,35 @@
-from datetime import datetime, timedelta, timezone
+import secrets
+import uuid
+from datetime import UTC, datetime, timedelta
 from typing import Annotated
 
 from config import settings
-from db.session import get_db
-from fastapi import Depends, HTTPException, status
+from db.session import AsyncSessionLocal
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
-from models.db_models import User
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from models.db_models import RefreshToken, User
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.auth_cache import auth_cache
+from core.hashing import pwd_context
+from core.tokens import (
+    ACCESS,
+    REFRESH,
+    decode_token,
+    encode_token,
+    is_legacy,
+    legacy_accepted,
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
 def get_password_hash(password: str) -> str:
     """Generate a secure hash from a plain text password using bcrypt.
 
+    Blocks the calling thread, request handlers use core.hashing instead.
+
     Args:
         password (str): The plain text password to hash.
 
@@ -48,35 +61,183 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
             If None, uses default from settings.
 
     Returns:
-        str: The encoded JWT token.
+        str: The encoded JWT token, signed with the current key of
+            core.tokens.
 
     Example:
         >>> create_access_token({"sub": "username"})
-        'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...'
+        'eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCIsImtpZCI6...'
     """
+    if expires_delta is None:
+        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    now = datetime.now(UTC)
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
+    to_encode.update(
+        {
+            "typ": ACCESS,
+            "iat": int(now.timestamp()),
+            "exp": int((now + expires_delta).timestamp()),
+        }
+    )
+    return encode_token(to_encode)
+
+
+async def create_refresh_token(
+    db: AsyncSession, user: User, family: str | None = None
+) -> str:
+    """Create a refresh token and record it for a single exchange.
+
+    The caller is responsible for committing.
+
+    Args:
+        db (AsyncSession): Database session.
+        user (User): User the token is issued to.
+        family (str | None): Family of the exchanged token, None starts a
+            new one (on login).
+
+    Returns:
+        str: The encoded JWT token.
+    """
+    now = datetime.now(UTC)
+    expires_at = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    jti = uuid.uuid4().hex
+    family = family or jti
+    # expired tokens of the user are of no use any more
+    await db.execute(
+        delete(RefreshToken).where(
+            RefreshToken.user_id == user.id, RefreshToken.expires_at <= now
         )
+    )
+    db.add(RefreshToken(jti=jti, user_id=user.id, family=family, expires_at=expires_at))
+    return encode_token(
+        {
+            "sub": user.username,
+            "typ": REFRESH,
+            "jti": jti,
+            "fam": family,
+            "iat": int(now.timestamp()),
+            "exp": int(expires_at.timestamp()),
+        }
+    )
+
+
+async def issue_tokens(db: AsyncSession, user: User, family: str | None = None) -> dict:
+    """Token response with a new access and refresh token.
+
+    The caller is responsible for committing.
+    """
+    return {
+        "access_token": create_access_token(data={"sub": user.username}),
+        "refresh_token": await create_refresh_token(db, user, family),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+async def redeem_refresh_token(db: AsyncSession, token: str) -> tuple[User, str] | None:
+    """Marks a refresh token as used and returns whom it was issued to.
+
+    A token can be exchanged once. Presenting it again means someone else
+    holds a copy, so the whole family, including the token the legitimate
+    client got in exchange, is revoked and committed right away.
+
+    Args:
+        db (AsyncSession): Database session.
+        token (str): The raw JWT.
 
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+    Returns:
+        tuple[User, str] | None: The user and the token family, None if the
+            token is invalid, expired, revoked or used before.
+    """
+    claims = decode_token(token, REFRESH)
+    if claims is None:
+        return None
+    now = datetime.now(UTC)
+    # a single conditional UPDATE, so concurrent exchanges cannot both win
+    user_id = await db.scalar(
+        update(RefreshToken)
+        .where(
+            RefreshToken.jti == claims.get("jti"),
+            RefreshToken.used_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(used_at=now)
+        .returning(RefreshToken.user_id)
     )
-    return encoded_jwt
+    if user_id is None:
+        await db.execute(
+            delete(RefreshToken).where(RefreshToken.family == claims.get("fam"))
+        )
+        await db.commit()
+        return None
+    user = await db.get(User, user_id)
+    return None if user is None else (user, claims["fam"])
+
+
+async def token_subject(token: str) -> str | None:
+    """Username a valid access token was issued to.
+
+    Verified tokens are cached until they expire, so repeated calls with
+    the same token skip even the signature check.
+
+    Args:
+        token (str): The raw JWT.
+
+    Returns:
+        str | None: The "sub" claim, None if the token is invalid or expired.
+    """
+    username = await auth_cache.get_token_subject(token)
+    # a cached HS256 token stops working at LEGACY_HS256_UNTIL like any other
+    if username is not None and (legacy_accepted() or not is_legacy(token)):
+        return username
+    payload = decode_token(token, ACCESS)
+    if payload is None:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    await auth_cache.set_token_subject(token, username, payload.get("exp"))
+    return username
 
 
-def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)
-) -> User:
+async def client_identity(request: Request) -> str:
+    """Who sent a request: the token's user if valid, the client IP otherwise"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        username = await token_subject(token)
+        if username is not None:
+            return "user:" + username
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+async def require_internal_token(request: Request) -> None:
+    """Guards the telemetry endpoints with the shared INTERNAL_TOKEN.
+
+    Args:
+        request (Request): Incoming request.
+
+    Raises:
+        HTTPException: 404 while INTERNAL_TOKEN is unset, so the endpoints
+            look absent, 401 if the bearer token is missing or wrong.
+    """
+    if not settings.INTERNAL_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), settings.INTERNAL_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
     """Get the current authenticated user from a JWT token.
 
     Args:
         token (str): The JWT token from the Authorization header.
-        db (Session): Database session dependency.
 
     Returns:
         User: The authenticated user model.
@@ -85,24 +246,29 @@ def get_current_user(
         HTTPException: 401 if token is invalid or user not found.
 
     Note:
-        This is designed to be used as a FastAPI dependency.
+        This is designed to be used as a FastAPI dependency. Verified tokens
+        and resolved users are cached (see core.auth_cache), so repeated
+        calls with the same token skip both JWT decoding and the DB query.
+        Only a cache miss opens a short session on the primary, so handlers
+        that read from a replica hold no primary connection.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except Exception:
+    username = await token_subject(token)
+    if username is None:
         raise credentials_exception
 
-    user = db.query(User).filter(User.username == username).first()
+    user = await auth_cache.get_user(username)
+    if user is not None:
+        return user
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(User).where(User.username == username))
+        user = result.scalars().first()
     if user is None:
         raise credentials_exception
+    await auth_cache.set_user(user)
     return user
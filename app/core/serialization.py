@@ -0,0 +1,39 @@
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+class ORJSONResponse(Response):
+    """JSON response encoded with orjson.
+
+    Returned directly from a handler it skips FastAPI's response model
+    validation and jsonable_encoder, so the content must already have the
+    documented shape.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def model_columns(api_model: type[BaseModel], db_model: type) -> tuple[tuple, list]:
+    """Fields of an API model and the matching columns of a table.
+
+    Args:
+        api_model (type[BaseModel]): Response model, its field order is kept.
+        db_model (type): Mapped class that has a column for every field.
+
+    Returns:
+        tuple: (field names, columns) for select(*columns).
+    """
+    fields = tuple(api_model.model_fields)
+    return fields, [getattr(db_model, name) for name in fields]
+
+
+def rows_as_dicts(rows: Iterable[Sequence], fields: tuple[str, ...]) -> list[dict]:
+    """Plain dicts from row tuples, without per-row model validation"""
+    return [dict(zip(fields, row)) for row in rows]
@@ -0,0 +1,207 @@
+from dataclasses import replace
+
+from db.aggregates import ShelfEntry, affects_aggregates, rebuild_book_stats
+from db.dialect import upsert_insert
+from db.trending import add_trending_scores, timestamp, trending_amounts
+from db.user_stats import apply_user_stat_changes
+from models.api_models import ShelfOperation
+from models.db_models import Book, UserBook
+from sqlalchemy import Row, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.jobs import job_queue, jobs
+from core.recommendations import RECOMMENDATIONS_JOB
+from core.response_cache import book_tags, response_cache
+
+user_books = UserBook.__table__
+
+# job kinds keyed by book ID
+BOOK_STATS_JOB = "book_stats"
+TRENDING_JOB = "trending"
+
+
+def _book_ids(batch: list[Row]) -> list[int]:
+    return [int(job.key) for job in batch]
+
+
+def _invalidate_books(batch: list[Row]) -> None:
+    """Drops cached reads of books whose aggregates were recomputed"""
+    response_cache.invalidate(
+        set().union(*(book_tags(book_id) for book_id in _book_ids(batch)))
+    )
+
+
+@job_queue.register(BOOK_STATS_JOB, after_commit=_invalidate_books)
+def recompute_book_stats(db: Session, batch: list[Row]) -> None:
+    """Job recomputing the rating aggregates of books whose shelves changed"""
+    rebuild_book_stats(db, _book_ids(batch))
+
+
+@job_queue.register(TRENDING_JOB)
+def add_trending_activity(db: Session, batch: list[Row]) -> None:
+    """Job adding the summed shelf activity of books to their scores.
+
+    Activity merged into a waiting job counts as of the job's first
+    enqueue, seconds apart in practice.
+    """
+    add_trending_scores(
+        db, {int(job.key): (job.amount, timestamp(job.enqueued_at)) for job in batch}
+    )
+
+
+async def enqueue_shelf_jobs(
+    db: AsyncSession, changes: list[tuple[int, ShelfEntry | None, ShelfEntry | None]]
+) -> None:
+    """Queues the derived data of shelf mutations, in the caller's transaction.
+
+    Book aggregates, trending scores and recommendations are updated by
+    background jobs once the shelf rows are committed, so a write doesn't
+    wait for them and contend on popular books' rows. Repeated changes to
+    a book coalesce into one recompute.
+
+    Args:
+        db (AsyncSession): Database session.
+        changes (list): (book_id, old entry, new entry) triples, where
+            None stands for "no row".
+    """
+    await job_queue.enqueue(
+        db,
+        BOOK_STATS_JOB,
+        {book_id for book_id, old, new in changes if affects_aggregates(old, new)},
+    )
+    await job_queue.enqueue(db, TRENDING_JOB, trending_amounts(changes))
+    await job_queue.enqueue(
+        db, RECOMMENDATIONS_JOB, {book_id for book_id, _, _ in changes}
+    )
+
+
+async def remove_book_from_shelves(db: AsyncSession, book_id: int) -> None:
+    """Takes a book off every shelf, in the caller's transaction.
+
+    Runs before the book itself is deleted. Its owners' reading statistics
+    change as if each of them removed it, and jobs still queued for the
+    book are dropped, its aggregates and score go away with it.
+
+    Args:
+        db (AsyncSession): Database session.
+        book_id (int): ID of the book going away.
+    """
+    shelved = await db.execute(
+        delete(user_books)
+        .where(user_books.c.book_id == book_id)
+        .returning(user_books.c.user_id, user_books.c.status, user_books.c.rating)
+    )
+    for user_id, status, rating in shelved.all():
+        await apply_user_stat_changes(
+            db, user_id, [(book_id, ShelfEntry(status, rating), None)]
+        )
+    await db.execute(
+        delete(jobs).where(
+            jobs.c.kind.in_((BOOK_STATS_JOB, TRENDING_JOB, RECOMMENDATIONS_JOB)),
+            jobs.c.key == str(book_id),
+        )
+    )
+
+
+async def apply_shelf_operations(
+    db: AsyncSession, user_id: int, operations: list[ShelfOperation]
+) -> tuple[list[str | None], dict[int, UserBook]]:
+    """Applies a batch of shelf operations in a single transaction.
+
+    Operations are replayed in order against the current shelf in memory,
+    an invalid one is skipped with an error without affecting the rest.
+    The final state is then written with one upsert and one delete
+    statement, together with the user's reading statistics and the jobs
+    updating the books, and committed.
+
+    Args:
+        db (AsyncSession): Database session.
+        user_id (int): ID of the shelf owner.
+        operations (list[ShelfOperation]): Operations in client order.
+
+    Returns:
+        tuple: Error message (None on success) of every operation, and
+            the shelf rows of the touched books after the batch.
+    """
+    book_ids = {operation.book_id for operation in operations}
+    rows = await db.execute(
+        select(UserBook.book_id, UserBook.status, UserBook.rating).where(
+            UserBook.user_id == user_id, UserBook.book_id.in_(book_ids)
+        )
+    )
+    current = {book_id: ShelfEntry(status, rating) for book_id, status, rating in rows}
+    known_books = set(
+        (await db.scalars(select(Book.id).where(Book.id.in_(book_ids)))).all()
+    )
+
+    shelf = dict(current)
+    errors = []
+    for operation in operations:
+        entry = shelf.get(operation.book_id)
+        error = None
+        if operation.op == "add":
+            if operation.book_id in known_books:
+                shelf[operation.book_id] = ShelfEntry(
+                    operation.status, operation.rating
+                )
+            else:
+                error = "Book not found"
+        elif entry is None:
+            error = "Book not found in user's list"
+        elif operation.op == "update":
+            fields = operation.model_dump(
+                include={"status", "rating"}, exclude_unset=True
+            )
+            shelf[operation.book_id] = replace(entry, **fields)
+        else:
+            shelf[operation.book_id] = None
+        errors.append(error)
+
+    changes = [
+        (book_id, current.get(book_id), entry)
+        for book_id, entry in shelf.items()
+        if entry != current.get(book_id)
+    ]
+    upserts = [
+        {
+            "user_id": user_id,
+            "book_id": book_id,
+            "status": entry.status,
+            "rating": entry.rating,
+        }
+        for book_id, _, entry in changes
+        if entry is not None
+    ]
+    removed = [book_id for book_id, _, entry in changes if entry is None]
+
+    if upserts:
+        stmt = upsert_insert(db.bind.dialect.name, user_books)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[user_books.c.user_id, user_books.c.book_id],
+                set_={
+                    "status": stmt.excluded.status,
+                    "rating": stmt.excluded.rating,
+                    "updated_at": func.now(),
+                },
+            ),
+            upserts,
+        )
+    if removed:
+        await db.execute(
+            delete(UserBook).where(
+                UserBook.user_id == user_id, UserBook.book_id.in_(removed)
+            )
+        )
+    if changes:
+        await apply_user_stat_changes(db, user_id, changes)
+        await enqueue_shelf_jobs(db, changes)
+    await db.commit()
+
+    rows = await db.execute(
+        select(UserBook)
+        .where(UserBook.user_id == user_id, UserBook.book_id.in_(book_ids))
+        .execution_options(populate_existing=True)
+    )
+    return errors, {row.book_id: row for row in rows.scalars()}
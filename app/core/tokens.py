@@ -0,0 +1,299 @@
+import base64
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from itertools import pairwise
+from pathlib import Path
+
+import orjson
+from config import settings
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from jose import JWTError, jwt
+
+ACCESS = "access"
+REFRESH = "refresh"
+ALGORITHM = "RS256"
+KEY_SIZE = 2048
+# header encodings remembered besides our own, foreign encoders may order
+# or space the JSON differently
+MAX_HEADER_ALIASES = 64
+# unknown key IDs trigger a reload at most this often
+MIN_RELOAD_SECONDS = 1.0
+
+_PADDING = padding.PKCS1v15()
+_HASH = hashes.SHA256()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64int(value: int) -> str:
+    return _b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    """RSA key pair of a key ID, with the JWS header it signs under"""
+
+    kid: str
+    private_key: rsa.RSAPrivateKey
+    public_key: rsa.RSAPublicKey
+    header: str
+
+
+def _load_key(path: Path) -> SigningKey:
+    private_key = serialization.load_pem_private_key(path.read_bytes(), None)
+    header = {"alg": ALGORITHM, "typ": "JWT", "kid": path.stem}
+    return SigningKey(
+        kid=path.stem,
+        private_key=private_key,
+        public_key=private_key.public_key(),
+        header=_b64encode(orjson.dumps(header)),
+    )
+
+
+class Keyring:
+    """RSA keys signing and verifying tokens, one PEM file per key ID.
+
+    The key with the greatest ID (IDs start with their creation time)
+    signs new tokens, the others only verify tokens issued before a
+    rotation. Parsed keys are cached per process and the directory is
+    checked again every `reload_interval` seconds, or when a token names
+    an unknown key, so a key added by `manage.py rotate-keys` is picked
+    up by every worker without a restart.
+    """
+
+    def __init__(self, directory: Path, reload_interval: float):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._keys: dict[str, SigningKey] = {}
+        # encoded JWS header -> public key, the verification fast path
+        self._by_header: dict[str, rsa.RSAPublicKey] = {}
+        self._signing: SigningKey | None = None
+        self._checked_at = float("-inf")
+        self._mtime_ns: int | None = None
+        self._lock = threading.Lock()
+
+    def _reload(self, min_age: float) -> None:
+        """Reloads the keys if the directory changed, at most every `min_age`"""
+        now = time.monotonic()
+        if now - self._checked_at < min_age:
+            return
+        with self._lock:
+            if now - self._checked_at < min_age:
+                return
+            self._checked_at = now
+            try:
+                mtime_ns = self.directory.stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime_ns = None
+            if mtime_ns == self._mtime_ns and self._keys:
+                return
+            keys = {}
+            for path in sorted(self.directory.glob("*.pem")):
+                key = self._keys.get(path.stem) or _load_key(path)
+                keys[key.kid] = key
+            self._keys = keys
+            self._by_header = {key.header: key.public_key for key in keys.values()}
+            self._signing = keys[max(keys)] if keys else None
+            self._mtime_ns = mtime_ns
+
+    def ensure_signing_key(self) -> SigningKey:
+        """Loads the keys, creating the first one if there is none yet.
+
+        Returns:
+            SigningKey: Key new tokens are signed with.
+        """
+        self._reload(self.reload_interval)
+        if self._signing is None:
+            self.rotate()
+            self._reload(0)
+        return self._signing
+
+    @property
+    def signing_key(self) -> SigningKey:
+        """Key new tokens are signed with, created if there is none yet"""
+        return self.ensure_signing_key()
+
+    def public_key(self, header: str) -> rsa.RSAPublicKey | None:
+        """Verification key of an encoded JWS header, None if unknown.
+
+        Args:
+            header (str): First segment of the token.
+
+        Returns:
+            RSAPublicKey | None: Key of the header's "kid", only for RS256.
+        """
+        self._reload(self.reload_interval)
+        key = self._by_header.get(header)
+        if key is not None:
+            return key
+        try:
+            fields = orjson.loads(_b64decode(header))
+            kid, algorithm = fields["kid"], fields["alg"]
+        except (ValueError, TypeError, KeyError):
+            return None
+        if algorithm != ALGORITHM or not isinstance(kid, str):
+            return None
+        if kid not in self._keys:
+            self._reload(MIN_RELOAD_SECONDS)
+        signing_key = self._keys.get(kid)
+        if signing_key is None:
+            return None
+        if len(self._by_header) < len(self._keys) + MAX_HEADER_ALIASES:
+            self._by_header[header] = signing_key.public_key
+        return signing_key.public_key
+
+    def rotate(self, keep_seconds: float | None = None) -> str:
+        """Creates a new signing key and drops old ones.
+
+        Args:
+            keep_seconds (float | None): Keys replaced longer ago than this
+                are deleted; None keeps every key.
+
+        Returns:
+            str: ID of the new key.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # microseconds, so keys created within a second still sort by age
+        created = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")
+        kid = f"{created}-{secrets.token_hex(4)}"
+        private_key = rsa.generate_private_key(65537, KEY_SIZE)
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        # written under a temporary name and renamed, readers never see
+        # a partial file
+        temporary = self.directory / f".{kid}.tmp"
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(pem)
+        temporary.rename(self.directory / f"{kid}.pem")
+
+        if keep_seconds is not None:
+            # a key signed tokens until its successor was created
+            cutoff = time.time() - keep_seconds
+            paths = sorted(self.directory.glob("*.pem"))
+            for path, successor in pairwise(paths):
+                if successor.stat().st_mtime < cutoff:
+                    path.unlink()
+        return kid
+
+    def jwks(self) -> dict:
+        """Public keys as a JSON Web Key Set"""
+        self._reload(self.reload_interval)
+        keys = []
+        for kid, key in self._keys.items():
+            numbers = key.public_key.public_numbers()
+            keys.append(
+                {
+                    "kty": "RSA",
+                    "use": "sig",
+                    "alg": ALGORITHM,
+                    "kid": kid,
+                    "n": _b64int(numbers.n),
+                    "e": _b64int(numbers.e),
+                }
+            )
+        return {"keys": keys}
+
+
+keyring = Keyring(Path(settings.TOKEN_KEYS_DIR), settings.TOKEN_KEYS_RELOAD_SECONDS)
+
+
+def encode_token(claims: dict) -> str:
+    """Signs claims as a compact RS256 JWT with the current key"""
+    key = keyring.signing_key
+    signing_input = f"{key.header}.{_b64encode(orjson.dumps(claims))}"
+    signature = key.private_key.sign(signing_input.encode("ascii"), _PADDING, _HASH)
+    return f"{signing_input}.{_b64encode(signature)}"
+
+
+def _legacy_until(until: datetime | None) -> float | None:
+    """UNIX time of the end of the HS256 window, naive datetimes are UTC"""
+    if until is None:
+        return None
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=UTC)
+    return until.timestamp()
+
+
+LEGACY_UNTIL = _legacy_until(settings.LEGACY_HS256_UNTIL)
+
+
+def legacy_accepted() -> bool:
+    """Whether HS256 tokens signed with SECRET_KEY are still accepted"""
+    return LEGACY_UNTIL is not None and time.time() < LEGACY_UNTIL
+
+
+def is_legacy(token: str) -> bool:
+    """Whether a token is signed by none of the keyring's keys"""
+    return keyring.public_key(token.partition(".")[0]) is None
+
+
+def _decode_legacy(token: str) -> dict | None:
+    """Claims of an HS256 access token signed with SECRET_KEY.
+
+    Tokens issued before the switch to key pairs are accepted during the
+    migration window only, until LEGACY_HS256_UNTIL. After it the shared
+    secret grants no access, whatever the expiry of the token, so "exp"
+    is capped there and caches keyed by the token drop it in time.
+    """
+    if not legacy_accepted():
+        return None
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    claims["exp"] = min(claims.get("exp", LEGACY_UNTIL), LEGACY_UNTIL)
+    return claims
+
+
+def decode_token(token: str, token_type: str) -> dict | None:
+    """Verifies a token and returns its claims.
+
+    Only what is needed is checked: the signature against the cached key
+    of the header, the token type and the expiry. Unlike a general JWT
+    library this skips per-call key parsing and optional claim checks.
+
+    Args:
+        token (str): Compact JWT.
+        token_type (str): ACCESS or REFRESH.
+
+    Returns:
+        dict | None: Claims, None if the token is malformed, forged,
+            expired or of another type.
+    """
+    header, _, rest = token.partition(".")
+    payload, _, signature = rest.partition(".")
+    public_key = keyring.public_key(header)
+    if public_key is None:
+        return _decode_legacy(token) if token_type == ACCESS else None
+    try:
+        public_key.verify(
+            _b64decode(signature),
+            f"{header}.{payload}".encode("ascii"),
+            _PADDING,
+            _HASH,
+        )
+        claims = orjson.loads(_b64decode(payload))
+    except (InvalidSignature, ValueError, TypeError):
+        return None
+    if not isinstance(claims, dict) or claims.get("typ") != token_type:
+        return None
+    expires_at = claims.get("exp")
+    if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+        return None
+    return claims
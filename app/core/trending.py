@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+
+from config import settings
+from db.session import AsyncSessionLocal
+from db.trending import EPOCH, current_score
+from models.api_models import Book
+from models.db_models import Book as DBBook
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.metrics import Gauge
+from core.serialization import model_columns
+
+logger = logging.getLogger(__name__)
+
+BOOK_FIELDS, BOOK_COLUMNS = model_columns(Book, DBBook)
+
+
+class TrendingBoard:
+    """Top trending books of the catalogue, kept in memory.
+
+    Reloaded in the background from ix_books_trending_score_id, which
+    reads only the first `size` index entries however large the catalogue
+    is; requests are answered from the list without touching the database.
+    Scores are decayed to the time of the reload.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.books: list[dict] = []
+        self.refreshed_at: float | None = None
+        self._lock = asyncio.Lock()
+        Gauge(
+            "trending_board_age_seconds", "Time since the trending list was reloaded"
+        ).set_function(
+            lambda: (
+                0.0
+                if self.refreshed_at is None
+                else time.monotonic() - self.refreshed_at
+            )
+        )
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Reloads the top books by stored score"""
+        # the epoch comes with the scores, a rebase can't slip in between
+        rows = await db.execute(
+            select(*BOOK_COLUMNS, DBBook.trending_score, EPOCH)
+            .where(DBBook.trending_score > 0)
+            .order_by(DBBook.trending_score.desc(), DBBook.id.desc())
+            .limit(self.size)
+        )
+        now = time.time()
+        books = []
+        for row in rows:
+            book = dict(zip(BOOK_FIELDS, row))
+            book["score"] = current_score(row[-2], row[-1], now)
+            books.append(book)
+        self.books = books
+        self.refreshed_at = time.monotonic()
+
+    async def top(self, db: AsyncSession, limit: int) -> list[dict]:
+        """The `limit` best books, loading the list first if it never was"""
+        if self.refreshed_at is None:
+            async with self._lock:
+                if self.refreshed_at is None:
+                    await self.refresh(db)
+        return self.books[:limit]
+
+    def book_deleted(self, book_id: int) -> None:
+        """Drops a deleted book from this process's list before the next reload"""
+        self.books = [book for book in self.books if book["id"] != book_id]
+
+
+trending_board = TrendingBoard(settings.TRENDING_SIZE)
+
+
+async def run_trending_loop(interval: float) -> None:
+    """Reloads the trending list every `interval` seconds"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await trending_board.refresh(db)
+        except Exception:
+            logger.exception("Refreshing trending books failed")
+        await asyncio.sleep(interval)
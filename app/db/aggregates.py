@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+
+from models.db_models import Book, UserBook
+from sqlalchemy import Float, case, cast, func, select, update
+from sqlalchemy.orm import Session
+
+books = Book.__table__
+
+
+@dataclass(frozen=True)
+class ShelfEntry:
+    """State of a single user_books row that matters for aggregates"""
+
+    status: str
+    rating: int | None = None
+
+
+def entry_of(user_book: UserBook | None) -> ShelfEntry | None:
+    """Takes an aggregate-relevant snapshot of a user_books row.
+
+    Args:
+        user_book (UserBook | None): Row to snapshot, None for a missing row.
+
+    Returns:
+        ShelfEntry | None: Snapshot, or None if there is no row.
+    """
+    if user_book is None:
+        return None
+    return ShelfEntry(status=user_book.status, rating=user_book.rating)
+
+
+def _contribution(entry: ShelfEntry | None) -> tuple[int, int, int, int]:
+    """What a single shelf row adds to (rating_sum, rating_count, read, planned)"""
+    if entry is None:
+        return 0, 0, 0, 0
+    return (
+        entry.rating or 0,
+        int(entry.rating is not None),
+        int(entry.status == "read"),
+        int(entry.status == "planned"),
+    )
+
+
+def affects_aggregates(old: ShelfEntry | None, new: ShelfEntry | None) -> bool:
+    """Whether a shelf mutation changes the book's aggregates"""
+    return _contribution(old) != _contribution(new)
+
+
+def rebuild_book_stats(db: Session, book_ids: list[int] | None = None) -> int:
+    """Recomputes book aggregates from user_books in bulk.
+
+    Used for all books after imports or whenever the aggregates drift, and
+    for the books touched by shelf changes by the book_stats job. The
+    caller is responsible for committing.
+
+    Args:
+        db (Session): Database session.
+        book_ids (list[int] | None): Books to recompute, all by default.
+
+    Returns:
+        int: Number of those books that have at least one shelf entry.
+    """
+    reset = update(books)
+    totals = select(UserBook.book_id.label("book_id"))
+    if book_ids is not None:
+        reset = reset.where(books.c.id.in_(book_ids))
+        totals = totals.where(UserBook.book_id.in_(book_ids))
+    db.execute(
+        reset.values(
+            rating_sum=0,
+            rating_count=0,
+            read_count=0,
+            planned_count=0,
+            average_rating=None,
+        )
+    )
+
+    totals = (
+        totals.add_columns(
+            func.coalesce(func.sum(UserBook.rating), 0).label("rating_sum"),
+            func.count(UserBook.rating).label("rating_count"),
+            func.sum(case((UserBook.status == "read", 1), else_=0)).label("read_count"),
+            func.sum(case((UserBook.status == "planned", 1), else_=0)).label(
+                "planned_count"
+            ),
+        )
+        .group_by(UserBook.book_id)
+        .subquery()
+    )
+    result = db.execute(
+        update(books)
+        .where(books.c.id == totals.c.book_id)
+        .values(
+            rating_sum=totals.c.rating_sum,
+            rating_count=totals.c.rating_count,
+            read_count=totals.c.read_count,
+            planned_count=totals.c.planned_count,
+            average_rating=cast(totals.c.rating_sum, Float)
+            / func.nullif(totals.c.rating_count, 0),
+        )
+    )
+    return result.rowcount
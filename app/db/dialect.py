@@ -0,0 +1,23 @@
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert_insert(dialect_name: str, table: Table):
+    """INSERT construct with ON CONFLICT support for the given dialect
+
+    Args:
+        dialect_name (str): Name of the dialect, e.g. engine.dialect.name.
+        table (Table): Target table.
+
+    Returns:
+        Insert: Statement with on_conflict_do_nothing/on_conflict_do_update.
+
+    Raises:
+        NotImplementedError: For databases without ON CONFLICT.
+    """
+    try:
+        return _INSERTS[dialect_name](table)
+    except KeyError:
+        raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
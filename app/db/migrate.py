@@ -0,0 +1,114 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from db.session import engine
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+# revisions describing the schemas create_all built before migrations
+# existed: without the rating aggregates, and with them (the last one)
+BASELINE_REVISION = "0001"
+AGGREGATES_REVISION = "0002"
+
+
+class SchemaOutdated(Exception):
+    """Raised at startup when the database is not at the latest migration"""
+
+
+def alembic_config(connection: Connection | None = None) -> Config:
+    """Alembic configuration built in code, no alembic.ini needed.
+
+    Args:
+        connection (Connection | None): Connection to migrate, the env
+            script opens one from db.session.engine when omitted.
+
+    Returns:
+        Config: Configuration for alembic.command functions.
+    """
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def head_revision() -> str:
+    """Latest migration shipped with the code"""
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(connection: Connection) -> str | None:
+    """Migration the database is at, None if it was never migrated"""
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def _stamp_unversioned(connection: Connection, config: Config) -> str | None:
+    """Records the revision of a database created before migrations existed.
+
+    Databases created by the old init_db have tables but no alembic_version.
+    Those without the rating aggregate columns match the baseline revision,
+    those with them the revision that added the aggregates. The upgrade
+    that follows applies every later migration.
+
+    Returns:
+        str | None: Stamped revision, None if nothing was stamped.
+    """
+    inspector = inspect(connection)
+    if current_revision(connection) is not None or not inspector.has_table("books"):
+        return None
+    columns = {column["name"] for column in inspector.get_columns("books")}
+    if "rating_sum" in columns:
+        revision = AGGREGATES_REVISION
+        # init_db created it, AGGREGATES_REVISION drops it
+        connection.execute(text("DROP INDEX IF EXISTS idx_user_books_user_id"))
+    else:
+        revision = BASELINE_REVISION
+    command.stamp(config, revision)
+    return revision
+
+
+def upgrade(revision: str = "head") -> tuple[str | None, str]:
+    """Migrates the database, stamping pre-migration databases first.
+
+    Args:
+        revision (str): Target revision.
+
+    Returns:
+        tuple[str | None, str]: Revision before and after the upgrade.
+    """
+    with engine.begin() as connection:
+        config = alembic_config(connection)
+        _stamp_unversioned(connection, config)
+        before = current_revision(connection)
+        command.upgrade(config, revision)
+        return before, current_revision(connection)
+
+
+async def check_schema(async_engine: AsyncEngine) -> str:
+    """Fails fast when the database needs migrating.
+
+    A single query on alembic_version, meant for app startup.
+
+    Args:
+        async_engine (AsyncEngine): Engine of the request handlers.
+
+    Returns:
+        str: Current revision.
+
+    Raises:
+        SchemaOutdated: If the database is not at the latest revision.
+    """
+    async with async_engine.connect() as connection:
+        current = await connection.run_sync(current_revision)
+    head = head_revision()
+    if current != head:
+        raise SchemaOutdated(
+            f"Database schema is at revision {current}, the code expects {head}. "
+            "Run `python manage.py migrate` first."
+        )
+    return current
@@ -0,0 +1,45 @@
+"""Alembic environment, configured in code by db.migrate"""
+
+import models.db_models  # noqa: F401
+from alembic import context
+from config import settings
+from db.session import Base, engine
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Writes the migration SQL instead of running it"""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Runs the migrations on the connection given by db.migrate"""
+    connection = context.config.attributes.get("connection")
+    if connection is None:
+        with engine.connect() as connection:
+            _run(connection)
+    else:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    # batch mode: SQLite can only change constraints by copying the table
+    context.configure(
+        connection=connection, target_metadata=target_metadata, render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
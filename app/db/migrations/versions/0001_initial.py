@@ -0,0 +1,55 @@
+"""Initial schema: books, users and user_books
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "books",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("author", sa.String()),
+        sa.Column("year", sa.Integer()),
+        sa.Column("description", sa.String()),
+    )
+    op.create_index("ix_books_id", "books", ["id"])
+    op.create_index("ix_books_title", "books", ["title"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(50), nullable=False, unique=True),
+        sa.Column("email", sa.String(100), nullable=False, unique=True),
+        sa.Column("hashed_password", sa.String(128), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "user_books",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("rating", sa.Integer()),
+    )
+    op.create_index("ix_user_books_id", "user_books", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("user_books")
+    op.drop_table("users")
+    op.drop_table("books")
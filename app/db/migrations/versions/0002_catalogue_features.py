@@ -0,0 +1,128 @@
+"""Rating aggregates, pagination and search indexes, recommendations, one
+shelf row per book
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = (
+    "(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C'))"
+)
+
+BACKFILL_AGGREGATES = """
+UPDATE books SET
+    rating_sum = coalesce(
+        (SELECT sum(rating) FROM user_books WHERE book_id = books.id), 0),
+    rating_count = (
+        SELECT count(rating) FROM user_books WHERE book_id = books.id),
+    read_count = (
+        SELECT count(*) FROM user_books
+        WHERE book_id = books.id AND status = 'read'),
+    planned_count = (
+        SELECT count(*) FROM user_books
+        WHERE book_id = books.id AND status = 'planned'),
+    average_rating = (
+        SELECT avg(rating * 1.0) FROM user_books WHERE book_id = books.id)
+"""
+
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+
+    # duplicates were possible before, keep the oldest row of each book
+    op.execute(
+        "DELETE FROM user_books WHERE id NOT IN "
+        "(SELECT min(id) FROM user_books GROUP BY user_id, book_id)"
+    )
+
+    with op.batch_alter_table("books") as batch:
+        for name in ("rating_sum", "rating_count", "read_count", "planned_count"):
+            batch.add_column(
+                sa.Column(name, sa.Integer(), nullable=False, server_default="0")
+            )
+        batch.add_column(sa.Column("average_rating", sa.Float()))
+    op.execute(BACKFILL_AGGREGATES)
+
+    op.create_index("ix_books_title_id", "books", ["title", "id"])
+    op.create_index("ix_books_year_id", "books", ["year", "id"])
+    op.create_index("ix_books_average_rating_id", "books", ["average_rating", "id"])
+    if postgres:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_books_search_vector",
+            "books",
+            [sa.text(SEARCH_VECTOR)],
+            postgresql_using="gin",
+        )
+        for column in ("title", "author"):
+            op.create_index(
+                f"ix_books_{column}_trgm",
+                "books",
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+
+    with op.batch_alter_table("user_books") as batch:
+        batch.create_unique_constraint(
+            "uq_user_books_user_id_book_id", ["user_id", "book_id"]
+        )
+    # formerly created by init_db, user_id is covered by the unique constraint
+    op.execute("DROP INDEX IF EXISTS idx_user_books_user_id")
+    op.create_index(
+        "idx_user_books_book_id", "user_books", ["book_id"], if_not_exists=True
+    )
+    op.create_index(
+        "idx_user_books_status", "user_books", ["status"], if_not_exists=True
+    )
+
+    op.create_table(
+        "book_neighbours",
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), primary_key=True),
+        sa.Column(
+            "neighbour_id", sa.Integer(), sa.ForeignKey("books.id"), primary_key=True
+        ),
+        sa.Column("score", sa.Float(), nullable=False),
+    )
+    op.create_table(
+        "stale_book_neighbours",
+        sa.Column("book_id", sa.Integer(), primary_key=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stale_book_neighbours")
+    op.drop_table("book_neighbours")
+    op.drop_index("idx_user_books_status", "user_books")
+    op.drop_index("idx_user_books_book_id", "user_books")
+    with op.batch_alter_table("user_books") as batch:
+        batch.drop_constraint("uq_user_books_user_id_book_id", type_="unique")
+    for name in (
+        "ix_books_author_trgm",
+        "ix_books_title_trgm",
+        "ix_books_search_vector",
+    ):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.drop_index("ix_books_average_rating_id", "books")
+    op.drop_index("ix_books_year_id", "books")
+    op.drop_index("ix_books_title_id", "books")
+    with op.batch_alter_table("books") as batch:
+        for name in (
+            "average_rating",
+            "planned_count",
+            "read_count",
+            "rating_count",
+            "rating_sum",
+        ):
+            batch.drop_column(name)
@@ -0,0 +1,93 @@
+"""Per-user reading statistics
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+RATINGS = range(1, 6)
+
+BACKFILL_USER_STATS = f"""
+INSERT INTO user_stats (user_id, book_count, read_count, planned_count,
+    rating_sum, rating_count, {", ".join(f"rating_{r}" for r in RATINGS)})
+SELECT user_id, count(*),
+    sum(CASE WHEN status = 'read' THEN 1 ELSE 0 END),
+    sum(CASE WHEN status = 'planned' THEN 1 ELSE 0 END),
+    coalesce(sum(rating), 0), count(rating),
+    {", ".join(f"sum(CASE WHEN rating = {r} THEN 1 ELSE 0 END)" for r in RATINGS)}
+FROM user_books GROUP BY user_id
+"""
+BACKFILL_AUTHOR_STATS = """
+INSERT INTO user_author_stats (user_id, author, book_count, read_count,
+    rating_sum, rating_count)
+SELECT user_books.user_id, books.author, count(*),
+    sum(CASE WHEN user_books.status = 'read' THEN 1 ELSE 0 END),
+    coalesce(sum(user_books.rating), 0), count(user_books.rating)
+FROM user_books JOIN books ON books.id = user_books.book_id
+WHERE books.author IS NOT NULL
+GROUP BY user_books.user_id, books.author
+"""
+BACKFILL_YEAR_STATS = """
+INSERT INTO user_year_stats (user_id, year, read_count)
+SELECT user_books.user_id, books.year, count(*)
+FROM user_books JOIN books ON books.id = user_books.book_id
+WHERE user_books.status = 'read' AND books.year IS NOT NULL
+GROUP BY user_books.user_id, books.year
+"""
+
+
+def _counter(name: str) -> sa.Column:
+    return sa.Column(name, sa.Integer(), nullable=False, server_default="0")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        _counter("book_count"),
+        _counter("read_count"),
+        _counter("planned_count"),
+        _counter("rating_sum"),
+        _counter("rating_count"),
+        *(_counter(f"rating_{rating}") for rating in RATINGS),
+    )
+    op.create_table(
+        "user_author_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("author", sa.String(), nullable=False),
+        _counter("book_count"),
+        _counter("read_count"),
+        _counter("rating_sum"),
+        _counter("rating_count"),
+        sa.PrimaryKeyConstraint("user_id", "author"),
+    )
+    op.create_index(
+        "ix_user_author_stats_user_id_read_count",
+        "user_author_stats",
+        ["user_id", "read_count"],
+    )
+    op.create_table(
+        "user_year_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("year", sa.Integer(), primary_key=True),
+        _counter("read_count"),
+    )
+
+    op.execute(BACKFILL_USER_STATS)
+    op.execute(BACKFILL_AUTHOR_STATS)
+    op.execute(BACKFILL_YEAR_STATS)
+
+
+def downgrade() -> None:
+    op.drop_table("user_year_stats")
+    op.drop_index("ix_user_author_stats_user_id_read_count", "user_author_stats")
+    op.drop_table("user_author_stats")
+    op.drop_table("user_stats")
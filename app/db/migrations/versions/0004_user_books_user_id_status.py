@@ -0,0 +1,23 @@
+"""Composite index for shelf listings filtered by status
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_user_books_user_id_status", "user_books", ["user_id", "status"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_user_books_user_id_status", "user_books")
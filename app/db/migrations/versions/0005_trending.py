@@ -0,0 +1,69 @@
+"""Shelf entry timestamps and trending scores
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+import math
+import time
+
+import sqlalchemy as sa
+from alembic import op
+from config import settings
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# existing entries have no history, they all count as added now
+BACKFILL_TRENDING = """
+UPDATE books SET trending_score = :scale * coalesce((
+    SELECT sum(
+        CASE status WHEN 'read' THEN :read WHEN 'planned' THEN :planned ELSE 0 END
+        + CASE WHEN rating IS NULL THEN 0 ELSE :rating END)
+    FROM user_books WHERE book_id = books.id), 0)
+"""
+
+
+def upgrade() -> None:
+    # SQLite can't add columns with a non-constant default, batch mode
+    # recreates the table there
+    with op.batch_alter_table("user_books") as batch:
+        for name in ("created_at", "updated_at"):
+            batch.add_column(
+                sa.Column(
+                    name,
+                    sa.DateTime(timezone=True),
+                    nullable=False,
+                    server_default=sa.func.now(),
+                )
+            )
+
+    with op.batch_alter_table("books") as batch:
+        batch.add_column(
+            sa.Column("trending_score", sa.Float(), nullable=False, server_default="0")
+        )
+    decay_rate = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    op.get_bind().execute(
+        sa.text(BACKFILL_TRENDING),
+        {
+            "scale": math.exp(
+                decay_rate * (time.time() - settings.TRENDING_EPOCH.timestamp())
+            ),
+            "read": settings.TRENDING_READ_WEIGHT,
+            "planned": settings.TRENDING_PLANNED_WEIGHT,
+            "rating": settings.TRENDING_RATING_WEIGHT,
+        },
+    )
+    op.create_index("ix_books_trending_score_id", "books", ["trending_score", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_books_trending_score_id", "books")
+    with op.batch_alter_table("books") as batch:
+        batch.drop_column("trending_score")
+    with op.batch_alter_table("user_books") as batch:
+        batch.drop_column("updated_at")
+        batch.drop_column("created_at")
@@ -0,0 +1,55 @@
+"""Outbox of background jobs, replacing the stale neighbours table
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+MOVE_STALE_BOOKS = """
+INSERT INTO jobs (kind, key, amount, attempts, enqueued_at, run_at)
+SELECT 'recommendations', CAST(book_id AS VARCHAR(100)), 0, 0,
+    CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+FROM stale_book_neighbours
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=50), nullable=False),
+        sa.Column("key", sa.String(length=100), nullable=False),
+        sa.Column("amount", sa.Float(), server_default="0", nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("enqueued_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("run_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("failed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("kind", "key", name="uq_jobs_kind_key"),
+    )
+    op.create_index("ix_jobs_run_at", "jobs", ["run_at"])
+    op.execute(MOVE_STALE_BOOKS)
+    op.drop_table("stale_book_neighbours")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "stale_book_neighbours",
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("book_id"),
+    )
+    op.execute(
+        "INSERT INTO stale_book_neighbours (book_id) "
+        "SELECT CAST(key AS INTEGER) FROM jobs WHERE kind = 'recommendations'"
+    )
+    op.drop_index("ix_jobs_run_at", "jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,61 @@
+"""Trending epoch kept in the database, trending job amounts unscaled
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+import math
+import time
+
+import sqlalchemy as sa
+from alembic import op
+from config import settings
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def _scale() -> float:
+    """Growth of an event now relative to TRENDING_EPOCH"""
+    decay_rate = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    return math.exp(decay_rate * (time.time() - settings.TRENDING_EPOCH.timestamp()))
+
+
+def upgrade() -> None:
+    epochs = op.create_table(
+        "trending_epoch",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("epoch", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # stored scores are relative to the configured epoch so far
+    op.bulk_insert(epochs, [{"id": 1, "epoch": settings.TRENDING_EPOCH.timestamp()}])
+    # waiting trending jobs hold scaled amounts, they are now plain weights
+    # scaled when the job runs; those jobs are seconds old, scaled about now
+    op.get_bind().execute(
+        sa.text("UPDATE jobs SET amount = amount / :scale WHERE kind = 'trending'"),
+        {"scale": _scale()},
+    )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    epoch = connection.execute(sa.text("SELECT epoch FROM trending_epoch")).scalar()
+    decay_rate = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    # back to scores relative to the configured epoch
+    connection.execute(
+        sa.text("UPDATE books SET trending_score = trending_score * :factor"),
+        {
+            "factor": math.exp(
+                decay_rate * (epoch - settings.TRENDING_EPOCH.timestamp())
+            )
+        },
+    )
+    connection.execute(
+        sa.text("UPDATE jobs SET amount = amount * :scale WHERE kind = 'trending'"),
+        {"scale": _scale()},
+    )
+    op.drop_table("trending_epoch")
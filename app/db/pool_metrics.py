@@ -0,0 +1,83 @@
+from core.metrics import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class PoolMetrics:
+    """Live state, connection churn and acquire times of an engine's pool.
+
+    Acquire time is measured by get_db around taking a connection from the
+    pool. High acquire times with a full pool point to pool starvation,
+    low acquire times with slow requests point to slow queries.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.connects = Counter(
+            "db_pool_connects_total", "New DBAPI connections opened"
+        )
+        self.closes = Counter("db_pool_closes_total", "DBAPI connections closed")
+        self.invalidations = Counter(
+            "db_pool_invalidations_total", "Connections invalidated after errors"
+        )
+        self.checkouts = Counter(
+            "db_pool_checkouts_total", "Connections handed out by the pool"
+        )
+        self.acquire_seconds = Histogram(
+            "db_pool_acquire_seconds", "Time spent waiting for a pooled connection"
+        )
+
+        # live pool state, read when metrics are collected
+        for name, attribute in (
+            ("db_pool_checked_out", "checkedout"),
+            ("db_pool_overflow", "overflow"),
+        ):
+            method = getattr(engine.pool, attribute, None)
+            if method is not None:
+                Gauge(name, f"Pool {attribute}() at collection time").set_function(
+                    method
+                )
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "close_detached", self._on_close)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "checkout", self._on_checkout)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects.inc()
+
+    def _on_close(self, dbapi_connection, *args):
+        self.closes.inc()
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations.inc()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts.inc()
+
+    def observe_acquire(self, seconds: float) -> None:
+        """Records how long a request waited for a connection"""
+        self.acquire_seconds.observe(seconds)
+
+    def snapshot(self) -> dict:
+        """Current pool state together with the collected counters.
+
+        Returns:
+            dict: Pool gauges, churn counters and acquire time histogram.
+        """
+        pool = self.engine.pool
+        state = {"status": pool.status()}
+        # only queue based pools track size and overflow
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, name, None)
+            if method is not None:
+                state[name] = method()
+        return {
+            **state,
+            "connects": self.connects.value,
+            "closes": self.closes.value,
+            "invalidations": self.invalidations.value,
+            "checkouts": self.checkouts.value,
+            "acquire_seconds": self.acquire_seconds.snapshot(),
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+
+from config import settings
+from core.cache import build_backend
+from core.metrics import Counter, Gauge
+from core.request_metrics import instrument_engine
+from core.response_cache import REPLICA_READ_STATE
+from core.security import client_identity
+from db.session import AsyncSessionLocal, engine_options, get_db
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+logger = logging.getLogger(__name__)
+
+STICKY_PREFIX = "read_your_writes:"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReplicaSet:
+    """Read replicas picked round-robin among the healthy ones.
+
+    A replica that fails a periodic `SELECT 1` or refuses a connection is
+    skipped until a later check succeeds. With no healthy replica, reads
+    fall back to the primary.
+    """
+
+    def __init__(self, urls: list[str], check_timeout: float):
+        self.urls = urls
+        self.check_timeout = check_timeout
+        self.engines = [
+            create_async_engine(url, **engine_options(async_driver=True))
+            for url in urls
+        ]
+        for replica in self.engines:
+            instrument_engine(replica.sync_engine)
+        self.healthy = [True] * len(self.engines)
+        self._next = 0
+        self.reads = Counter("db_replica_reads_total", "Requests served by replicas")
+        self.fallbacks = Counter(
+            "db_replica_fallbacks_total", "Reads sent to the primary, no replica up"
+        )
+        Gauge("db_replicas_healthy", "Replicas passing health checks").set_function(
+            lambda: sum(self.healthy)
+        )
+
+    def candidates(self) -> list[int]:
+        """Healthy replica indexes, starting from the next in round-robin"""
+        count = len(self.engines)
+        start, self._next = self._next, (self._next + 1) % count
+        order = [(start + offset) % count for offset in range(count)]
+        return [index for index in order if self.healthy[index]]
+
+    def mark(self, index: int, healthy: bool, reason: object = None) -> None:
+        """Records the state of a replica, logging changes"""
+        if self.healthy[index] == healthy:
+            return
+        self.healthy[index] = healthy
+        if healthy:
+            logger.info("Read replica %d is back", index)
+        else:
+            logger.warning("Read replica %d is down: %s", index, reason)
+
+    async def check(self, index: int) -> None:
+        """Runs a health check query against one replica"""
+        try:
+            async with asyncio.timeout(self.check_timeout):
+                async with self.engines[index].connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        except (DBAPIError, OSError, TimeoutError) as exc:
+            self.mark(index, False, exc)
+        else:
+            self.mark(index, True)
+
+    async def run_health_checks(self, interval: float) -> None:
+        """Checks every replica each `interval` seconds"""
+        while True:
+            await asyncio.gather(*(self.check(i) for i in range(len(self.engines))))
+            await asyncio.sleep(interval)
+
+    async def dispose(self) -> None:
+        """Closes the pooled connections of every replica"""
+        for replica in self.engines:
+            await replica.dispose()
+
+
+class ReadYourWrites:
+    """Sends readers to the primary for a while after they wrote.
+
+    Stickiness is recorded per client (user or IP) in a cache backend,
+    Redis when shared between workers, so a client sees its own writes
+    even if the replicas lag behind.
+    """
+
+    def __init__(self, window: float, redis_url: str | None):
+        self.window = window
+        self.backend = build_backend(redis_url, 100000, window, STICKY_PREFIX)
+
+    async def wrote(self, client: str) -> None:
+        await self.backend.set(client, {"at": time.time()}, self.window)
+
+    async def is_sticky(self, client: str) -> bool:
+        return await self.backend.get(client) is not None
+
+
+replicas = (
+    ReplicaSet(settings.DATABASE_REPLICA_URLS, settings.REPLICA_HEALTH_CHECK_SECONDS)
+    if settings.DATABASE_REPLICA_URLS
+    else None
+)
+read_your_writes = ReadYourWrites(
+    settings.READ_YOUR_WRITES_SECONDS, settings.READ_YOUR_WRITES_REDIS_URL
+)
+
+
+async def track_writes(request: Request) -> None:
+    """App-level dependency making the sender of a write sticky to the primary.
+
+    Recorded before the handler runs, so the window covers the write's
+    own commit and the reads that follow it.
+    """
+    if replicas is not None and request.method not in SAFE_METHODS:
+        await read_your_writes.wrote(await client_identity(request))
+
+
+async def get_read_db(request: Request):
+    """Session for read-only handlers, on a replica when one is usable.
+
+    Falls back to the primary (get_db) when no replicas are configured,
+    none is healthy, or the client wrote within the read-your-writes
+    window. A replica refusing the connection is marked down and the next
+    one is tried.
+
+    Yields:
+        AsyncSession object
+    """
+    if replicas is not None and not await read_your_writes.is_sticky(
+        await client_identity(request)
+    ):
+        for index in replicas.candidates():
+            db = AsyncSessionLocal(bind=replicas.engines[index])
+            try:
+                await db.connection()
+            except (DBAPIError, OSError) as exc:
+                await db.close()
+                replicas.mark(index, False, exc)
+                continue
+            replicas.reads.inc()
+            setattr(request.state, REPLICA_READ_STATE, True)
+            try:
+                yield db
+            finally:
+                await db.close()
+            return
+        replicas.fallbacks.inc()
+
+    async for db in get_db():
+        yield db
@@ -0,0 +1,116 @@
+from core.security import get_password_hash
+from db.aggregates import rebuild_book_stats
+from db.trending import rebuild_trending_scores
+from db.user_stats import rebuild_user_stats
+from models.db_models import Book, User, UserBook
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+# sample users: username, email, password
+SAMPLE_USERS = [
+    ("user", "user@example.com", "password"),
+    ("admin", "admin@example.com", "password123"),
+]
+
+# sample books: title, author, year, description
+SAMPLE_BOOKS = [
+    ("Великий Гэтсби", "Фрэнсис Скотт Фицджеральд", 1925, "Книга 1"),
+    ("Убить пересмешника", "Харпер Ли", 1960, "Книга 2"),
+    ("1984", "Джордж Оруэлл", 1949, "Длинное описание книги 3"),
+    ("Гордость и предубеждение", "Джейн Остин", 1813, "Книга 4"),
+    ("Хоббит", "Дж. Р. Р. Толкин", 1937, "Книга 5"),
+]
+
+# sample read&planned books: username, book title, status, rating
+SAMPLE_SHELVES = [
+    ("user", "Великий Гэтсби", "read", 3),
+    ("user", "Убить пересмешника", "read", 4),
+    ("user", "1984", "planned", None),
+    ("user", "Хоббит", "read", 5),
+    ("admin", "Великий Гэтсби", "read", 4),
+    ("admin", "Гордость и предубеждение", "read", 2),
+    ("admin", "Убить пересмешника", "planned", None),
+    ("admin", "Хоббит", "read", 5),
+]
+
+
+def seed_sample_data(db: Session, only_if_empty: bool = False) -> int:
+    """Adds the sample users, books and shelves that are missing.
+
+    Safe to run any number of times: existing rows are looked up first,
+    so passwords are only hashed for users that get created.
+
+    Args:
+        db (Session): Database session.
+        only_if_empty (bool): Do nothing if the catalogue has any books.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    if only_if_empty and db.scalar(select(func.count()).select_from(Book)):
+        return 0
+
+    names = [username for username, _, _ in SAMPLE_USERS]
+    existing_users = set(
+        db.scalars(select(User.username).where(User.username.in_(names)))
+    )
+    users = [
+        {
+            "username": username,
+            "email": email,
+            "hashed_password": get_password_hash(password),
+        }
+        for username, email, password in SAMPLE_USERS
+        if username not in existing_users
+    ]
+
+    keys = [(title, author) for title, author, _, _ in SAMPLE_BOOKS]
+    existing_books = set(
+        db.execute(
+            select(Book.title, Book.author).where(
+                tuple_(Book.title, Book.author).in_(keys)
+            )
+        ).all()
+    )
+    books = [
+        {"title": title, "author": author, "year": year, "description": description}
+        for title, author, year, description in SAMPLE_BOOKS
+        if (title, author) not in existing_books
+    ]
+    if users:
+        db.execute(insert(User), users)
+    if books:
+        db.execute(insert(Book), books)
+
+    user_ids = dict(
+        db.execute(select(User.username, User.id).where(User.username.in_(names))).all()
+    )
+    book_ids = dict(
+        db.execute(
+            select(Book.title, Book.id).where(tuple_(Book.title, Book.author).in_(keys))
+        ).all()
+    )
+    existing_shelves = set(
+        db.execute(
+            select(UserBook.user_id, UserBook.book_id).where(
+                UserBook.user_id.in_(user_ids.values())
+            )
+        ).all()
+    )
+    shelves = [
+        {
+            "user_id": user_ids[username],
+            "book_id": book_ids[title],
+            "status": status,
+            "rating": rating,
+        }
+        for username, title, status, rating in SAMPLE_SHELVES
+        if (user_ids[username], book_ids[title]) not in existing_shelves
+    ]
+    if shelves:
+        db.execute(insert(UserBook), shelves)
+        rebuild_book_stats(db)
+        rebuild_user_stats(db)
+        rebuild_trending_scores(db)
+    db.commit()
+    return len(users) + len(books) + len(shelves)
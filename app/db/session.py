@@ -1,22 +1,69 @@
+import time
+
 from config import settings
+from core.request_metrics import instrument_engine
+from db.pool_metrics import PoolMetrics
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-engine = create_engine(settings.DATABASE_URL)
+
+def engine_options(async_driver: bool) -> dict:
+    """Builds pool and connection options from settings
+
+    Args:
+        async_driver (bool): Whether options are for the asyncpg driver.
+
+    Returns:
+        dict: Keyword arguments for create_engine/create_async_engine.
+    """
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout and not settings.SQLITE_PATH:
+        if async_driver:
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(timeout)}
+            }
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+# blocking engine for one-shot jobs (migrations, manage.py)
+engine = create_engine(settings.DATABASE_URL, **engine_options(async_driver=False))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# engine used by request handlers
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL, **engine_options(async_driver=True)
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+pool_metrics = PoolMetrics(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine)
+
 Base = declarative_base()
 
 
-def get_db():
-    """Prepares session for the db
+async def get_db():
+    """Prepares async session for the db
+
+    The connection is taken from the pool up front, so the time spent
+    waiting for it is recorded separately from query time.
 
     Yields:
-        session object
+        AsyncSession object
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await db.connection()
+        pool_metrics.observe_acquire(time.perf_counter() - started)
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,182 @@
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import UTC, datetime
+
+from config import settings
+from db.aggregates import ShelfEntry
+from models.db_models import Book, TrendingEpoch, UserBook
+from sqlalchemy import Float, bindparam, select, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+books = Book.__table__
+epochs = TrendingEpoch.__table__
+
+# per-second decay rate, weights halve every half-life
+DECAY_RATE = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+# the epoch moves to the present once new events weigh e^REBASE_EXPONENT
+# (~72 half-lives, ~7 months by default), far below the e^709 at which
+# scores would overflow to inf
+REBASE_EXPONENT = 50.0
+# the epoch as a column, read in the same statement as the scores
+EPOCH = select(epochs.c.epoch).scalar_subquery()
+STATUS_WEIGHTS = {
+    "read": settings.TRENDING_READ_WEIGHT,
+    "planned": settings.TRENDING_PLANNED_WEIGHT,
+}
+
+_ADD_SCORE = (
+    update(books)
+    .where(books.c.id == bindparam("b_book_id"))
+    .values(
+        trending_score=books.c.trending_score
+        + bindparam("d_trending_score", type_=Float)
+    )
+)
+
+
+def growth(at: float, epoch: float) -> float:
+    """exp(λ(t - epoch)): weight of an event at `at` relative to the epoch.
+
+    Scaling new events up instead of decaying old ones down keeps every
+    stored score comparable without rewriting them, until lock_epoch
+    moves the epoch forward.
+    """
+    return math.exp(DECAY_RATE * (at - epoch))
+
+
+def current_score(stored: float, epoch: float, now: float | None = None) -> float:
+    """Stored score decayed to `now`: weighted activity as of that moment"""
+    return stored / growth(time.time() if now is None else now, epoch)
+
+
+def lock_epoch(db: Session, now: float | None = None) -> float:
+    """Epoch of the stored scores, moved to `now` first if it is due.
+
+    The epoch row stays locked until the caller commits, so scores are
+    never added with an epoch a concurrent rebase just replaced. A rebase
+    rescales every score in one UPDATE, which keeps the weights of new
+    events finite however long the service runs.
+
+    Args:
+        db (Session): Database session of the score update.
+        now (float | None): Unix time, now by default.
+
+    Returns:
+        float: Epoch to scale the caller's events with.
+    """
+    now = time.time() if now is None else now
+    epoch = db.scalar(select(epochs.c.epoch).with_for_update())
+    if DECAY_RATE * (now - epoch) > REBASE_EXPONENT:
+        db.execute(
+            update(books)
+            .where(books.c.trending_score > 0)
+            .values(trending_score=books.c.trending_score * growth(epoch, now))
+        )
+        db.execute(update(epochs).values(epoch=now))
+        logger.info("Trending epoch moved forward by %.0f hours", (now - epoch) / 3600)
+        epoch = now
+    return epoch
+
+
+def activity_weight(old: ShelfEntry | None, new: ShelfEntry | None) -> float:
+    """Weight of a shelf mutation, removals and no-op updates count zero"""
+    if new is None:
+        return 0.0
+    weight = 0.0
+    if old is None or old.status != new.status:
+        weight += STATUS_WEIGHTS.get(new.status, 0.0)
+    if new.rating is not None and (old is None or old.rating != new.rating):
+        weight += settings.TRENDING_RATING_WEIGHT
+    return weight
+
+
+def trending_amounts(
+    changes: list[tuple[int, ShelfEntry | None, ShelfEntry | None]],
+) -> dict[int, float]:
+    """Activity weight of each book for a set of shelf mutations.
+
+    The weights are scaled to the epoch when they are added to the scores
+    (see add_trending_scores), the epoch may move before that.
+
+    Args:
+        changes (list): (book_id, old entry, new entry) triples, where
+            None stands for "no row".
+
+    Returns:
+        dict[int, float]: Book ID -> weight, zero ones left out.
+    """
+    amounts = defaultdict(float)
+    for book_id, old, new in changes:
+        if weight := activity_weight(old, new):
+            amounts[book_id] += weight
+    return dict(amounts)
+
+
+def add_trending_scores(db: Session, weights: dict[int, tuple[float, float]]) -> None:
+    """Adds shelf activity to the scores of books in one executemany.
+
+    The caller is responsible for committing.
+
+    Args:
+        db (Session): Database session.
+        weights (dict): Book ID -> (activity weight, Unix time of it).
+    """
+    if weights:
+        epoch = lock_epoch(db)
+        db.execute(
+            _ADD_SCORE,
+            [
+                {"b_book_id": book_id, "d_trending_score": weight * growth(at, epoch)}
+                for book_id, (weight, at) in weights.items()
+            ],
+        )
+
+
+def timestamp(value: datetime) -> float:
+    """Unix time of a datetime read from the database"""
+    # SQLite returns naive datetimes, stored in UTC by CURRENT_TIMESTAMP
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.timestamp()
+
+
+def rebuild_trending_scores(db: Session) -> int:
+    """Recomputes all trending scores from the shelves.
+
+    Every shelf row counts as a single event at its last change, so the
+    history of earlier updates and removed rows is lost. Needed after
+    changing the weights. The epoch moves to the present. The caller is
+    responsible for committing.
+
+    Args:
+        db (Session): Database session.
+
+    Returns:
+        int: Number of books with a non-zero score.
+    """
+    lock_epoch(db)
+    epoch = time.time()
+    db.execute(update(epochs).values(epoch=epoch))
+    scores = defaultdict(float)
+    rows = db.execute(
+        select(UserBook.book_id, UserBook.status, UserBook.rating, UserBook.updated_at)
+    )
+    for book_id, status, rating, updated_at in rows:
+        weight = activity_weight(None, ShelfEntry(status, rating))
+        scores[book_id] += weight * growth(timestamp(updated_at), epoch)
+
+    db.execute(update(books).values(trending_score=0))
+    scores = {book_id: score for book_id, score in scores.items() if score}
+    if scores:
+        db.execute(
+            _ADD_SCORE,
+            [
+                {"b_book_id": book_id, "d_trending_score": score}
+                for book_id, score in scores.items()
+            ],
+        )
+    return len(scores)
@@ -1,13 +1,86 @@
-from db.init_db import init_db
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+
+from config import settings
+from core.hashing import HashingPoolSaturated, password_hasher
+from core.jobs import job_queue
+from core.metrics import REGISTRY, Gauge
+from core.profiling import ProfilingMiddleware, SQLProfiler
+from core.rate_limit import RateLimitHeadersMiddleware, rate_limiter
+from core.request_metrics import MetricsMiddleware
+from core.response_cache import ResponseCacheMiddleware, response_cache
+from core.security import require_internal_token
+from core.tokens import keyring
+from core.trending import run_trending_loop
+from db.migrate import check_schema
+from db.replicas import replicas, track_writes
+from db.session import async_engine, engine
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routers.auth import router as auth_router
 from routers.books import router as book_router
+from routers.internal import router as internal_router
 from routers.users import router as user_router
 
-init_db()
+# uvicorn configures this logger, so startup messages show up next to its own
+logger = logging.getLogger("uvicorn.error")
+startup_seconds = Gauge(
+    "app_startup_seconds", "Time from app import to serving the first request"
+)
+imported_at = time.perf_counter()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts and stops process-wide resources"""
+    # migrations and seeding are one-shot commands (manage.py migrate/seed),
+    # every worker only checks that they ran
+    revision = await check_schema(async_engine)
+    password_hasher.start()
+    # parses the signing keys (creating the first one) before any request
+    keyring.ensure_signing_key()
+    tasks = []
+    if settings.TRENDING_REFRESH_SECONDS:
+        tasks.append(
+            asyncio.create_task(run_trending_loop(settings.TRENDING_REFRESH_SECONDS))
+        )
+    if replicas is not None:
+        tasks.append(
+            asyncio.create_task(
+                replicas.run_health_checks(settings.REPLICA_HEALTH_CHECK_SECONDS)
+            )
+        )
+    # post-write jobs queued by this and other processes, see core.jobs
+    tasks.extend(job_queue.start(settings.JOB_WORKERS))
+    startup_seconds.set(time.perf_counter() - imported_at)
+    logger.info(
+        "Started in %.0f ms, schema revision %s", startup_seconds.value * 1000, revision
+    )
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    password_hasher.shutdown()
+    # close pooled connections now rather than leaving them to the server
+    await async_engine.dispose()
+    engine.dispose()
+    if replicas is not None:
+        await replicas.dispose()
+
+
+# app-level dependencies run before the route's, so rejected requests
+# never take a database connection
+dependencies = [Depends(rate_limiter)] if settings.RATE_LIMIT_ENABLED else []
+if replicas is not None:
+    dependencies.append(Depends(track_writes))
 
 app = FastAPI(
+    lifespan=lifespan,
+    dependencies=dependencies,
     title="Сервис для оценки и поиска книг",
     description="Основано на фреймворке FastAPI.",
     version="0.0.1",
@@ -18,6 +91,17 @@ app = FastAPI(
     },
 )
 
+# added first so it runs inside CORS, cached responses carry no CORS headers;
+# replica reads are not stored while the replicas may still be catching up
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    replica_lag=settings.READ_YOUR_WRITES_SECONDS if replicas is not None else 0.0,
+)
+# outside the cache, which keeps only its own headers; cache hits are
+# served without touching the database and are not rate limited
+app.add_middleware(RateLimitHeadersMiddleware)
+
 origins = ["https://localhost:8087", "http://localhost:8087", "localhost:8087", "*"]
 
 app.add_middleware(
@@ -26,7 +110,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor",
+        "ETag",
+        "RateLimit-Limit",
+        "RateLimit-Remaining",
+        "RateLimit-Reset",
+        "RateLimit-Policy",
+        "Retry-After",
+    ],
 )
+if settings.SQL_PROFILING:
+    SQLProfiler(
+        slow_seconds=settings.SQL_PROFILING_SLOW_MS / 1000,
+        repeat_threshold=settings.SQL_PROFILING_REPEAT_THRESHOLD,
+        explain=settings.SQL_PROFILING_EXPLAIN,
+    ).instrument(async_engine.sync_engine)
+    app.add_middleware(
+        ProfilingMiddleware, server_timing=settings.SQL_PROFILING_SERVER_TIMING
+    )
+# outermost, so the time spent in the other middleware is measured too
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(HashingPoolSaturated)
+async def hashing_pool_saturated_handler(
+    request: Request, exc: HashingPoolSaturated
+) -> JSONResponse:
+    """Fails fast when too many logins/registrations are queued"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, try again later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @app.get("/", tags=["root"])
@@ -35,6 +151,19 @@ async def read_root() -> dict:
     return {"message": "Это проект для курса Программирование на Python (2 семестр)"}
 
 
+@app.get(
+    "/metrics",
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_token)],
+)
+async def read_metrics() -> PlainTextResponse:
+    """Process metrics in the Prometheus text format, for INTERNAL_TOKEN holders"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 app.include_router(book_router)
 app.include_router(user_router)
 app.include_router(auth_router)
+app.include_router(internal_router)
@@ -0,0 +1,193 @@
+"""Command line entry point for maintenance tasks.
+
+Run from the app directory, e.g. inside the container:
+
+    docker compose exec web python manage.py rebuild-aggregates
+"""
+
+import argparse
+
+from config import settings
+from core.catalogue_import import BATCH_SIZE, FORMATS, detect_format, import_books
+from core.jobs import job_queue
+from core.recommendations import build_neighbours
+from core.shelves import BOOK_STATS_JOB  # noqa: F401 (registers shelf jobs)
+from core.tokens import keyring
+from db.aggregates import rebuild_book_stats
+from db.migrate import upgrade
+from db.seed import seed_sample_data
+from db.session import SessionLocal
+from db.trending import rebuild_trending_scores
+from db.user_stats import rebuild_user_stats
+
+
+def migrate(args: argparse.Namespace) -> None:
+    """Brings the database schema to the latest (or given) revision"""
+    before, after = upgrade(args.revision)
+    print(f"Database schema migrated from {before or 'empty'} to {after}")
+
+
+def seed(args: argparse.Namespace) -> None:
+    """Adds the sample users, books and shelves that are missing"""
+    with SessionLocal() as db:
+        inserted = seed_sample_data(db, only_if_empty=args.if_empty)
+    print(f"Sample data seeded, {inserted} rows inserted")
+
+
+def rebuild_aggregates(args: argparse.Namespace) -> None:
+    """Recomputes per-book rating aggregates from user_books"""
+    with SessionLocal() as db:
+        updated = rebuild_book_stats(db)
+        db.commit()
+    print(f"Book aggregates rebuilt, {updated} books have shelf entries")
+
+
+def rebuild_reading_stats(args: argparse.Namespace) -> None:
+    """Recomputes per-user reading statistics from user_books"""
+    with SessionLocal() as db:
+        users = rebuild_user_stats(db)
+        db.commit()
+    print(f"Reading statistics rebuilt for {users} users")
+
+
+def rebuild_trending(args: argparse.Namespace) -> None:
+    """Recomputes trending scores from the shelves' last changes"""
+    with SessionLocal() as db:
+        books = rebuild_trending_scores(db)
+        db.commit()
+    print(f"Trending scores rebuilt, {books} books have shelf activity")
+
+
+def build_recommendations(args: argparse.Namespace) -> None:
+    """Recomputes the item-item neighbour table from all shelves"""
+    with SessionLocal() as db:
+        written = build_neighbours(db, args.neighbours)
+        db.commit()
+    print(f"Book neighbours rebuilt, {written} rows written")
+
+
+def run_jobs(args: argparse.Namespace) -> None:
+    """Runs the background jobs that are due, e.g. with JOB_WORKERS=0"""
+    with SessionLocal() as db:
+        claimed = job_queue.run_pending(db)
+    print(
+        f"{claimed} jobs run, {job_queue.depth.value} waiting, "
+        f"{job_queue.dead.value} failed"
+    )
+
+
+def rotate_keys(args: argparse.Namespace) -> None:
+    """Adds a new token signing key and deletes keys replaced long ago"""
+    if args.if_missing and any(keyring.directory.glob("*.pem")):
+        print(f"Signing keys present in {keyring.directory}")
+        return
+    kid = keyring.rotate(keep_seconds=args.keep_days * 86400)
+    print(
+        f"Tokens are now signed with key {kid}, running servers switch within "
+        f"{settings.TOKEN_KEYS_RELOAD_SECONDS:.0f} s"
+    )
+
+
+def retry_jobs(args: argparse.Namespace) -> None:
+    """Revives background jobs that ran out of attempts"""
+    with SessionLocal() as db:
+        revived = job_queue.retry_failed(db, args.kind)
+        claimed = job_queue.run_pending(db) if args.run else 0
+    print(
+        f"{revived} failed jobs revived, {claimed} jobs run, "
+        f"{job_queue.depth.value} waiting, {job_queue.dead.value} failed"
+    )
+
+
+def import_catalogue(args: argparse.Namespace) -> None:
+    """Streams a CSV or JSON Lines catalogue into the books table"""
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        raise SystemExit("Unknown file format, pass --format csv or jsonl")
+
+    with (
+        open(args.path, encoding="utf-8-sig", newline="") as stream,
+        SessionLocal() as db,
+    ):
+        report = import_books(db, stream, fmt, args.batch_size)
+    for error in report.errors:
+        print(f"line {error.line}: {error.error}")
+    print(
+        f"{report.inserted} books imported, {report.duplicates} duplicates "
+        f"and {report.failed} invalid rows skipped"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Parses command line arguments and runs the selected command"""
+    parser = argparse.ArgumentParser(description="Book service maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migration = commands.add_parser("migrate", help="apply schema migrations")
+    migration.add_argument("revision", nargs="?", default="head")
+    migration.set_defaults(handler=migrate)
+
+    seeding = commands.add_parser("seed", help="add the sample data")
+    seeding.add_argument(
+        "--if-empty", action="store_true", help="only seed an empty catalogue"
+    )
+    seeding.set_defaults(handler=seed)
+
+    rebuild = commands.add_parser(
+        "rebuild-aggregates", help="recompute per-book rating aggregates"
+    )
+    rebuild.set_defaults(handler=rebuild_aggregates)
+
+    commands.add_parser(
+        "rebuild-user-stats", help="recompute per-user reading statistics"
+    ).set_defaults(handler=rebuild_reading_stats)
+
+    commands.add_parser(
+        "rebuild-trending", help="recompute trending scores"
+    ).set_defaults(handler=rebuild_trending)
+
+    recommendations = commands.add_parser(
+        "build-recommendations", help="rebuild all neighbours"
+    )
+    recommendations.add_argument(
+        "--neighbours", type=int, default=settings.RECOMMENDATION_NEIGHBOURS
+    )
+    recommendations.set_defaults(handler=build_recommendations)
+
+    commands.add_parser("run-jobs", help="run due background jobs").set_defaults(
+        handler=run_jobs
+    )
+
+    retrying = commands.add_parser(
+        "retry-jobs", help="retry background jobs that ran out of attempts"
+    )
+    retrying.add_argument("--kind", help="only jobs of this kind")
+    retrying.add_argument(
+        "--run", action="store_true", help="run them here instead of in the servers"
+    )
+    retrying.set_defaults(handler=retry_jobs)
+
+    rotation = commands.add_parser("rotate-keys", help="add a token signing key")
+    rotation.add_argument(
+        "--if-missing", action="store_true", help="only create the first key"
+    )
+    # tokens signed with a replaced key stay verifiable until they expire
+    rotation.add_argument(
+        "--keep-days", type=float, default=settings.REFRESH_TOKEN_EXPIRE_DAYS
+    )
+    rotation.set_defaults(handler=rotate_keys)
+
+    importer = commands.add_parser(
+        "import-books", help="bulk import books from a CSV or JSON Lines file"
+    )
+    importer.add_argument("path")
+    importer.add_argument("--format", choices=FORMATS)
+    importer.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    importer.set_defaults(handler=import_catalogue)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-from typing import Optional
+from datetime import datetime
+from typing import Literal, Optional
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 
 
 # for books
@@ -30,11 +31,59 @@ class Book(BookBase):
 
     id: int
     average_rating: Optional[float] = None
+    rating_count: int = 0
+    read_count: int = 0
+    planned_count: int = 0
 
     class Config:
         from_attributes = True
 
 
+class BookSearchHit(Book):
+    """Book matching a search query with its relevance score.
+
+    `highlights` maps field names to their HTML-escaped text with matched
+    words wrapped in <mark> tags.
+    """
+
+    score: float
+    highlights: dict[str, str] = {}
+
+
+class BookImportError(BaseModel):
+    """Row of an import file that was skipped, with the reason."""
+
+    line: int
+    error: str
+
+
+class BookImportReport(BaseModel):
+    """Result of a bulk catalogue import.
+
+    `errors` lists at most the first 1000 failed rows, `failed` counts all.
+    """
+
+    inserted: int
+    duplicates: int
+    failed: int
+    errors: list[BookImportError] = []
+
+    class Config:
+        from_attributes = True
+
+
+class RecommendedBook(Book):
+    """Book recommended to a user with its recommendation score."""
+
+    score: float
+
+
+class TrendingBook(Book):
+    """Book with its recent shelf activity, decayed over time."""
+
+    score: float
+
+
 # ///
 
 
@@ -58,17 +107,97 @@ class UserBook(UserBookBase):
     id: int
     user_id: int
     book_id: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class ShelfBook(UserBook):
+    """Shelf entry with the book embedded when requested."""
+
+    book: Optional[Book] = None
+
+
 class UserBookUpdate(UserBookBase):
     """Model for updating existing user-book relationships."""
 
     pass
 
 
+class ShelfOperation(BaseModel):
+    """Single operation of a shelf batch.
+
+    `add` puts a book on the shelf or overwrites its entry, `update` changes
+    the given fields of an existing entry, `remove` deletes it.
+    """
+
+    op: Literal["add", "update", "remove"]
+    book_id: int
+    status: Optional[str] = Field(None, pattern="^(read|planned)$")
+    rating: Optional[int] = Field(None, ge=1, le=5)
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op == "add" and self.status is None:
+            raise ValueError("status is required to add a book")
+        return self
+
+
+class ShelfBatch(BaseModel):
+    """List of shelf operations applied in order in one transaction."""
+
+    operations: list[ShelfOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class ShelfOperationResult(BaseModel):
+    """Outcome of a shelf operation.
+
+    `entry` is the book's shelf entry after the whole batch, None if the
+    book is not on the shelf or the operation failed.
+    """
+
+    op: str
+    book_id: int
+    ok: bool
+    error: Optional[str] = None
+    entry: Optional[UserBook] = None
+
+
+class AuthorStats(BaseModel):
+    """How many books of an author a user has shelved, read and rated."""
+
+    author: str
+    book_count: int
+    read_count: int
+    average_rating: Optional[float] = None
+
+
+class YearStats(BaseModel):
+    """Number of read books published in a given year."""
+
+    year: int
+    read_count: int
+
+
+class ReadingStats(BaseModel):
+    """Aggregates over a user's shelf.
+
+    Shelf entries carry no read date, so `read_by_year` groups read books
+    by publication year.
+    """
+
+    book_count: int = 0
+    read_count: int = 0
+    planned_count: int = 0
+    rating_count: int = 0
+    average_rating: Optional[float] = None
+    rating_distribution: dict[int, int]
+    read_by_year: list[YearStats]
+    favourite_authors: list[AuthorStats]
+
+
 # ///
 
 # for auth
@@ -79,6 +208,15 @@ class Token(BaseModel):
 
     access_token: str
     token_type: str
+    # exchanged at /auth/refresh for a new pair once the access token expires
+    refresh_token: str | None = None
+    expires_in: int | None = None
+
+
+class RefreshRequest(BaseModel):
+    """Model for exchanging a refresh token."""
+
+    refresh_token: str
 
 
 class TokenData(BaseModel):
@@ -1,7 +1,23 @@
 from db.session import Base
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    String,
+    UniqueConstraint,
+    event,
+    literal_column,
+)
 from sqlalchemy.sql import func
 
+# text search configuration, 'simple' since the catalogue mixes languages
+SEARCH_CONFIG = literal_column("'simple'")
+
 
 class BaseModel(Base):
     """Base class for all tables"""
@@ -14,6 +30,21 @@ class BaseModel(Base):
         return f"<{self.__class__.__name__}(id={self.id})>"
 
 
+def _weighted_vector(column, weight):
+    return func.setweight(
+        func.to_tsvector(SEARCH_CONFIG, func.coalesce(column, "")), weight
+    )
+
+
+def book_search_vector(title, author, description):
+    """Weighted tsvector over the searchable book fields"""
+    return (
+        _weighted_vector(title, "A")
+        .op("||")(_weighted_vector(author, "B"))
+        .op("||")(_weighted_vector(description, "C"))
+    )
+
+
 class Book(Base):
     """Class for books table"""
 
@@ -25,6 +56,54 @@ class Book(Base):
     year = Column(Integer)
     description = Column(String)
 
+    # aggregates over user_books, maintained by db.aggregates
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    read_count = Column(Integer, nullable=False, default=0, server_default="0")
+    planned_count = Column(Integer, nullable=False, default=0, server_default="0")
+    average_rating = Column(Float)
+    # time-decayed shelf activity relative to a fixed epoch, see db.trending
+    trending_score = Column(Float, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # keyset pagination: sort key + id as tie breaker
+        Index("ix_books_title_id", "title", "id"),
+        Index("ix_books_year_id", "year", "id"),
+        Index("ix_books_average_rating_id", "average_rating", "id"),
+        # top trending books read straight off the index
+        Index("ix_books_trending_score_id", "trending_score", "id"),
+        # full-text and fuzzy search, PostgreSQL only
+        Index(
+            "ix_books_search_vector",
+            book_search_vector(title, author, description),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_books_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_books_author_trgm",
+            "author",
+            postgresql_using="gin",
+            postgresql_ops={"author": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# full-text document of a book, queries must use this exact expression
+# for PostgreSQL to pick up ix_books_search_vector
+BOOK_SEARCH_VECTOR = book_search_vector(Book.title, Book.author, Book.description)
+
+# search indexes exist only on PostgreSQL, SQLite uses core.search fallback
+event.listen(
+    Book.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class User(Base):
     """Class for users data table"""
@@ -48,3 +127,140 @@ class UserBook(Base):
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
     status = Column(String(20), nullable=False)  # 'read' или 'planned'
     rating = Column(Integer)
+    # Python-side defaults too, so Core inserts and upserts set them
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=func.now(),
+        server_default=func.now(),
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=func.now(),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+
+    __table_args__ = (
+        # one row per book on a shelf, also the conflict target of upserts
+        UniqueConstraint("user_id", "book_id", name="uq_user_books_user_id_book_id"),
+        Index("idx_user_books_book_id", "book_id"),
+        Index("idx_user_books_status", "status"),
+        # shelf listings filtered by status
+        Index("idx_user_books_user_id_status", "user_id", "status"),
+    )
+
+
+class UserStats(Base):
+    """Class for per-user shelf totals, maintained by db.user_stats"""
+
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    book_count = Column(Integer, nullable=False, default=0, server_default="0")
+    read_count = Column(Integer, nullable=False, default=0, server_default="0")
+    planned_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # histogram of the ratings given, one column per star
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class UserAuthorStats(Base):
+    """Class for per-user, per-author shelf totals"""
+
+    __tablename__ = "user_author_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    author = Column(String, nullable=False)
+    book_count = Column(Integer, nullable=False, default=0, server_default="0")
+    read_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        PrimaryKeyConstraint("user_id", "author"),
+        # favourite authors of a user without scanning all of them
+        Index("ix_user_author_stats_user_id_read_count", "user_id", "read_count"),
+    )
+
+
+class UserYearStats(Base):
+    """Class for per-user counts of read books by publication year"""
+
+    __tablename__ = "user_year_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    read_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class BookNeighbour(Base):
+    """Class for precomputed item-item similarities (top-K per book)"""
+
+    __tablename__ = "book_neighbours"
+
+    book_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    neighbour_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    score = Column(Float, nullable=False)
+
+
+class TrendingEpoch(Base):
+    """Class for the single row holding the epoch of the trending scores"""
+
+    __tablename__ = "trending_epoch"
+
+    id = Column(Integer, primary_key=True)
+    # UNIX time the stored scores are relative to, moved by db.trending
+    epoch = Column(Float, nullable=False)
+
+
+class Job(Base):
+    """Class for the outbox of background jobs, run by core.jobs"""
+
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    key = Column(String(100), nullable=False)
+    # summed when a job with the same kind and key is enqueued again
+    amount = Column(Float, nullable=False, default=0, server_default="0")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    enqueued_at = Column(DateTime(timezone=True), nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    # set once a job runs out of attempts, it then waits for an operator
+    # to fix the cause and run `manage.py retry-jobs`
+    failed_at = Column(DateTime(timezone=True))
+    last_error = Column(String)
+
+    __table_args__ = (
+        # one waiting job per kind and key, the conflict target of enqueue
+        UniqueConstraint("kind", "key", name="uq_jobs_kind_key"),
+        Index("ix_jobs_run_at", "run_at"),
+    )
+
+
+class RefreshToken(Base):
+    """Class for issued refresh tokens, redeemed once by core.security"""
+
+    __tablename__ = "refresh_tokens"
+
+    # "jti" claim of the token, the token itself is not stored
+    jti = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # tokens descending from the same login, revoked together on reuse
+    family = Column(String(32), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    # set when the token is exchanged, a second exchange means it leaked
+    used_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_refresh_tokens_family", "family"),
+        Index("ix_refresh_tokens_user_id", "user_id"),
+    )
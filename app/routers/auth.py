@@ -1,69 +1,131 @@
-from core.security import create_access_token, get_password_hash, verify_password
+from core.hashing import password_hasher
+from core.security import issue_tokens, redeem_refresh_token
+from core.tokens import keyring
 from db.session import get_db
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from models.api_models import Token, UserCreate
+from models.api_models import RefreshRequest, Token, UserCreate
 from models.db_models import User
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=Token)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    """Register a new user and return an access token.
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
+    """Register a new user and return an access and a refresh token.
 
     Args:
         user_data (UserCreate): User registration data containing username, email and password.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
-        Token: Access token for the newly registered user.
+        Token: Tokens for the newly registered user.
 
     Raises:
         HTTPException: 400 if username or email already exists.
+        HashingPoolSaturated: if the hashing pool is busy (served as 503).
     """
-    if db.query(User).filter(User.username == user_data.username).first():
+    if await db.scalar(select(User.id).where(User.username == user_data.username)):
         raise HTTPException(status_code=400, detail="Username already registered")
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User.id).where(User.email == user_data.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user = User(
         username=user_data.username,
         email=user_data.email,
         hashed_password=hashed_password,
     )
     db.add(user)
-    db.commit()
-
-    access_token = create_access_token(data={"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    await db.flush()
+    tokens = await issue_tokens(db, user)
+    await db.commit()
+    return tokens
 
 
 @router.post("/login", response_model=Token)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
-    """Authenticate user and return an access token.
+    """Authenticate user and return an access and a refresh token.
+
+    Hashes made with outdated bcrypt parameters are replaced on success.
+    Clients renew expired access tokens at /auth/refresh rather than
+    logging in again, which skips the bcrypt check.
 
     Args:
         form_data (OAuth2PasswordRequestForm): Form containing username and password.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
-        Token: Access token for authenticated user.
+        Token: Tokens for the authenticated user.
 
     Raises:
         HTTPException: 401 if authentication fails.
+        HashingPoolSaturated: if the hashing pool is busy (served as 503).
     """
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    result = await db.execute(select(User).where(User.username == form_data.username))
+    user = result.scalars().first()
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await password_hasher.verify_and_update(
+            form_data.password, user.hashed_password
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(data={"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    if new_hash:
+        user.hashed_password = new_hash
+    tokens = await issue_tokens(db, user)
+    await db.commit()
+    return tokens
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """Exchange a refresh token for a new access and refresh token.
+
+    Each refresh token is accepted once; the new one belongs to the same
+    family and expires REFRESH_TOKEN_EXPIRE_DAYS after this exchange.
+    Reusing a token revokes its whole family.
+
+    Args:
+        request (RefreshRequest): The refresh token from a previous response.
+        db (AsyncSession): Database session.
+
+    Returns:
+        Token: New tokens for the token's user.
+
+    Raises:
+        HTTPException: 401 if the token is invalid, expired, revoked or
+            was already exchanged.
+    """
+    redeemed = await redeem_refresh_token(db, request.refresh_token)
+    if redeemed is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, family = redeemed
+    tokens = await issue_tokens(db, user, family)
+    await db.commit()
+    return tokens
+
+
+@router.get("/jwks.json")
+async def jwks():
+    """Public keys verifying the access tokens, as a JSON Web Key Set.
+
+    Lets other services check tokens without calling this one.
+
+    Returns:
+        dict: Keys of the RS256 signatures, by key ID.
+    """
+    return keyring.jwks()
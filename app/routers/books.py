@@ -1,55 +1,292 @@
-from typing import List
+import io
+from typing import List, Literal
 
-from db.session import get_db
-from fastapi import APIRouter, Depends, HTTPException
-from models.api_models import Book, BookCreate, BookUpdate
+from config import settings
+from core.catalogue_import import FORMATS, detect_format, import_books
+from core.export import export_response
+from core.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_order,
+    keyset_phases,
+)
+from core.recommendations import drop_neighbours
+from core.response_cache import LIST_TAG, response_cache
+from core.search import book_search
+from core.serialization import ORJSONResponse, model_columns, rows_as_dicts
+from core.shelves import remove_book_from_shelves
+from core.trending import trending_board
+from db.replicas import get_read_db
+from db.session import SessionLocal, get_db
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    UploadFile,
+)
+from fastapi.concurrency import run_in_threadpool
+from models.api_models import (
+    Book,
+    BookCreate,
+    BookImportReport,
+    BookSearchHit,
+    BookUpdate,
+    TrendingBook,
+)
 from models.db_models import Book as DBBook
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/books", tags=["books"])
 
+SORT_COLUMNS = {
+    "id": DBBook.id,
+    "title": DBBook.title,
+    "year": DBBook.year,
+    "average_rating": DBBook.average_rating,
+}
+BOOK_FIELDS, BOOK_COLUMNS = model_columns(Book, DBBook)
+
+
+def _book_page(
+    rows: list[Row], limit: int, order_by: str, descending: bool
+) -> ORJSONResponse:
+    """Book list response, with the cursor of the next page if it is full"""
+    books = rows_as_dicts(rows, BOOK_FIELDS)
+    headers = {}
+    if books and len(books) == limit:
+        last = books[-1]
+        headers["X-Next-Cursor"] = encode_cursor(
+            order_by, descending, last[SORT_COLUMNS[order_by].key], last["id"]
+        )
+    return ORJSONResponse(books, headers=headers)
+
 
 @router.get("/", response_model=List[Book])
-def read_books(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def read_books(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    order_by: Literal["id", "title", "year", "average_rating"] = "id",
+    descending: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+):
     """Retrieve a list of books with pagination support.
 
+    Two pagination modes are supported. Passing `cursor` (taken from the
+    `X-Next-Cursor` header of the previous page) seeks directly past the
+    last returned row, so every page costs the same. `skip` is kept for
+    old clients and gets slower the deeper it goes.
+
+    Rows are selected as plain tuples and encoded with orjson, skipping
+    ORM objects and per-row model validation.
+
     Args:
-        skip (int): Number of records to skip (for pagination).
+        skip (int): Number of records to skip (ignored when cursor is set).
         limit (int): Maximum number of records to return.
-        db (Session): Database session.
+        cursor (str | None): Opaque token of the page to continue from.
+        order_by (str): Sort key - id, title, year or average_rating.
+        descending (bool): Sort in descending order.
+        db (AsyncSession): Database session.
+
+    Returns:
+        ORJSONResponse: List of books, with the `X-Next-Cursor` header
+            when more may follow.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or was issued
+            for a different ordering.
+    """
+    column = SORT_COLUMNS[order_by]
+    query = select(*BOOK_COLUMNS)
+
+    if skip and cursor is None:
+        query = query.order_by(*keyset_order(column, DBBook.id, descending))
+        rows = (await db.execute(query.offset(skip).limit(limit))).all()
+        return _book_page(rows, limit, order_by, descending)
+
+    position = None
+    if cursor is not None:
+        try:
+            cursor_order, cursor_descending, value, last_id = decode_cursor(
+                cursor, column.type.python_type
+            )
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if (cursor_order, cursor_descending) != (order_by, descending):
+            raise HTTPException(
+                status_code=400, detail="Cursor does not match the requested order"
+            )
+        position = (value, last_id)
+
+    rows = []
+    for condition, order in keyset_phases(column, DBBook.id, descending, position):
+        page = query.where(condition).order_by(*order).limit(limit - len(rows))
+        rows.extend((await db.execute(page)).all())
+        if len(rows) == limit:
+            break
+    return _book_page(rows, limit, order_by, descending)
+
+
+@router.get("/search", response_model=List[BookSearchHit])
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    highlight: bool = True,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Search books by title, author and description.
+
+    Results are ranked by relevance, title matches weigh the most.
+    Misspelled words still match similar ones.
+
+    Args:
+        q (str): Free text query.
+        skip (int): Number of hits to skip (for pagination).
+        limit (int): Maximum number of hits to return.
+        highlight (bool): Whether to return matched words marked up.
+        db (AsyncSession): Database session.
+
+    Returns:
+        List[BookSearchHit]: Matching books, best first.
+    """
+    hits = await book_search.search(db, q, skip, limit, highlight)
+    return [
+        BookSearchHit(
+            **Book.model_validate(hit.book).model_dump(),
+            score=hit.score,
+            highlights=hit.highlights,
+        )
+        for hit in hits
+    ]
+
+
+@router.get("/trending", response_model=List[TrendingBook])
+async def read_trending_books(
+    limit: int = Query(10, ge=1, le=settings.TRENDING_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Retrieve the books with the most shelf activity lately.
+
+    Reads, plans and ratings count with weights that halve every
+    `TRENDING_HALF_LIFE_HOURS`. The list is precomputed and reloaded in
+    the background, so it may lag behind by `TRENDING_REFRESH_SECONDS`.
+
+    Args:
+        limit (int): Maximum number of books to return.
+        db (AsyncSession): Database session, used only before the first load.
 
     Returns:
-        List[Book]: List of book objects.
+        ORJSONResponse: Books with their current scores, best first.
     """
-    books = db.query(DBBook).offset(skip).limit(limit).all()
-    return books
+    return ORJSONResponse(await trending_board.top(db, limit))
+
+
+@router.get("/export")
+async def export_catalogue(
+    format: Literal["ndjson", "csv"] = "ndjson", compress: bool = False
+):
+    """Download the whole catalogue as a stream.
+
+    Rows are sent as they are read, ordered by id, so the export costs one
+    query no matter how large the catalogue is.
+
+    Args:
+        format (str): "ndjson" (one JSON object per line) or "csv".
+        compress (bool): Gzip the body (sent with Content-Encoding: gzip).
+
+    Returns:
+        StreamingResponse: The books with their rating aggregates.
+    """
+    stmt = select(
+        DBBook.id,
+        DBBook.title,
+        DBBook.author,
+        DBBook.year,
+        DBBook.description,
+        DBBook.average_rating,
+        DBBook.rating_count,
+        DBBook.read_count,
+        DBBook.planned_count,
+    ).order_by(DBBook.id)
+    return export_response(stmt, format, compress, "books")
 
 
 @router.post("/", response_model=Book)
-def create_book(book: BookCreate, db: Session = Depends(get_db)):
+async def create_book(book: BookCreate, db: AsyncSession = Depends(get_db)):
     """Create a new book record.
 
     Args:
         book (BookCreate): Book data to create.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         Book: The newly created book object.
     """
     db_book = DBBook(**book.model_dump())
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
+    book_search.book_saved(db_book)
     return db_book
 
 
+@router.post("/import", response_model=BookImportReport)
+async def import_catalogue(
+    file: UploadFile = File(...),
+    format: Literal["csv", "jsonl"] | None = None,
+):
+    """Bulk import books from a CSV or JSON Lines file.
+
+    The upload is streamed in batches, so files of any size can be imported.
+    Books already in the catalogue (same title and author) are skipped,
+    invalid rows are reported without aborting the import.
+
+    Args:
+        file (UploadFile): CSV with a header row or JSON Lines file with
+            title, author, year and description fields.
+        format (str | None): "csv" or "jsonl", detected from the file
+            name when omitted.
+
+    Returns:
+        BookImportReport: Counts of inserted, duplicate and failed rows.
+
+    Raises:
+        HTTPException: 400 if the format can't be determined.
+    """
+    fmt = format or detect_format(file.filename)
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=400, detail="Unknown file format, pass format=csv or jsonl"
+        )
+
+    def run():
+        # utf-8-sig: spreadsheet exports often start with a BOM
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        try:
+            with SessionLocal() as db:
+                return import_books(db, stream, fmt)
+        finally:
+            stream.detach()
+
+    report = await run_in_threadpool(run)
+    if report.inserted:
+        book_search.catalogue_changed()
+        response_cache.invalidate({LIST_TAG})
+    return report
+
+
 @router.get("/{book_id}", response_model=Book)
-def read_book(book_id: int, db: Session = Depends(get_db)):
+async def read_book(book_id: int, db: AsyncSession = Depends(get_read_db)):
     """Retrieve a single book by its ID.
 
     Args:
         book_id (int): ID of the book to retrieve.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         Book: The requested book object.
@@ -57,24 +294,24 @@ def read_book(book_id: int, db: Session = Depends(get_db)):
     Raises:
         HTTPException: 404 if book is not found.
     """
-    book = db.query(DBBook).filter(DBBook.id == book_id).first()
+    book = await db.get(DBBook, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     return book
 
 
 @router.put("/{book_id}", response_model=Book)
-def update_book(
+async def update_book(
     book_id: int,
     book: BookUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Update an existing book record.
 
     Args:
         book_id (int): ID of the book to update.
         book (BookUpdate): New book data (partial updates supported).
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         Book: The updated book object.
@@ -82,7 +319,7 @@ def update_book(
     Raises:
         HTTPException: 404 if book is not found.
     """
-    db_book = db.query(DBBook).filter(DBBook.id == book_id).first()
+    db_book = await db.get(DBBook, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -90,32 +327,42 @@ def update_book(
     for field, value in update_data.items():
         setattr(db_book, field, value)
 
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
+    book_search.book_saved(db_book)
     return db_book
 
 
 @router.delete("/{book_id}")
-def delete_book(
+async def delete_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Delete a book record.
 
     Args:
         book_id (int): ID of the book to delete.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         dict: Success message.
 
     Raises:
         HTTPException: 404 if book is not found.
+
+    Note:
+        The book is taken off every shelf (updating its readers' statistics)
+        and out of the recommendations in the same transaction, so no row
+        is left referencing it.
     """
-    book = db.query(DBBook).filter(DBBook.id == book_id).first()
+    book = await db.get(DBBook, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    db.delete(book)
-    db.commit()
+    await remove_book_from_shelves(db, book_id)
+    await drop_neighbours(db, book_id)
+    await db.delete(book)
+    await db.commit()
+    book_search.book_deleted(book_id)
+    trending_board.book_deleted(book_id)
     return {"message": "Книга успешно удалена"}
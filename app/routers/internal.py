@@ -0,0 +1,55 @@
+from core.auth_cache import auth_cache
+from core.hashing import password_hasher
+from core.response_cache import response_cache
+from core.security import require_internal_token
+from db.session import pool_metrics
+from fastapi import APIRouter, Depends
+
+# operator telemetry, only served to holders of INTERNAL_TOKEN
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_token)],
+)
+
+
+@router.get("/pool")
+async def read_pool_metrics() -> dict:
+    """Connection pool state and telemetry of the request engine.
+
+    Returns:
+        dict: Checked out and overflow connections, connection churn
+            counters and a histogram of connection acquire times.
+    """
+    return pool_metrics.snapshot()
+
+
+@router.get("/auth-cache")
+async def read_auth_cache_metrics() -> dict:
+    """Hit and miss counters of the token/user cache used by get_current_user.
+
+    Returns:
+        dict: Hits, misses and hit ratio.
+    """
+    return auth_cache.snapshot()
+
+
+@router.get("/hashing")
+async def read_hashing_metrics() -> dict:
+    """State of the password hashing pool.
+
+    Returns:
+        dict: In-flight jobs, queue depth, rejections and hash latency.
+    """
+    return password_hasher.snapshot()
+
+
+@router.get("/response-cache")
+async def read_response_cache_metrics() -> dict:
+    """Size and hit ratio of the cache of book read responses.
+
+    Returns:
+        dict: Entries, bytes used, hits, misses, 304s and hit ratio.
+    """
+    return response_cache.snapshot()
@@ -1,44 +1,187 @@
-from typing import List
+from typing import List, Literal
 
+from core.export import export_response
+from core.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_phases,
+)
+from core.recommendations import recommend_books
 from core.security import get_current_user
+from core.serialization import ORJSONResponse, model_columns, rows_as_dicts
+from core.shelves import apply_shelf_operations, enqueue_shelf_jobs
+from db.aggregates import entry_of
+from db.replicas import get_read_db
 from db.session import get_db
-from fastapi import APIRouter, Depends, HTTPException
-from models.api_models import UserBook, UserBookCreate, UserBookUpdate
+from db.user_stats import apply_user_stat_changes, load_reading_stats
+from fastapi import APIRouter, Depends, HTTPException, Query
+from models.api_models import (
+    Book,
+    ReadingStats,
+    RecommendedBook,
+    ShelfBatch,
+    ShelfBook,
+    ShelfOperationResult,
+    UserBook,
+    UserBookCreate,
+    UserBookUpdate,
+)
+from models.db_models import Book as DBBook
 from models.db_models import User
 from models.db_models import UserBook as DBUserBook
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/account", tags=["users"])
 
+SHELF_SORT_COLUMNS = {
+    "id": DBUserBook.id,
+    "title": DBBook.title,
+    "year": DBBook.year,
+    "rating": DBUserBook.rating,
+    "average_rating": DBBook.average_rating,
+}
+SHELF_FIELDS, SHELF_COLUMNS = model_columns(UserBook, DBUserBook)
+BOOK_FIELDS, BOOK_COLUMNS = model_columns(Book, DBBook)
 
-@router.get("/books", response_model=List[UserBook])
-def get_my_books(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+
+@router.get("/books", response_model=List[ShelfBook])
+async def get_my_books(
+    status: Literal["read", "planned"] | None = None,
+    rating: int | None = Query(None, ge=1, le=5),
+    min_rating: int | None = Query(None, ge=1, le=5),
+    order_by: Literal["id", "title", "year", "rating", "average_rating"] = "id",
+    descending: bool = False,
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = None,
+    include_book: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Retrieve all books in the current user's collection.
+    """Retrieve the books in the current user's collection.
+
+    Filtering, sorting and the optional book details all come from one
+    query, so a client can render a shelf page without fetching every
+    book separately. Without `limit` the whole shelf is returned; with it
+    the next page is continued from the `X-Next-Cursor` header. Rows are
+    selected as plain tuples and encoded with orjson.
 
     Args:
+        status (str | None): Only entries with this status.
+        rating (int | None): Only entries rated exactly this.
+        min_rating (int | None): Only entries rated at least this.
+        order_by (str): Sort key - id (shelf order), title, year, rating
+            (the user's) or average_rating (the book's).
+        descending (bool): Sort in descending order.
+        limit (int | None): Maximum number of entries to return.
+        cursor (str | None): Opaque token of the page to continue from.
+        include_book (bool): Embed the book of every entry.
         current_user (User): Authenticated user (from JWT token).
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
-        List[UserBook]: All books associated with the user.
+        ORJSONResponse: Matching entries, with `book` set if requested.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or was issued
+            for a different ordering.
     """
-    return db.query(DBUserBook).filter(DBUserBook.user_id == current_user.id).all()
+    column = SHELF_SORT_COLUMNS[order_by]
+    query = select(*SHELF_COLUMNS, column).where(DBUserBook.user_id == current_user.id)
+    if include_book:
+        query = query.add_columns(*BOOK_COLUMNS)
+    if include_book or column.class_ is DBBook:
+        query = query.join(DBBook, DBBook.id == DBUserBook.book_id)
+    if status is not None:
+        query = query.where(DBUserBook.status == status)
+    if rating is not None:
+        query = query.where(DBUserBook.rating == rating)
+    if min_rating is not None:
+        query = query.where(DBUserBook.rating >= min_rating)
+
+    position = None
+    if cursor is not None:
+        try:
+            cursor_order, cursor_descending, value, last_id = decode_cursor(
+                cursor, column.type.python_type
+            )
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if (cursor_order, cursor_descending) != (order_by, descending):
+            raise HTTPException(
+                status_code=400, detail="Cursor does not match the requested order"
+            )
+        position = (value, last_id)
+
+    rows = []
+    for condition, order in keyset_phases(column, DBUserBook.id, descending, position):
+        phase = query.where(condition).order_by(*order)
+        if limit is not None:
+            phase = phase.limit(limit - len(rows))
+        rows.extend((await db.execute(phase)).all())
+        if len(rows) == limit:
+            break
+
+    # row layout: shelf fields, sort key, then book fields if embedded
+    sort_key = len(SHELF_FIELDS)
+    entries = rows_as_dicts(rows, SHELF_FIELDS)
+    for entry, row in zip(entries, rows):
+        entry["book"] = (
+            dict(zip(BOOK_FIELDS, row[sort_key + 1 :])) if include_book else None
+        )
+    headers = {}
+    if limit is not None and len(rows) == limit:
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(
+            order_by, descending, last[sort_key], entries[-1]["id"]
+        )
+    return ORJSONResponse(entries, headers=headers)
+
+
+@router.get("/books/export")
+async def export_my_books(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    compress: bool = False,
+    current_user: User = Depends(get_current_user),
+):
+    """Download the current user's shelf as a stream.
+
+    Args:
+        format (str): "ndjson" (one JSON object per line) or "csv".
+        compress (bool): Gzip the body (sent with Content-Encoding: gzip).
+        current_user (User): Authenticated user (from JWT token).
+
+    Returns:
+        StreamingResponse: Shelf entries with the title and author of each book.
+    """
+    stmt = (
+        select(
+            DBUserBook.book_id,
+            DBBook.title,
+            DBBook.author,
+            DBUserBook.status,
+            DBUserBook.rating,
+        )
+        .join(DBBook, DBBook.id == DBUserBook.book_id)
+        .where(DBUserBook.user_id == current_user.id)
+        .order_by(DBUserBook.id)
+    )
+    return export_response(stmt, format, compress, "my_books")
 
 
 @router.post("/books", response_model=UserBook)
-def add_book_to_my_list(
+async def add_book_to_my_list(
     book_data: UserBookCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Add a new book to the user's collection.
 
     Args:
         book_data (UserBookCreate): Book data including book_id, status and optional rating.
         current_user (User): Authenticated user (from JWT token).
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         UserBook: The newly created user-book relationship.
@@ -46,6 +189,15 @@ def add_book_to_my_list(
     Raises:
         HTTPException: 400 if book already exists in user's list.
     """
+    result = await db.execute(
+        select(DBUserBook.id).where(
+            DBUserBook.user_id == current_user.id,
+            DBUserBook.book_id == book_data.book_id,
+        )
+    )
+    if result.first() is not None:
+        raise HTTPException(status_code=400, detail="Book already in user's list")
+
     user_book = DBUserBook(
         user_id=current_user.id,
         book_id=book_data.book_id,
@@ -53,17 +205,55 @@ def add_book_to_my_list(
         rating=book_data.rating,
     )
     db.add(user_book)
-    db.commit()
-    db.refresh(user_book)
+    change = (book_data.book_id, None, entry_of(user_book))
+    await apply_user_stat_changes(db, current_user.id, [change])
+    await enqueue_shelf_jobs(db, [change])
+    await db.commit()
+    await db.refresh(user_book)
     return user_book
 
 
+@router.post("/books/batch", response_model=List[ShelfOperationResult])
+async def apply_batch_to_my_list(
+    batch: ShelfBatch,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Apply many add/update/remove operations to the user's collection at once.
+
+    Operations run in order within one transaction. `add` also overwrites
+    an existing entry, so replaying a batch is safe. A failing operation
+    is reported in its result and doesn't abort the others.
+
+    Args:
+        batch (ShelfBatch): Up to 1000 operations.
+        current_user (User): Authenticated user (from JWT token).
+        db (AsyncSession): Database session.
+
+    Returns:
+        List[ShelfOperationResult]: One result per operation, in order.
+    """
+    errors, entries = await apply_shelf_operations(
+        db, current_user.id, batch.operations
+    )
+    return [
+        ShelfOperationResult(
+            op=operation.op,
+            book_id=operation.book_id,
+            ok=error is None,
+            error=error,
+            entry=None if error else entries.get(operation.book_id),
+        )
+        for operation, error in zip(batch.operations, errors)
+    ]
+
+
 @router.put("/books/{book_id}", response_model=UserBook)
-def update_book_in_my_list(
+async def update_book_in_my_list(
     book_id: int,
     book_data: UserBookUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Update a book's status or rating in the user's collection.
 
@@ -71,7 +261,7 @@ def update_book_in_my_list(
         book_id (int): ID of the book to update.
         book_data (UserBookUpdate): New status/rating values.
         current_user (User): Authenticated user (from JWT token).
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         UserBook: Updated book record.
@@ -79,36 +269,41 @@ def update_book_in_my_list(
     Raises:
         HTTPException: 404 if book not found in user's collection.
     """
-    user_book = (
-        db.query(DBUserBook)
-        .filter(DBUserBook.user_id == current_user.id, DBUserBook.book_id == book_id)
-        .first()
+    result = await db.execute(
+        select(DBUserBook).where(
+            DBUserBook.user_id == current_user.id, DBUserBook.book_id == book_id
+        )
     )
+    user_book = result.scalars().first()
 
     if not user_book:
         raise HTTPException(status_code=404, detail="Book not found in user's list")
 
+    old_entry = entry_of(user_book)
     update_data = book_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(user_book, field, value)
 
-    db.commit()
-    db.refresh(user_book)
+    change = (book_id, old_entry, entry_of(user_book))
+    await apply_user_stat_changes(db, current_user.id, [change])
+    await enqueue_shelf_jobs(db, [change])
+    await db.commit()
+    await db.refresh(user_book)
     return user_book
 
 
 @router.delete("/books/{book_id}")
-def remove_book_from_my_list(
+async def remove_book_from_my_list(
     book_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Remove a book from the user's collection.
 
     Args:
         book_id (int): ID of the book to remove.
         current_user (User): Authenticated user (from JWT token).
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         dict: Success message with confirmation.
@@ -116,15 +311,65 @@ def remove_book_from_my_list(
     Raises:
         HTTPException: 404 if book not found in user's collection.
     """
-    user_book = (
-        db.query(DBUserBook)
-        .filter(DBUserBook.user_id == current_user.id, DBUserBook.book_id == book_id)
-        .first()
+    result = await db.execute(
+        select(DBUserBook).where(
+            DBUserBook.user_id == current_user.id, DBUserBook.book_id == book_id
+        )
     )
+    user_book = result.scalars().first()
 
     if not user_book:
         raise HTTPException(status_code=404, detail="Book not found in user's list")
 
-    db.delete(user_book)
-    db.commit()
+    change = (book_id, entry_of(user_book), None)
+    await apply_user_stat_changes(db, current_user.id, [change])
+    await enqueue_shelf_jobs(db, [change])
+    await db.delete(user_book)
+    await db.commit()
     return {"message": "Книга успешно удалена из списка"}
+
+
+@router.get("/recommendations", response_model=List[RecommendedBook])
+async def get_my_recommendations(
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Recommend books based on what similar readers have on their shelves.
+
+    Args:
+        limit (int): Maximum number of books to return.
+        current_user (User): Authenticated user (from JWT token).
+        db (AsyncSession): Database session.
+
+    Returns:
+        List[RecommendedBook]: Books not on the user's shelf, best first.
+    """
+    recommended = await recommend_books(db, current_user.id, limit)
+    return [
+        RecommendedBook(**Book.model_validate(book).model_dump(), score=score)
+        for book, score in recommended
+    ]
+
+
+@router.get("/stats", response_model=ReadingStats)
+async def get_my_stats(
+    authors: int = Query(5, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Summarise the current user's shelf.
+
+    Served from statistics maintained on every shelf change, so the cost
+    doesn't depend on the number of books on the shelf.
+
+    Args:
+        authors (int): Number of favourite authors to return.
+        current_user (User): Authenticated user (from JWT token).
+        db (AsyncSession): Database session.
+
+    Returns:
+        ReadingStats: Counts, rating distribution, read books by publication
+            year and the most read authors.
+    """
+    return await load_reading_stats(db, current_user.id, authors)
@@ -0,0 +1,50 @@
+"""Production entry point: several uvicorn workers sharing one socket.
+
+Run from the app directory (the Docker image does this by default):
+
+    python serve.py
+
+Workers are spawned processes that import `main:app` themselves, so each
+one gets its own engines, connection pools and password hashing pool.
+uvloop and httptools are used when installed (uvicorn[standard]).
+
+On SIGTERM the server stops accepting connections, lets in-flight
+requests finish for up to WEB_GRACEFUL_SHUTDOWN_SECONDS and runs the
+lifespan shutdown of every worker.
+"""
+
+import os
+
+import uvicorn
+from config import settings
+
+
+def worker_count() -> int:
+    """Configured number of workers, one per usable CPU by default"""
+    if settings.WEB_WORKERS:
+        return settings.WEB_WORKERS
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main() -> None:
+    """Starts the server and blocks until it shuts down"""
+    uvicorn.run(
+        "main:app",
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=worker_count(),
+        loop="auto",
+        http="auto",
+        limit_max_requests=settings.WEB_MAX_REQUESTS or None,
+        limit_max_requests_jitter=settings.WEB_MAX_REQUESTS_JITTER,
+        timeout_keep_alive=settings.WEB_KEEP_ALIVE_SECONDS,
+        backlog=settings.WEB_BACKLOG,
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_SHUTDOWN_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
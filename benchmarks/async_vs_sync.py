@@ -0,0 +1,120 @@
+"""Throughput of the async request path compared with the old sync one.
+
+Both variants run the same book listing query in-process over ASGI. The
+sync handler is the pre-async implementation that occupies one of
+Starlette's threadpool workers while it waits on the database, the async
+one awaits the query on the event loop.
+
+Run from the repository root against the configured database:
+
+    python benchmarks/async_vs_sync.py --requests 2000 --concurrency 1 8 32 128
+
+PostgreSQL gives meaningful numbers; `--query-delay-ms` adds a server-side
+pg_sleep to every request to emulate slow queries, which is where the
+threadpool cap shows up.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db.migrate import upgrade
+from db.seed import seed_sample_data
+from db.session import SessionLocal, engine, get_db
+from fastapi import Depends, FastAPI
+from models.api_models import Book
+from models.db_models import Book as DBBook
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DELAY_QUERY = text("SELECT pg_sleep(:seconds)")
+
+
+def build_app(delay: float, page_size: int) -> FastAPI:
+    """Builds an app exposing the same listing as a sync and an async route"""
+    app = FastAPI()
+    query = select(DBBook).order_by(DBBook.id).limit(page_size)
+
+    @app.get("/sync/books", response_model=list[Book])
+    def sync_books():
+        with SessionLocal() as db:
+            if delay:
+                db.execute(DELAY_QUERY, {"seconds": delay})
+            return db.execute(query).scalars().all()
+
+    @app.get("/async/books", response_model=list[Book])
+    async def async_books(db: AsyncSession = Depends(get_db)):
+        if delay:
+            await db.execute(DELAY_QUERY, {"seconds": delay})
+        return (await db.execute(query)).scalars().all()
+
+    return app
+
+
+async def run_level(
+    client: httpx.AsyncClient, path: str, total: int, concurrency: int
+) -> tuple[float, float, float]:
+    """Sends `total` requests with `concurrency` clients in flight.
+
+    Returns:
+        tuple: (requests per second, p50 latency ms, p95 latency ms).
+    """
+    latencies = []
+    pending = iter(range(total))
+
+    async def worker():
+        for _ in pending:
+            start = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return total / elapsed, cuts[49] * 1000, cuts[94] * 1000
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.query_delay_ms and engine.dialect.name != "postgresql":
+        raise SystemExit("--query-delay-ms needs PostgreSQL (pg_sleep)")
+    upgrade()
+    with SessionLocal() as db:
+        seed_sample_data(db, only_if_empty=True)
+
+    app = build_app(args.query_delay_ms / 1000, args.page_size)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        # warm up both pools
+        for path in ("/sync/books", "/async/books"):
+            await run_level(client, path, 20, 4)
+
+        print(f"{'clients':>8} {'path':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+        for concurrency in args.concurrency:
+            for name in ("sync", "async"):
+                rps, p50, p95 = await run_level(
+                    client, f"/{name}/books", args.requests, concurrency
+                )
+                print(
+                    f"{concurrency:>8} {name:>6} {rps:>10.1f} {p50:>9.2f} {p95:>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--query-delay-ms", type=float, default=0)
+    asyncio.run(main(parser.parse_args()))
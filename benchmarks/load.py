@@ -0,0 +1,538 @@
+"""Load test of every book, account and auth endpoint.
+
+`seed` fills the configured database with a synthetic dataset whose
+popularity is skewed the way real catalogues are: a few books are on most
+shelves and a few users rate most books. `run` then drives each endpoint
+at a fixed concurrency, in-process over ASGI or against a running server
+(`--url`), reports p50/p95/p99 latency and throughput, writes the results
+as JSON and fails when they regress against a baseline.
+
+Run from the repository root, e.g. against a throwaway SQLite file:
+
+    export SQLITE_PATH=/tmp/bench.db
+    python benchmarks/load.py seed --reset --users 2000 --books 20000
+    python benchmarks/load.py run --concurrency 16 --output results.json
+    python benchmarks/load.py run --baseline results.json
+
+Numbers are only comparable between runs on the same machine, database
+and dataset. The seed is fixed so datasets are reproducible, but the
+write scenarios change the data: reseed before a run that is compared
+with a baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from config import settings
+from core.hashing import pwd_context
+from core.recommendations import build_neighbours
+from db.aggregates import rebuild_book_stats
+from db.migrate import upgrade
+from db.session import Base, SessionLocal, engine
+from db.trending import rebuild_trending_scores
+from db.user_stats import rebuild_user_stats
+from models.db_models import Book, User, UserBook
+from sqlalchemy import func, insert, select, text
+
+PASSWORD = "bench-password"
+WORDS = [
+    "war",
+    "peace",
+    "night",
+    "day",
+    "river",
+    "stone",
+    "house",
+    "garden",
+    "winter",
+    "summer",
+    "shadow",
+    "light",
+    "king",
+    "queen",
+    "road",
+    "sea",
+    "star",
+    "fire",
+    "glass",
+    "silver",
+    "iron",
+    "dream",
+    "city",
+    "island",
+    "letter",
+    "secret",
+    "journey",
+    "return",
+    "empire",
+    "storm",
+    "silence",
+    "forest",
+    "mirror",
+    "ghost",
+    "harbour",
+]
+INSERT_CHUNK = 10_000
+# users whose tokens the authenticated scenarios rotate through
+TOKEN_USERS = 50
+
+
+def zipf_weights(n: int, exponent: float) -> np.ndarray:
+    """Probability of each rank under a Zipf law, rank 0 most likely"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def insert_chunked(db, model, rows) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.execute(insert(model), rows[start : start + INSERT_CHUNK])
+
+
+def seed(args: argparse.Namespace) -> None:
+    """Creates the synthetic dataset"""
+    rng = np.random.default_rng(args.seed)
+    if args.reset:
+        Base.metadata.drop_all(engine)
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    upgrade()
+
+    with SessionLocal() as db:
+        if db.scalar(select(func.count(Book.id))) and not args.reset:
+            raise SystemExit("Database is not empty, pass --reset to replace it")
+
+        # hashing once is enough, every user gets the same password
+        hashed = pwd_context.hash(PASSWORD)
+        insert_chunked(
+            db,
+            User,
+            [
+                {
+                    "username": f"bench{i}",
+                    "email": f"bench{i}@example.com",
+                    "hashed_password": hashed,
+                }
+                for i in range(args.users)
+            ],
+        )
+        words = np.array(WORDS)
+        titles = [" ".join(t) for t in rng.choice(words, size=(args.books, 3))]
+        insert_chunked(
+            db,
+            Book,
+            [
+                {
+                    "title": title.capitalize(),
+                    "author": f"Author {int(rng.integers(args.books // 10 + 1))}",
+                    "year": int(rng.integers(1800, 2025)),
+                    "description": f"Synthetic book {i}: {title}",
+                }
+                for i, title in enumerate(titles)
+            ],
+        )
+
+        user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+        book_ids = np.array(db.scalars(select(Book.id).order_by(Book.id)).all())
+        book_weights = zipf_weights(len(book_ids), args.skew)
+        # shelf sizes are heavy tailed too: most users have a few books
+        sizes = np.minimum(
+            rng.lognormal(np.log(args.shelf_size), 1.0, len(user_ids)).astype(int) + 1,
+            len(book_ids),
+        )
+        shelves = []
+        for user_id, size in zip(user_ids, sizes):
+            picked = rng.choice(book_ids, size=size, replace=False, p=book_weights)
+            read = rng.random(size) < 0.7
+            ratings = rng.choice(
+                [1, 2, 3, 4, 5], size=size, p=[0.05, 0.1, 0.2, 0.35, 0.3]
+            )
+            shelves.extend(
+                {
+                    "user_id": user_id,
+                    "book_id": int(book_id),
+                    "status": "read" if is_read else "planned",
+                    "rating": int(rating) if is_read else None,
+                }
+                for book_id, is_read, rating in zip(picked, read, ratings)
+            )
+            if len(shelves) >= INSERT_CHUNK:
+                insert_chunked(db, UserBook, shelves)
+                shelves = []
+        insert_chunked(db, UserBook, shelves)
+
+        rebuild_book_stats(db)
+        rebuild_user_stats(db)
+        rebuild_trending_scores(db)
+        build_neighbours(db, k=50)
+        db.commit()
+        entries = db.scalar(select(func.count(UserBook.id)))
+    print(f"Seeded {args.users} users, {args.books} books, {entries} shelf entries")
+
+
+class RateLimited(Exception):
+    """Raised when the server under test answers 429"""
+
+
+@dataclass
+class Result:
+    """Latency and throughput of one scenario"""
+
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class Context:
+    """Dataset facts and tokens the scenarios draw their requests from"""
+
+    def __init__(
+        self,
+        book_ids: list[int],
+        tokens: list[dict],
+        refresh_tokens: list[str],
+        skew: float,
+    ):
+        self.book_ids = book_ids
+        self.book_weights = zipf_weights(len(book_ids), skew).tolist()
+        self.tokens = tokens
+        # each is exchanged once, the token received replaces it
+        self.refresh_tokens = refresh_tokens
+        self.cursors: list[str] = []
+        self.counter = 0
+
+    def popular_book(self) -> int:
+        return random.choices(self.book_ids, self.book_weights)[0]
+
+    def auth(self) -> dict:
+        return random.choice(self.tokens)
+
+    def unique(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+async def books_list(client, ctx):
+    return await client.get("/books/", params={"skip": random.randrange(0, 2000)})
+
+
+async def books_list_cursor(client, ctx):
+    params = {"limit": 50, "order_by": "average_rating", "descending": "true"}
+    if ctx.cursors:
+        params["cursor"] = ctx.cursors.pop()
+    response = await client.get("/books/", params=params)
+    if "x-next-cursor" in response.headers and len(ctx.cursors) < 1000:
+        ctx.cursors.append(response.headers["x-next-cursor"])
+    return response
+
+
+async def books_get(client, ctx):
+    return await client.get(f"/books/{ctx.popular_book()}")
+
+
+async def books_search(client, ctx):
+    query = " ".join(random.sample(WORDS, 2))
+    return await client.get("/books/search", params={"q": query})
+
+
+async def books_trending(client, ctx):
+    return await client.get("/books/trending", params={"limit": 20})
+
+
+async def books_create(client, ctx):
+    body = {"title": f"Bench book {ctx.unique()}", "author": "Bench", "year": 2000}
+    return await client.post("/books/", json=body)
+
+
+async def books_update(client, ctx):
+    book_id = random.choice(ctx.book_ids)
+    body = {"title": f"Updated {book_id}", "author": "Bench"}
+    return await client.put(f"/books/{book_id}", json=body)
+
+
+async def account_books(client, ctx):
+    return await client.get("/account/books", headers=ctx.auth())
+
+
+async def account_shelf_page(client, ctx):
+    params = {"include_book": True, "order_by": "title", "limit": 50}
+    return await client.get("/account/books", params=params, headers=ctx.auth())
+
+
+async def account_batch(client, ctx):
+    operations = [
+        {
+            "op": "add",
+            "book_id": ctx.popular_book(),
+            "status": "read",
+            "rating": random.randint(1, 5),
+        }
+        for _ in range(10)
+    ]
+    return await client.post(
+        "/account/books/batch", json={"operations": operations}, headers=ctx.auth()
+    )
+
+
+async def account_recommendations(client, ctx):
+    return await client.get("/account/recommendations", headers=ctx.auth())
+
+
+async def account_stats(client, ctx):
+    return await client.get("/account/stats", headers=ctx.auth())
+
+
+async def account_export(client, ctx):
+    return await client.get("/account/books/export", headers=ctx.auth())
+
+
+async def auth_login(client, ctx):
+    user = random.randrange(TOKEN_USERS)
+    return await client.post(
+        "/auth/login", data={"username": f"bench{user}", "password": PASSWORD}
+    )
+
+
+async def auth_refresh(client, ctx):
+    # a failed exchange loses its token, an empty pool shows up as errors
+    body = {"refresh_token": ctx.refresh_tokens.pop(0) if ctx.refresh_tokens else ""}
+    response = await client.post("/auth/refresh", json=body)
+    if response.status_code == 200:
+        ctx.refresh_tokens.append(response.json()["refresh_token"])
+    return response
+
+
+async def auth_register(client, ctx):
+    name = f"new{time.time_ns()}{ctx.unique()}"
+    body = {"username": name, "email": f"{name}@example.com", "password": PASSWORD}
+    return await client.post("/auth/register", json=body)
+
+
+# name -> (scenario, uses bcrypt), bcrypt scenarios run fewer requests
+SCENARIOS = {
+    "books_list": (books_list, False),
+    "books_list_cursor": (books_list_cursor, False),
+    "books_get": (books_get, False),
+    "books_search": (books_search, False),
+    "books_trending": (books_trending, False),
+    "books_create": (books_create, False),
+    "books_update": (books_update, False),
+    "account_books": (account_books, False),
+    "account_shelf_page": (account_shelf_page, False),
+    "account_batch": (account_batch, False),
+    "account_recommendations": (account_recommendations, False),
+    "account_stats": (account_stats, False),
+    "account_export": (account_export, False),
+    "auth_login": (auth_login, True),
+    "auth_refresh": (auth_refresh, False),
+    "auth_register": (auth_register, True),
+}
+
+
+async def run_scenario(client, ctx, scenario, total: int, concurrency: int) -> Result:
+    """Sends `total` requests of a scenario with `concurrency` in flight"""
+    latencies, errors = [], 0
+    pending = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            started = time.perf_counter()
+            response = await scenario(client, ctx)
+            latencies.append(time.perf_counter() - started)
+            # throttled requests would pass for very fast errors
+            if response.status_code == 429:
+                raise RateLimited(response.request.url.path)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return Result(
+        requests=total,
+        errors=errors,
+        rps=round(total / elapsed, 1),
+        p50_ms=round(cuts[49] * 1000, 2),
+        p95_ms=round(cuts[94] * 1000, 2),
+        p99_ms=round(cuts[98] * 1000, 2),
+    )
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Scenarios whose p95 latency or throughput got worse than allowed"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms"
+            )
+        if result["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['rps']:.1f} -> {result['rps']:.1f} req/s"
+            )
+        if result["errors"] > before["errors"]:
+            regressions.append(
+                f"{name}: errors {before['errors']} -> {result['errors']}"
+            )
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Runs the scenarios, returns the process exit code"""
+    names = args.scenarios or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with SessionLocal() as db:
+        book_ids = db.scalars(select(Book.id).order_by(Book.id)).all()
+        users = db.scalar(select(func.count(User.id)))
+    if not book_ids:
+        raise SystemExit("No books, run the seed command first")
+
+    if args.url:
+        transport = None
+    else:
+        # every in-process request comes from the same client address,
+        # the limits would throttle the run rather than measure it
+        settings.RATE_LIMIT_ENABLED = False
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url=args.url or "http://bench", timeout=60
+    ) as client:
+        tokens, refresh_tokens = [], []
+        for user in range(min(TOKEN_USERS, users)):
+            response = await client.post(
+                "/auth/login", data={"username": f"bench{user}", "password": PASSWORD}
+            )
+            if response.status_code == 429:
+                raise RateLimited("/auth/login")
+            if response.status_code == 200:
+                token = response.json()["access_token"]
+                tokens.append({"Authorization": f"Bearer {token}"})
+                refresh_tokens.append(response.json()["refresh_token"])
+        if not tokens:
+            raise SystemExit("Can't log in as bench users, run the seed command first")
+
+        ctx = Context(book_ids, tokens, refresh_tokens, args.skew)
+        results = {}
+        print(
+            f"{'scenario':<25} {'req':>6} {'err':>5} {'req/s':>9} "
+            f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for name in names:
+            scenario, hashes = SCENARIOS[name]
+            total = args.auth_requests if hashes else args.requests
+            # warm up caches and pools so the first requests don't skew p99
+            await run_scenario(
+                client, ctx, scenario, args.concurrency, args.concurrency
+            )
+            result = await run_scenario(client, ctx, scenario, total, args.concurrency)
+            results[name] = asdict(result)
+            print(
+                f"{name:<25} {result.requests:>6} {result.errors:>5} "
+                f"{result.rps:>9.1f} {result.p50_ms:>9.2f} {result.p95_ms:>9.2f} "
+                f"{result.p99_ms:>9.2f}"
+            )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "target": args.url or "in-process",
+            "books": len(book_ids),
+            "users": users,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS against", args.baseline)
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seeding = commands.add_parser("seed", help="create the synthetic dataset")
+    seeding.add_argument("--users", type=int, default=1000)
+    seeding.add_argument("--books", type=int, default=10000)
+    seeding.add_argument("--shelf-size", type=float, default=20, help="median")
+    seeding.add_argument("--skew", type=float, default=1.1, help="Zipf exponent")
+    seeding.add_argument("--seed", type=int, default=42)
+    seeding.add_argument("--reset", action="store_true", help="drop all tables")
+
+    running = commands.add_parser("run", help="drive the endpoints")
+    running.add_argument("--url", help="running server, default is in-process")
+    running.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS))
+    running.add_argument("--requests", type=int, default=500)
+    running.add_argument("--auth-requests", type=int, default=50)
+    running.add_argument("--concurrency", type=int, default=16)
+    running.add_argument("--skew", type=float, default=1.1)
+    running.add_argument("--seed", type=int, default=42)
+    running.add_argument("--output", help="write results to this JSON file")
+    running.add_argument("--baseline", help="fail on regressions against this file")
+    running.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed relative slowdown"
+    )
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        seed(args)
+    else:
+        random.seed(args.seed)
+        try:
+            sys.exit(asyncio.run(run(args)))
+        except RateLimited as exc:
+            raise SystemExit(
+                f"{exc} answered 429, start the server with RATE_LIMIT_ENABLED=false"
+            )
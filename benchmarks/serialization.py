@@ -0,0 +1,138 @@
+"""Per-row cost of the ORM + Pydantic response path against row tuples + orjson.
+
+Two measurements for every page size:
+
+- encode: CPU only, the rows are fetched once and turned into a JSON body
+  repeatedly - ORM objects validated through List[Book] and encoded with
+  the standard json module, against tuples zipped into dicts and encoded
+  with orjson;
+- http: whole requests in-process over ASGI, a handler returning ORM
+  objects with response_model=List[Book] against the row tuple handler.
+
+Run from the repository root against a database with enough books, e.g.
+after `python benchmarks/load.py seed --books 20000`:
+
+    python benchmarks/serialization.py --page-sizes 100 1000 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from core.serialization import (
+    ORJSONResponse,
+    model_columns,
+    rows_as_dicts,
+)
+from db.session import SessionLocal, get_db
+from fastapi import Depends, FastAPI, Query
+from models.api_models import Book
+from models.db_models import Book as DBBook
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+BOOK_FIELDS, BOOK_COLUMNS = model_columns(Book, DBBook)
+BOOK_LIST = TypeAdapter(list[Book])
+
+
+def build_app() -> FastAPI:
+    """Builds an app exposing the book listing through both paths"""
+    app = FastAPI()
+
+    @app.get("/orm/books", response_model=list[Book])
+    async def orm_books(limit: int = Query(), db: AsyncSession = Depends(get_db)):
+        query = select(DBBook).order_by(DBBook.id).limit(limit)
+        return (await db.execute(query)).scalars().all()
+
+    @app.get("/rows/books", response_model=list[Book])
+    async def row_books(limit: int = Query(), db: AsyncSession = Depends(get_db)):
+        query = select(*BOOK_COLUMNS).order_by(DBBook.id).limit(limit)
+        return ORJSONResponse(rows_as_dicts(await db.execute(query), BOOK_FIELDS))
+
+    return app
+
+
+def per_row_us(function, rounds: int, rows: int) -> float:
+    """Microseconds per row of calling `function` `rounds` times"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - started) / rounds / rows * 1e6
+
+
+def encode_costs(page_size: int, rounds: int) -> tuple[float, float]:
+    """CPU cost per row of building the JSON body on each path"""
+    with SessionLocal() as db:
+        objects = db.scalars(select(DBBook).order_by(DBBook.id).limit(page_size)).all()
+        tuples = db.execute(
+            select(*BOOK_COLUMNS).order_by(DBBook.id).limit(page_size)
+        ).all()
+
+    def orm_path():
+        books = BOOK_LIST.validate_python(objects, from_attributes=True)
+        json.dumps(BOOK_LIST.dump_python(books, mode="json")).encode()
+
+    def rows_path():
+        ORJSONResponse(rows_as_dicts(tuples, BOOK_FIELDS))
+
+    return (
+        per_row_us(orm_path, rounds, page_size),
+        per_row_us(rows_path, rounds, page_size),
+    )
+
+
+async def http_cost(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    """Wall time per row of sequential requests to one path"""
+    rows = len((await client.get(path)).json())
+    started = time.perf_counter()
+    for _ in range(requests):
+        (await client.get(path)).raise_for_status()
+    return (time.perf_counter() - started) / requests / rows * 1e6
+
+
+async def main(args: argparse.Namespace) -> None:
+    with SessionLocal() as db:
+        books = db.scalar(select(func.count(DBBook.id)))
+    if books < max(args.page_sizes):
+        raise SystemExit(
+            f"Only {books} books, seed more with benchmarks/load.py seed --books"
+        )
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        print(
+            f"{'rows':>6} {'step':>7} {'orm us/row':>11} {'rows us/row':>12} {'x':>6}"
+        )
+        for page_size in args.page_sizes:
+            orm, rows = encode_costs(page_size, args.requests)
+            print(
+                f"{page_size:>6} {'encode':>7} {orm:>11.2f} {rows:>12.2f} "
+                f"{orm / rows:>6.1f}"
+            )
+            orm = await http_cost(
+                client, f"/orm/books?limit={page_size}", args.requests
+            )
+            rows = await http_cost(
+                client, f"/rows/books?limit={page_size}", args.requests
+            )
+            print(
+                f"{page_size:>6} {'http':>7} {orm:>11.2f} {rows:>12.2f} "
+                f"{orm / rows:>6.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[100, 1000])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""Cost of issuing and verifying access tokens, old path against new.
+
+Compared, per token and CPU only:
+
+- jose HS256: python-jose with the shared secret, the implementation
+  before core.tokens;
+- jose RS256: python-jose with a key pair, which parses the PEM key on
+  every call;
+- core.tokens RS256: parsed keys cached per key ID, only the signature,
+  type and expiry checked;
+- auth cache hit: core.security.token_subject for a token verified before;
+- bcrypt login: one password check at BCRYPT_ROUNDS, what every re-login
+  costs without refresh tokens.
+
+Signing keys are created in a temporary directory. Run from the
+repository root:
+
+    python benchmarks/tokens.py --rounds 2000
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import core.tokens
+from config import settings
+from core.hashing import pwd_context
+from core.security import create_access_token, token_subject
+from core.tokens import ACCESS, Keyring, decode_token
+from cryptography.hazmat.primitives import serialization
+from jose import jwt
+
+
+def per_call_us(function, rounds: int) -> float:
+    """Microseconds per call of calling `function` `rounds` times"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def report(name: str, sign: float | None, verify: float | None) -> None:
+    cells = [f"{value:>10.1f}" if value else f"{'-':>10}" for value in (sign, verify)]
+    rate = f"{1e6 / verify:>12.0f}" if verify else f"{'-':>12}"
+    print(f"{name:<20} {cells[0]} {cells[1]} {rate}")
+
+
+def main(args: argparse.Namespace) -> None:
+    directory = Path(tempfile.mkdtemp(prefix="token-keys-"))
+    core.tokens.keyring = Keyring(directory, settings.TOKEN_KEYS_RELOAD_SECONDS)
+    signing_key = core.tokens.keyring.signing_key
+    private_pem = signing_key.private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = (
+        signing_key.public_key.public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    ).decode()
+
+    def claims():
+        expire = datetime.now(UTC) + timedelta(minutes=30)
+        return {"sub": "benchmark", "exp": expire}
+
+    hs256 = jwt.encode(claims(), settings.SECRET_KEY, algorithm="HS256")
+    rs256 = jwt.encode(claims(), private_pem, algorithm="RS256")
+    token = create_access_token({"sub": "benchmark"})
+    # tokens of the new path must verify with a general JWT library
+    assert jwt.decode(token, public_pem, algorithms=["RS256"])["sub"] == "benchmark"
+
+    print(f"{'path':<20} {'sign us':>10} {'verify us':>10} {'verifies/s':>12}")
+    report(
+        "jose HS256",
+        per_call_us(
+            lambda: jwt.encode(claims(), settings.SECRET_KEY, algorithm="HS256"),
+            args.rounds,
+        ),
+        per_call_us(
+            lambda: jwt.decode(hs256, settings.SECRET_KEY, algorithms=["HS256"]),
+            args.rounds,
+        ),
+    )
+    report(
+        "jose RS256",
+        per_call_us(
+            lambda: jwt.encode(claims(), private_pem, algorithm="RS256"), args.rounds
+        ),
+        per_call_us(
+            lambda: jwt.decode(rs256, public_pem, algorithms=["RS256"]), args.rounds
+        ),
+    )
+    report(
+        "core.tokens RS256",
+        per_call_us(lambda: create_access_token({"sub": "benchmark"}), args.rounds),
+        per_call_us(lambda: decode_token(token, ACCESS), args.rounds),
+    )
+
+    async def cached():
+        await token_subject(token)
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            await token_subject(token)
+        return (time.perf_counter() - started) / args.rounds * 1e6
+
+    report("auth cache hit", None, asyncio.run(cached()))
+
+    hashed = pwd_context.hash("benchmark")
+    login_rounds = max(1, args.rounds // 200)
+    report(
+        "bcrypt login",
+        None,
+        per_call_us(lambda: pwd_context.verify("benchmark", hashed), login_rounds),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    main(parser.parse_args())
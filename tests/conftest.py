@@ -0,0 +1,72 @@
+"""Test settings and database, shared by every test module.
+
+The app modules read their settings and create their engines at import
+time, so the environment is set here, before any test imports them: a
+throwaway SQLite database and key directory, cheap bcrypt, no rate
+limits and no background workers (tests run the job queue themselves).
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+scratch = Path(tempfile.mkdtemp(prefix="fastapi-webapp-tests-"))
+for name, value in {
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "SECRET_KEY": "test-secret",
+    "SQLITE_PATH": str(scratch / "test.db"),
+    "TOKEN_KEYS_DIR": str(scratch / "keys"),
+    "BCRYPT_ROUNDS": "4",
+    "RATE_LIMIT_ENABLED": "false",
+    "JOB_WORKERS": "0",
+    "TRENDING_REFRESH_SECONDS": "0",
+    "RESPONSE_CACHE_TTL_SECONDS": "0",
+}.items():
+    os.environ[name] = value
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Migrated database for the whole session"""
+    from db.migrate import upgrade
+
+    upgrade()
+    yield
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Client of the app, started once per test module"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+usernames = (f"reader{number}" for number in itertools.count())
+
+
+@pytest.fixture
+def auth_headers(client) -> dict:
+    """Authorization header of a newly registered user"""
+    username = next(usernames)
+    response = client.post(
+        "/auth/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "password",
+        },
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
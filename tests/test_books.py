@@ -0,0 +1,85 @@
+from core.jobs import job_queue, jobs
+from core.recommendations import RECOMMENDATIONS_JOB
+from db.session import SessionLocal
+from models.db_models import BookNeighbour, UserBook
+from sqlalchemy import delete, insert, select
+
+
+def create_book(client, title: str) -> int:
+    response = client.post("/books/", json={"title": title, "author": "Author"})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_delete_book_on_shelves_and_in_recommendations(client, auth_headers):
+    book_id = create_book(client, "Going away")
+    other_id = create_book(client, "Staying")
+    for shelved in (book_id, other_id):
+        response = client.post(
+            "/account/books",
+            json={"book_id": shelved, "status": "read", "rating": 4},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200, response.text
+    with SessionLocal() as db:
+        db.execute(delete(jobs))
+        db.execute(
+            insert(BookNeighbour),
+            [
+                {"book_id": book_id, "neighbour_id": other_id, "score": 0.5},
+                {"book_id": other_id, "neighbour_id": book_id, "score": 0.5},
+            ],
+        )
+        db.commit()
+
+    assert client.delete(f"/books/{book_id}").status_code == 200
+
+    assert client.get(f"/books/{book_id}").status_code == 404
+    with SessionLocal() as db:
+        assert not db.scalars(
+            select(UserBook.id).where(UserBook.book_id == book_id)
+        ).all()
+        assert not db.scalars(
+            select(BookNeighbour.book_id).where(
+                (BookNeighbour.book_id == book_id)
+                | (BookNeighbour.neighbour_id == book_id)
+            )
+        ).all()
+        queued = db.execute(select(jobs.c.kind, jobs.c.key)).all()
+    # the book that listed it as a neighbour gets its list refilled
+    assert queued == [(RECOMMENDATIONS_JOB, str(other_id))]
+    stats = client.get("/account/stats", headers=auth_headers).json()
+    assert stats["book_count"] == 1
+    assert stats["read_count"] == 1
+
+
+def run_jobs() -> None:
+    with SessionLocal() as db:
+        job_queue.run_pending(db)
+
+
+def average_rating(client, book_id: int) -> float | None:
+    return client.get(f"/books/{book_id}").json()["average_rating"]
+
+
+def test_average_rating_follows_shelf_ratings(client, auth_headers):
+    book_id = create_book(client, "Rated")
+    client.post(
+        "/account/books",
+        json={"book_id": book_id, "status": "read", "rating": 2},
+        headers=auth_headers,
+    )
+    run_jobs()
+    assert average_rating(client, book_id) == 2
+
+    client.put(
+        f"/account/books/{book_id}",
+        json={"status": "read", "rating": 5},
+        headers=auth_headers,
+    )
+    run_jobs()
+    assert average_rating(client, book_id) == 5
+
+    client.delete(f"/account/books/{book_id}", headers=auth_headers)
+    run_jobs()
+    assert average_rating(client, book_id) is None
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from core.auth_cache import auth_cache
+from core.cache import MemoryBackend, RedisBackend, TTLCache, build_backend
+from db.session import SessionLocal
+from models.db_models import User
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio.Redis calls RedisBackend makes"""
+
+    def __init__(self):
+        self.data: dict[str, tuple[float | None, str]] = {}
+
+    async def get(self, key: str) -> str | None:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, px: int | None = None) -> bool:
+        expires_at = None if px is None else time.monotonic() + px / 1000
+        self.data[key] = (expires_at, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("gone", 1, ttl=0)
+    cache.set("kept", 2)
+
+    assert cache.get("gone") is None
+    assert cache.get("kept") == 2
+    assert len(cache) == 1
+
+
+def test_memory_backend_round_trip():
+    async def run():
+        backend = MemoryBackend(max_size=10, ttl=60)
+        await backend.set("key", {"user": "reader"}, ttl=60)
+        assert await backend.get("key") == {"user": "reader"}
+        await backend.delete("key", "missing")
+        assert await backend.get("key") is None
+
+    asyncio.run(run())
+
+
+def test_redis_backend_stores_prefixed_json_with_ttl():
+    async def run():
+        client = FakeRedis()
+        backend = RedisBackend(client, prefix="auth:")
+        await backend.set("key", {"user": "reader"}, ttl=60)
+        assert set(client.data) == {"auth:key"}
+        assert await backend.get("key") == {"user": "reader"}
+
+        await backend.set("short", {"user": "reader"}, ttl=0.001)
+        await asyncio.sleep(0.01)
+        assert await backend.get("short") is None
+
+        await backend.delete("key")
+        assert await backend.get("key") is None
+
+    asyncio.run(run())
+
+
+def test_build_backend_without_url_stays_in_process():
+    backend = build_backend(None, max_size=10, ttl=60, prefix="auth:")
+    assert isinstance(backend, MemoryBackend)
+    assert backend.cache.max_size == 10
+
+
+def test_auth_cache_keeps_tokens_no_longer_than_they_are_valid():
+    async def run():
+        await auth_cache.set_token_subject("expired", "reader", time.time() - 1)
+        await auth_cache.set_token_subject("valid", "reader", time.time() + 60)
+        assert await auth_cache.get_token_subject("expired") is None
+        assert await auth_cache.get_token_subject("valid") == "reader"
+
+    asyncio.run(run())
+
+
+def test_auth_cache_drops_users_changed_in_a_commit():
+    with SessionLocal() as db:
+        user = User(username="cached", email="cached@example.com", hashed_password="")
+        db.add(user)
+        db.commit()
+        asyncio.run(auth_cache.set_user(user))
+        assert asyncio.run(auth_cache.get_user("cached")).email == "cached@example.com"
+
+        user.email = "changed@example.com"
+        db.commit()
+    assert asyncio.run(auth_cache.get_user("cached")) is None
@@ -0,0 +1,31 @@
+from config import settings
+
+
+def test_internal_endpoints_are_off_without_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_TOKEN", None)
+    assert client.get("/internal/pool").status_code == 404
+    assert client.get("/internal/pool", headers=bearer("anything")).status_code == 404
+
+
+def test_internal_endpoints_need_the_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_TOKEN", "s3cret")
+    assert client.get("/internal/pool").status_code == 401
+    assert client.get("/internal/pool", headers=bearer("wrong")).status_code == 401
+    response = client.get("/internal/pool", headers=bearer("s3cret"))
+    assert response.status_code == 200
+    assert "status" in response.json()
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_metrics_need_the_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_TOKEN", None)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(settings, "INTERNAL_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers=bearer("s3cret"))
+    assert response.status_code == 200
+    assert "# TYPE job_queue_depth gauge" in response.text
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from core.jobs import JobKind, as_utc, job_queue, jobs, utcnow
+from db.session import AsyncSessionLocal, SessionLocal, async_engine
+from sqlalchemy import delete, select
+
+KIND = "test_job"
+
+
+@pytest.fixture
+def failing_kind(monkeypatch):
+    """Job kind whose handler always fails, retried without backoff"""
+    monkeypatch.setattr(job_queue, "max_attempts", 3)
+    monkeypatch.setattr(job_queue, "retry_base", 0.0)
+    monkeypatch.setattr(job_queue, "retry_max", 0.0)
+    runs = []
+
+    def handler(db, batch):
+        runs.append(batch[0].amount)
+        raise RuntimeError("handler failed")
+
+    monkeypatch.setitem(job_queue.kinds, KIND, JobKind(handler))
+    yield runs
+    with SessionLocal() as db:
+        db.execute(delete(jobs).where(jobs.c.kind == KIND))
+        db.commit()
+
+
+def enqueue(keys: dict) -> None:
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await job_queue.enqueue(db, KIND, keys)
+            await db.commit()
+        # the next asyncio.run gets a new event loop
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+def run_pending() -> None:
+    with SessionLocal() as db:
+        job_queue.run_pending(db)
+
+
+def fetch_job():
+    with SessionLocal() as db:
+        return db.execute(select(jobs).where(jobs.c.kind == KIND)).one()
+
+
+def test_job_is_given_up_after_max_attempts(failing_kind):
+    enqueue({"1": 1.0})
+    run_pending()
+
+    job = fetch_job()
+    assert failing_kind == [1.0, 1.0, 1.0]
+    assert job.attempts == 3
+    assert job.failed_at is not None
+    assert "handler failed" in job.last_error
+
+
+def test_new_work_revives_failed_job_with_full_retry_budget(failing_kind):
+    enqueue({"1": 1.0})
+    run_pending()
+    failing_kind.clear()
+
+    enqueue({"1": 2.0})
+    job = fetch_job()
+    assert job.failed_at is None
+    assert job.attempts == 0
+    assert job.amount == 3.0
+    assert as_utc(job.run_at) <= utcnow()
+
+    run_pending()
+    assert failing_kind == [3.0, 3.0, 3.0]
+    assert fetch_job().failed_at is not None
+
+
+def test_new_work_keeps_schedule_of_waiting_job(failing_kind):
+    enqueue({"1": 1.0})
+    later = utcnow() + timedelta(hours=1)
+    with SessionLocal() as db:
+        db.execute(jobs.update().where(jobs.c.kind == KIND).values(run_at=later))
+        db.commit()
+
+    enqueue({"1": 1.0})
+    job = fetch_job()
+    assert as_utc(job.run_at) == later
+    assert job.amount == 2.0
+
+
+def test_retry_failed_gives_full_retry_budget(failing_kind):
+    enqueue({"1": 1.0})
+    run_pending()
+    failing_kind.clear()
+
+    with SessionLocal() as db:
+        assert job_queue.retry_failed(db, KIND) == 1
+    job = fetch_job()
+    assert job.failed_at is None
+    assert job.attempts == 0
+
+    run_pending()
+    assert failing_kind == [1.0, 1.0, 1.0]
@@ -0,0 +1,115 @@
+import base64
+import json
+
+import pytest
+from core.pagination import InvalidCursor, decode_cursor, encode_cursor
+from db.session import SessionLocal
+from models.db_models import Book
+from sqlalchemy import update
+
+
+def raw_cursor(*fields) -> str:
+    return base64.urlsafe_b64encode(json.dumps(fields).encode()).decode()
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("year", True, 1999, 42)
+    assert decode_cursor(cursor, int) == ("year", True, 1999, 42)
+    assert decode_cursor(encode_cursor("year", False, None, 7), int)[2] is None
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64 json",
+        raw_cursor("year", False, 1999),
+        raw_cursor("year", "yes", 1999, 1),
+        raw_cursor("year", False, 1999, -1),
+        raw_cursor("year", False, 1999, 2**31),
+        raw_cursor("year", False, True, 1),
+        raw_cursor("year", False, "1999", 1),
+        raw_cursor("year", False, {"$gt": 0}, 1),
+        raw_cursor("year", False, 2**63, 1),
+    ],
+)
+def test_decode_cursor_rejects_malformed_tokens(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, int)
+
+
+@pytest.fixture(scope="module")
+def books(client):
+    """Books with tied and missing sort keys"""
+    for title, year, rating in [
+        ("Tied", 2000, 4.0),
+        ("Tied", 2000, 4.0),
+        ("No year", None, None),
+        ("Older", 1999, 3.5),
+        ("No year", None, None),
+        ("Tied", 2000, 4.0),
+        ("Newer", 2010, 5.0),
+    ]:
+        response = client.post(
+            "/books/", json={"title": title, "author": "Author", "year": year}
+        )
+        assert response.status_code == 200, response.text
+        # normally maintained by the book_stats job
+        with SessionLocal() as db:
+            db.execute(
+                update(Book)
+                .where(Book.id == response.json()["id"])
+                .values(average_rating=rating)
+            )
+            db.commit()
+    return client.get("/books/", params={"limit": 1000}).json()
+
+
+def expected_order(books: list[dict], key: str, descending: bool) -> list[int]:
+    """IDs in keyset order: NULL keys last ascending, first descending"""
+    keyed = sorted(
+        (book for book in books if book[key] is not None),
+        key=lambda book: (book[key], book["id"]),
+        reverse=descending,
+    )
+    unkeyed = sorted(
+        (book for book in books if book[key] is None),
+        key=lambda book: book["id"],
+        reverse=descending,
+    )
+    ordered = unkeyed + keyed if descending else keyed + unkeyed
+    return [book["id"] for book in ordered]
+
+
+@pytest.mark.parametrize("order_by", ["id", "title", "year", "average_rating"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_cursor_walk_visits_every_book_once_in_order(
+    client, books, order_by, descending
+):
+    params = {"limit": 2, "order_by": order_by, "descending": descending}
+    seen = []
+    while True:
+        response = client.get("/books/", params=params)
+        assert response.status_code == 200, response.text
+        seen.extend(book["id"] for book in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params["cursor"] = cursor
+
+    expected = expected_order(books, order_by, descending)
+    assert seen == expected
+    params.pop("cursor", None)
+    offset_page = client.get("/books/", params={**params, "skip": 3})
+    assert [book["id"] for book in offset_page.json()] == expected[3:5]
+
+
+def test_cursor_of_another_order_is_rejected(client, books):
+    cursor = encode_cursor("title", False, "Tied", books[0]["id"])
+    response = client.get("/books/", params={"cursor": cursor, "order_by": "year"})
+    assert response.status_code == 400
+
+
+def test_malformed_cursor_is_a_client_error(client, books):
+    cursor = raw_cursor("year", False, {"$gt": 0}, 1)
+    response = client.get("/books/", params={"cursor": cursor, "order_by": "year"})
+    assert response.status_code == 400
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from datetime import UTC, datetime, timedelta, timezone
+
+import core.tokens
+from config import settings
+from core.security import token_subject
+from core.tokens import ACCESS, REFRESH, Keyring, _legacy_until, decode_token
+from jose import jwt
+
+
+def legacy_token(username: str) -> str:
+    expires_at = datetime.now(UTC) + timedelta(minutes=30)
+    return jwt.encode(
+        {"sub": username, "exp": expires_at}, settings.SECRET_KEY, algorithm="HS256"
+    )
+
+
+def test_naive_legacy_cutoff_is_utc():
+    naive = datetime(2026, 10, 18, 12, 30)
+    assert _legacy_until(naive) == naive.replace(tzinfo=UTC).timestamp()
+    aware = datetime(2026, 10, 18, 12, 30, tzinfo=timezone(timedelta(hours=3)))
+    assert _legacy_until(aware) == aware.timestamp()
+    assert _legacy_until(None) is None
+
+
+def test_legacy_tokens_only_work_until_the_cutoff(monkeypatch):
+    token = legacy_token("legacy-reader")
+    monkeypatch.setattr(core.tokens, "LEGACY_UNTIL", None)
+    assert decode_token(token, ACCESS) is None
+
+    cutoff = time.time() + 60
+    monkeypatch.setattr(core.tokens, "LEGACY_UNTIL", cutoff)
+    claims = decode_token(token, ACCESS)
+    assert claims["sub"] == "legacy-reader"
+    # caches keyed by the token must not outlive the window
+    assert claims["exp"] == cutoff
+
+    monkeypatch.setattr(core.tokens, "LEGACY_UNTIL", time.time() - 1)
+    assert decode_token(token, ACCESS) is None
+
+
+def test_cached_legacy_token_stops_working_at_the_cutoff(monkeypatch):
+    token = legacy_token("cached-legacy-reader")
+    monkeypatch.setattr(core.tokens, "LEGACY_UNTIL", time.time() + 60)
+    assert asyncio.run(token_subject(token)) == "cached-legacy-reader"
+
+    monkeypatch.setattr(core.tokens, "LEGACY_UNTIL", time.time() - 1)
+    assert asyncio.run(token_subject(token)) is None
+
+
+def test_rotated_keyring_keeps_verifying_old_tokens(tmp_path, monkeypatch):
+    keyring = Keyring(tmp_path, reload_interval=0)
+    monkeypatch.setattr(core.tokens, "keyring", keyring)
+    first = keyring.ensure_signing_key()
+    claims = {"sub": "reader", "typ": ACCESS, "exp": time.time() + 60}
+    old_token = core.tokens.encode_token(claims)
+
+    kid = keyring.rotate()
+    assert keyring.signing_key.kid == kid != first.kid
+    new_token = core.tokens.encode_token(claims)
+    assert decode_token(old_token, ACCESS)["sub"] == "reader"
+    assert decode_token(new_token, ACCESS)["sub"] == "reader"
+    assert decode_token(new_token, REFRESH) is None
+    assert {key["kid"] for key in keyring.jwks()["keys"]} == {first.kid, kid}
+
+
+def test_rotate_drops_keys_replaced_before_keep_seconds(tmp_path):
+    keyring = Keyring(tmp_path, reload_interval=0)
+    oldest, replaced, current = (keyring.rotate() for _ in range(3))
+    # `replaced` took over from `oldest` two hours ago
+    two_hours_ago = time.time() - 7200
+    os.utime(tmp_path / f"{replaced}.pem", (two_hours_ago, two_hours_ago))
+
+    newest = keyring.rotate(keep_seconds=3600)
+
+    kept = sorted(path.stem for path in tmp_path.glob("*.pem"))
+    assert oldest not in kept
+    assert kept == [replaced, current, newest]
+    assert keyring.signing_key.kid == newest
+
+
+def test_reused_refresh_token_revokes_its_family(client):
+    tokens = client.post(
+        "/auth/register",
+        json={
+            "username": "refresher",
+            "email": "refresher@example.com",
+            "password": "password",
+        },
+    ).json()
+    first = tokens["refresh_token"]
+
+    renewed = client.post("/auth/refresh", json={"refresh_token": first})
+    assert renewed.status_code == 200, renewed.text
+    second = renewed.json()["refresh_token"]
+    access = renewed.json()["access_token"]
+    me = client.get("/account/stats", headers={"Authorization": f"Bearer {access}"})
+    assert me.status_code == 200
+
+    # the first token presented again: someone else holds a copy
+    assert (
+        client.post("/auth/refresh", json={"refresh_token": first}).status_code == 401
+    )
+    assert (
+        client.post("/auth/refresh", json={"refresh_token": second}).status_code == 401
+    )
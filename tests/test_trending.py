@@ -0,0 +1,73 @@
+import math
+import time
+
+import pytest
+from db.session import SessionLocal
+from db.trending import (
+    add_trending_scores,
+    books,
+    current_score,
+    epochs,
+    growth,
+    lock_epoch,
+)
+from sqlalchemy import select, update
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def book_id(client):
+    """A book, with the stored epoch restored afterwards"""
+    with SessionLocal() as db:
+        saved = db.scalar(select(epochs.c.epoch))
+    response = client.post("/books/", json={"title": "Trending", "author": "Author"})
+    assert response.status_code == 200, response.text
+    yield response.json()["id"]
+    with SessionLocal() as db:
+        db.execute(update(epochs).values(epoch=saved))
+        db.commit()
+
+
+def set_score(db, book_id: int, epoch: float, stored: float) -> None:
+    db.execute(update(epochs).values(epoch=epoch))
+    db.execute(update(books).where(books.c.id == book_id).values(trending_score=stored))
+
+
+def stored_score(db, book_id: int) -> float:
+    return db.scalar(select(books.c.trending_score).where(books.c.id == book_id))
+
+
+def test_recent_epoch_is_kept(book_id):
+    now = time.time()
+    with SessionLocal() as db:
+        set_score(db, book_id, now - DAY, 2.0)
+        assert lock_epoch(db, now) == now - DAY
+        assert stored_score(db, book_id) == 2.0
+
+
+def test_rebase_keeps_current_scores(book_id):
+    now = time.time()
+    old_epoch = now - 300 * DAY
+    with SessionLocal() as db:
+        set_score(db, book_id, old_epoch, 3.0 * growth(now, old_epoch))
+        epoch = lock_epoch(db, now)
+        db.commit()
+        assert epoch == now
+        assert db.scalar(select(epochs.c.epoch)) == now
+        assert current_score(stored_score(db, book_id), epoch, now) == pytest.approx(
+            3.0
+        )
+
+
+def test_scores_stay_finite_years_after_the_epoch(book_id):
+    now = time.time()
+    with SessionLocal() as db:
+        # exp(λ · 10 years) is far beyond the float range
+        set_score(db, book_id, now - 3650 * DAY, 0.0)
+        add_trending_scores(db, {book_id: (1.0, now)})
+        db.commit()
+        stored = stored_score(db, book_id)
+        epoch = db.scalar(select(epochs.c.epoch))
+        assert math.isfinite(stored)
+        assert current_score(stored, epoch, now) == pytest.approx(1.0)